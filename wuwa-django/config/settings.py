@@ -114,6 +114,19 @@ CHANNEL_LAYERS = {
     "default": {"BACKEND": "channels_redis.core.RedisChannelLayer", "CONFIG": {"hosts": [("redis", 6379)]}},
 }
 
+# Websocket-Broadcasts: nach dem Commit gesammelt und aus einem Hintergrund-Thread gesendet.
+# Events innerhalb der Verzögerung (Sekunden) werden pro Match zu einer Nachricht zusammengefasst.
+BROADCAST_DISPATCH_THREAD = True
+BROADCAST_DISPATCH_DELAY = 0.02
+
+# Prozesslokaler Cache (Draft-Snapshots). Bei mehreren Worker-Prozessen: Redis-Cache verwenden.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "wuwa-default",
+    }
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
 
@@ -17,10 +17,28 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from django.urls import include
-from core.api import TournamentMatchesAPIView
+from core.api import (
+    BossLeaderboardAPIView,
+    BossTimeStatsAPIView,
+    LeaderboardAPIView,
+    PlayerRanksAPIView,
+    RatingLeaderboardAPIView,
+    TournamentBracketAPIView,
+    TournamentFinalizeRoundAPIView,
+    TournamentMatchesAPIView,
+    TournamentWinProbabilityAPIView,
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include("core.urls")),
     path('api/tournaments/<int:tournamentId>/matches/', TournamentMatchesAPIView.as_view(), name='api_tournament_matches',),
+    path('api/tournaments/<int:tournamentId>/bracket/', TournamentBracketAPIView.as_view(), name='api_tournament_bracket'),
+    path('api/tournaments/<int:tournamentId>/finalize-round/', TournamentFinalizeRoundAPIView.as_view(), name='api_tournament_finalize_round'),
+    path('api/tournaments/<int:tournamentId>/win-probabilities/', TournamentWinProbabilityAPIView.as_view(), name='api_tournament_win_probabilities'),
+    path('api/leaderboards/', LeaderboardAPIView.as_view(), name='api_leaderboards'),
+    path('api/ratings/', RatingLeaderboardAPIView.as_view(), name='api_ratings'),
+    path('api/players/<int:playerId>/ranks/', PlayerRanksAPIView.as_view(), name='api_player_ranks'),
+    path('api/bosses/<int:bossId>/leaderboard/', BossLeaderboardAPIView.as_view(), name='api_boss_leaderboard'),
+    path('api/bosses/<int:bossId>/time-stats/', BossTimeStatsAPIView.as_view(), name='api_boss_time_stats'),
 ]
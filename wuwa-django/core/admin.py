@@ -3,8 +3,9 @@ from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 
 from .models import (
     User, Player, Tournament, Boss, Resonator,
-    Match, BossTime, MatchDraftAction
+    Match, BossTime, MatchDraftAction, TimeSubmission, PlayerRating, RatingHistory
 )
+from .draftcache import bumpDraftVersions
 
 @admin.register(Tournament)
 class TournamentAdmin(admin.ModelAdmin):
@@ -30,10 +31,47 @@ class UserAdmin(DjangoUserAdmin):
     list_filter = ("role", "is_staff", "is_superuser")
 
 
+# Änderungen im Admin laufen am Draft-Code vorbei: draft_version hochzählen,
+# damit Snapshot- und HTML-Cache nicht den alten Stand ausliefern
+@admin.register(Match)
+class MatchAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            bumpDraftVersions([obj.id])
+
+    def delete_model(self, request, obj):
+        bumpDraftVersions([obj.id])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        bumpDraftVersions(list(queryset.values_list("id", flat=True)))
+        super().delete_queryset(request, queryset)
+
+
+@admin.register(MatchDraftAction)
+class MatchDraftActionAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        matchIds = {obj.match_id}
+        if change and "match" in form.changed_data:
+            matchIds.add(form.initial["match"])
+        bumpDraftVersions(matchIds)
+
+    def delete_model(self, request, obj):
+        bumpDraftVersions([obj.match_id])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        bumpDraftVersions(set(queryset.values_list("match_id", flat=True)))
+        super().delete_queryset(request, queryset)
+
+
 # admin.site.register(Player)
 # admin.site.register(Tournament)
 admin.site.register(Boss)
 admin.site.register(Resonator)
-admin.site.register(Match)
-admin.site.register(MatchDraftAction)
 admin.site.register(BossTime)
+admin.site.register(TimeSubmission)
+admin.site.register(PlayerRating)
+admin.site.register(RatingHistory)
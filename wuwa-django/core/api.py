@@ -1,9 +1,21 @@
 from rest_framework import generics
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 
-from core.models import Tournament, Match
-from core.serializer import MatchDashboardSerializer
+from core.brackettree import getBracketTreeJson
+from core.finalize import finalizeMatches
+from core.leaderboard import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, bossLeaderboards, leaderboardPage, parseLeaderboardParams
+from core.models import Boss, BossTime, Player, Tournament, Match
+from core.permissions import IsHost
+from core.rankindex import playerRanks
+from core.ratings import DEFAULT_RATING_TOP, MAX_RATING_TOP, ratingLeaderboard
+from core.simulate import getWinProbabilitiesJson
+from core.timestats import bossTimeStats, playerTimeStats
+from core.serializer import MatchDashboardSerializer, RoundFinalizeSerializer
 
 
 class TournamentMatchesAPIView(generics.ListAPIView):
@@ -20,3 +32,172 @@ class TournamentMatchesAPIView(generics.ListAPIView):
             .prefetch_related("draft_actions__resonator")
             .order_by("id")
         )
+
+
+class TournamentBracketAPIView(APIView):
+    """
+    Kompakter Bracket-Baum (rounds -> matches) fürs Zeichnen/Pollen.
+    Der JSON-Text kommt fertig aus dem Cache und wird unverändert ausgeliefert.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []  # öffentlich, spart den Session-/User-Lookup pro Poll
+
+    def get(self, request, tournamentId: int):
+        try:
+            text = getBracketTreeJson(tournamentId)
+        except Tournament.DoesNotExist:
+            raise NotFound("Tournament not found.")
+        return HttpResponse(text, content_type="application/json")
+
+
+class TournamentFinalizeRoundAPIView(APIView):
+    """
+    POST {"bracket": "W", "roundIndex": 0} oder {"matchIds": [...]}: schließt alle fertig
+    gespielten Matches in einer Transaktion ab. Antwort: finished-IDs und skipped {matchId: Grund}.
+    """
+    permission_classes = [IsHost]
+
+    def post(self, request, tournamentId: int):
+        tournament = get_object_or_404(Tournament, id=tournamentId)
+
+        serializer = RoundFinalizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        result = finalizeMatches(
+            tournament,
+            bracket=data["bracket"],
+            roundIndex=data.get("roundIndex"),
+            matchIds=data.get("matchIds"),
+        )
+        return Response({"finished": result.finished, "skipped": result.skipped})
+
+
+class TournamentWinProbabilityAPIView(APIView):
+    """
+    Monte-Carlo-Chancen auf den Turniersieg (und pro offenem Match) für Caster-Overlays.
+    Gecacht bis zum nächsten Match-Ende, danach einmal neu simuliert.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, tournamentId: int):
+        try:
+            text = getWinProbabilitiesJson(tournamentId)
+        except Tournament.DoesNotExist:
+            raise NotFound("Tournament not found.")
+        return HttpResponse(text, content_type="application/json")
+
+
+class LeaderboardAPIView(APIView):
+    """
+    Top-K pro Boss für das Dashboard (DashboardLeaderboard), gleiche Query wie /leaderboards/.
+    ?top=K (Standard 5), ?tournament=ID, ?player=ID (mehrfach möglich).
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        params = parseLeaderboardParams(request.query_params)
+        return Response({
+            "topK": params["topK"],
+            "bosses": [
+                {
+                    "id": boss.id,
+                    "slug": boss.slug,
+                    "name": boss.name,
+                    "entries": [entry._asdict() for entry in entries],
+                }
+                for boss, entries in bossLeaderboards(**params)
+            ],
+        })
+
+
+class BossLeaderboardAPIView(APIView):
+    """
+    Volles Leaderboard eines Bosses, seitenweise per Cursor (Keyset auf Zeit + Spieler).
+    ?after=CURSOR / ?before=CURSOR aus next/previous, ?player=ID springt zum Spieler, ?size=N.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, bossId: int):
+        get_object_or_404(Boss, id=bossId)
+        params = request.query_params
+
+        try:
+            pageSize = int(params.get("size", DEFAULT_PAGE_SIZE))
+            playerId = int(params["player"]) if "player" in params else None
+        except ValueError:
+            raise ValidationError("size and player must be integers.")
+
+        try:
+            page = leaderboardPage(
+                bossId,
+                after=params.get("after"),
+                before=params.get("before"),
+                playerId=playerId,
+                pageSize=min(max(pageSize, 1), MAX_PAGE_SIZE),
+            )
+        except BossTime.DoesNotExist:
+            raise NotFound("Player has no time on this boss.")
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+        return Response({
+            "bossId": bossId,
+            "entries": [entry._asdict() for entry in page.entries],
+            "next": page.nextCursor,
+            "previous": page.previousCursor,
+        })
+
+
+class RatingLeaderboardAPIView(APIView):
+    """
+    Elo-Rangliste aller Spieler mit gewerteten Matches. ?top=N (Standard 50).
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        try:
+            top = int(request.query_params.get("top", DEFAULT_RATING_TOP))
+        except ValueError:
+            raise ValidationError("top must be an integer.")
+        entries = ratingLeaderboard(min(max(top, 1), MAX_RATING_TOP))
+        return Response({"entries": [entry._asdict() for entry in entries]})
+
+
+class PlayerRanksAPIView(APIView):
+    """
+    Rang und Perzentil eines Spielers auf jedem Boss, auf dem er eine Bestzeit hat.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, playerId: int):
+        get_object_or_404(Player, id=playerId)
+        return Response({
+            "playerId": playerId,
+            "ranks": [rank._asdict() for rank in playerRanks(playerId)],
+        })
+
+
+class BossTimeStatsAPIView(APIView):
+    """
+    Verteilung aller eingereichten Zeiten eines Bosses (Histogramm, p50/p90/p99).
+    Mit ?player=ID zusätzlich Konstanz und Verlauf dieses Spielers.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, bossId: int):
+        get_object_or_404(Boss, id=bossId)
+        data = bossTimeStats(bossId)
+
+        playerId = request.query_params.get("player")
+        if playerId is not None:
+            if not playerId.isdigit() or not Player.objects.filter(id=playerId).exists():
+                raise NotFound("Player not found.")
+            data["player"] = playerTimeStats(int(playerId), bossId)
+        return Response(data)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Signal-Receiver (Invalidierung von Resonator-Katalog und Draft-Cache) registrieren
+        from . import catalog, draftcache  # noqa: F401
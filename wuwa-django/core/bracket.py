@@ -1,127 +1,343 @@
 import random
 from django.db import transaction
 
-from .models import Match, MatchSide, Player, Tournament, Boss
+from .brackettree import invalidateBracketTree
+from .models import BracketType, Match, MatchSide, Player, Tournament, Boss
+from .seeding import bracketSlots
+
+
+# Overwrite ersetzt nur das K.-o.-Bracket, Gruppenphase und Swiss bleiben stehen
+ELIMINATION_BRACKETS = (BracketType.WINNERS, BracketType.LOSERS, BracketType.GRAND_FINAL)
+
+
+def _sideOf(index: int) -> str:
+    # Paarweise: gerader Index (0-basiert) -> LEFT im nächsten Match, ungerader -> RIGHT
+    return MatchSide.LEFT if index % 2 == 0 else MatchSide.RIGHT
 
 
 @transaction.atomic
-def generateSingleElim8(tournament: Tournament, *, shuffleSeed: int | None = None, overwrite: bool = True) -> list[Match]:
+def generateSingleElim(
+    tournament: Tournament,
+    *,
+    seededPlayers: list[Player] | None = None,
+    shuffleSeed: int | None = None,
+    overwrite: bool = True,
+) -> list[Match]:
     """
-    Erzeugt 8er Single Elimination Bracket:
-      Round 0: 4 Matches (match_index 1..4)
-      Round 1: 2 Matches (match_index 1..2)
-      Round 2: 1 Match  (match_index 1)
-
-    Mapping:
-      R0 M1 -> R1 M1 LEFT
-      R0 M2 -> R1 M1 RIGHT
-      R0 M3 -> R1 M2 LEFT
-      R0 M4 -> R1 M2 RIGHT
-      R1 M1 -> R2 M1 LEFT
-      R1 M2 -> R2 M1 RIGHT
+    Erzeugt ein Single Elimination Bracket für beliebig viele Spieler (>= 2).
+
+    Bracket-Größe ist die nächste Zweierpotenz, die Spieler werden nach
+    Standard-Setzliste platziert (1 vs N, ...). seededPlayers = Spieler in Seed-Reihenfolge
+    (z.B. seeding.seededPlayers nach BossTime), sonst werden die Turnier-Spieler zufällig gesetzt (shuffleSeed für Reproduzierbarkeit).
+    Freilose gehen an die besten Seeds: für sie wird kein Match in Runde 0 angelegt,
+    der Spieler steht direkt in Runde 1. match_index ist die Position im Bracket (1-basiert).
+
+    Der ganze Baum wird im Speicher gebaut und verlinkt, danach ein bulk_create pro Runde.
     """
-    players = list(tournament.players.all().order_by("id"))
+    rng = random.Random(shuffleSeed)
+    if seededPlayers is None:
+        players = list(tournament.players.all().order_by("id"))
+        rng.shuffle(players)
+    else:
+        players = list(seededPlayers)
+
+    if len(players) < 2:
+        raise ValueError(f"Need at least 2 players, got {len(players)}")
+
     bosses = list(Boss.objects.all())
     if not bosses:
         raise ValueError("No Bosses found. Please create at least 1 Boss before generating matches.")
 
-    if len(players) != 8:
-        raise ValueError(f"Need exactly 8 players, got {len(players)}")
+    slots = bracketSlots(players)
+    size = len(slots)
+    roundCount = size.bit_length() - 1
+
+    # Baum im Speicher: rounds[r][i] = Match an Position i+1 in Runde r (None = Freilos in Runde 0)
+    rounds: list[list[Match | None]] = []
+    for roundIndex in range(roundCount):
+        rounds.append([
+            Match(
+                tournament=tournament,
+                boss=rng.choice(bosses),
+                first_pick_side=MatchSide.LEFT,
+                round_index=roundIndex,
+                match_index=i + 1,
+            )
+            for i in range(size >> (roundIndex + 1))
+        ])
+
+    for i, match in enumerate(rounds[0]):
+        left, right = slots[2 * i], slots[2 * i + 1]
+        if left is not None and right is not None:
+            match.player_left = left
+            match.player_right = right
+            continue
+
+        # Freilos: Spieler rückt direkt in Runde 1 auf
+        rounds[0][i] = None
+        target = rounds[1][i // 2]
+        if _sideOf(i) == MatchSide.LEFT:
+            target.player_left = left or right
+        else:
+            target.player_right = left or right
+
+    # Verlinkung im Speicher, eingefügt wird vom Finale rückwärts:
+    # so existiert next_match beim Insert schon und es braucht kein Update danach
+    for roundIndex in range(roundCount - 1):
+        for i, match in enumerate(rounds[roundIndex]):
+            if match is not None:
+                match.next_match = rounds[roundIndex + 1][i // 2]
+                match.next_side = _sideOf(i)
+
+    if overwrite:
+        Match.objects.filter(tournament=tournament, bracket__in=ELIMINATION_BRACKETS).delete()
+
+    for roundMatches in reversed(rounds):
+        Match.objects.bulk_create([m for m in roundMatches if m is not None])
+
+    invalidateBracketTree(tournament.id)
+    return [m for roundMatches in rounds for m in roundMatches if m is not None]
 
+
+class _Node:
+    """
+    Match im Speicher, bevor es eingefügt wird. slots: Quelle pro Seite (LEFT, RIGHT) –
+    ein Player, ("W", node) / ("L", node) für Sieger/Verlierer eines anderen Matches,
+    oder None (bleibt leer, z.B. Freilos).
+    """
+    __slots__ = ("match", "slots", "winnerTo", "loserTo", "alive")
+
+    def __init__(self, match: Match):
+        self.match = match
+        self.slots = [None, None]
+        self.winnerTo = None  # (node, sideIndex)
+        self.loserTo = None
+        self.alive = True
+
+
+_SIDES = (MatchSide.LEFT, MatchSide.RIGHT)
+
+
+def _link(source: _Node, kind: str, target: _Node, sideIndex: int):
+    if kind == "W":
+        source.winnerTo = (target, sideIndex)
+    else:
+        source.loserTo = (target, sideIndex)
+    target.slots[sideIndex] = (kind, source)
+
+
+def _collapseByes(nodes: list[_Node]):
+    """
+    Entfernt Matches mit weniger als zwei möglichen Teilnehmern. Ein einzelner Teilnehmer
+    (oder sein Zubringer-Link) wird direkt ins nächste Match weitergereicht.
+    nodes muss topologisch sortiert sein (Zubringer vor Ziel).
+    """
+    for node in nodes:
+        present = [i for i in (0, 1) if node.slots[i] is not None]
+        if len(present) == 2:
+            continue
+
+        node.alive = False
+        # Kein Match -> kein Verlierer
+        if node.loserTo is not None:
+            target, sideIndex = node.loserTo
+            target.slots[sideIndex] = None
+        if node.winnerTo is None:
+            continue
+
+        target, sideIndex = node.winnerTo
+        if not present:
+            target.slots[sideIndex] = None
+            continue
+
+        source = node.slots[present[0]]
+        target.slots[sideIndex] = source
+        if isinstance(source, tuple):
+            kind, feeder = source
+            if kind == "W":
+                feeder.winnerTo = (target, sideIndex)
+            else:
+                feeder.loserTo = (target, sideIndex)
+
+
+@transaction.atomic
+def generateDoubleElim(
+    tournament: Tournament,
+    *,
+    seededPlayers: list[Player] | None = None,
+    shuffleSeed: int | None = None,
+    grandFinalReset: bool = True,
+    overwrite: bool = True,
+) -> list[Match]:
+    """
+    Erzeugt ein Double Elimination Bracket für beliebig viele Spieler (>= 2).
+
+    Winners Bracket wie generateSingleElim (Standard-Setzliste, Freilose für die besten Seeds).
+    Verlierer fallen über loser_next_match ins Losers Bracket: Runde 0 paart die Verlierer
+    aus Winners-Runde 0, danach abwechselnd Drop-in-Runde (Verlierer der nächsten
+    Winners-Runde, in wechselnder Reihenfolge gegen frühe Rematches) und Paarungsrunde.
+    Grand Final: Winners-Champion LEFT, Losers-Champion RIGHT. Mit grandFinalReset gibt es
+    ein zweites Grand Final, falls der Losers-Champion das erste gewinnt.
+
+    Matches ohne zwei mögliche Teilnehmer (Freilose) werden nicht angelegt, ihre
+    Zubringer werden direkt weiterverlinkt. Eingefügt wird rückwärts, ein bulk_create pro Runde.
+    """
     rng = random.Random(shuffleSeed)
-    rng.shuffle(players)
+    if seededPlayers is None:
+        players = list(tournament.players.all().order_by("id"))
+        rng.shuffle(players)
+    else:
+        players = list(seededPlayers)
+
+    if len(players) < 2:
+        raise ValueError(f"Need at least 2 players, got {len(players)}")
+
+    bosses = list(Boss.objects.all())
+    if not bosses:
+        raise ValueError("No Bosses found. Please create at least 1 Boss before generating matches.")
+
+    slots = bracketSlots(players)
+    size = len(slots)
+    roundCount = size.bit_length() - 1
+
+    def newRound(bracket: str, roundIndex: int, count: int) -> list[_Node]:
+        return [
+            _Node(Match(
+                tournament=tournament,
+                bracket=bracket,
+                boss=rng.choice(bosses),
+                first_pick_side=MatchSide.LEFT,
+                round_index=roundIndex,
+                match_index=i + 1,
+            ))
+            for i in range(count)
+        ]
+
+    # Winners Bracket
+    winners = [newRound(BracketType.WINNERS, r, size >> (r + 1)) for r in range(roundCount)]
+    for i, node in enumerate(winners[0]):
+        node.slots = [slots[2 * i], slots[2 * i + 1]]
+    for r in range(roundCount - 1):
+        for i, node in enumerate(winners[r]):
+            _link(node, "W", winners[r + 1][i // 2], i % 2)
+
+    # Losers Bracket: 2 * (roundCount - 1) Runden
+    losers = []
+    if roundCount >= 2:
+        losers.append(newRound(BracketType.LOSERS, 0, size >> 2))
+        for i, node in enumerate(winners[0]):
+            _link(node, "L", losers[0][i // 2], i % 2)
+
+        for j in range(1, roundCount):
+            count = size >> (j + 1)
+            dropRound = newRound(BracketType.LOSERS, len(losers), count)
+            for m, node in enumerate(dropRound):
+                _link(losers[-1][m], "W", node, 0)
+                dropIndex = m if j % 2 == 0 else count - 1 - m
+                _link(winners[j][dropIndex], "L", node, 1)
+            losers.append(dropRound)
+
+            if j < roundCount - 1:
+                pairRound = newRound(BracketType.LOSERS, len(losers), count // 2)
+                for m, node in enumerate(dropRound):
+                    _link(node, "W", pairRound[m // 2], m % 2)
+                losers.append(pairRound)
+
+    # Grand Final (+ Reset)
+    grandFinal = newRound(BracketType.GRAND_FINAL, 0, 1)[0]
+    _link(winners[-1][0], "W", grandFinal, 0)
+    if losers:
+        _link(losers[-1][0], "W", grandFinal, 1)
+    else:
+        _link(winners[-1][0], "L", grandFinal, 1)
+    finals = [[grandFinal]]
+    if grandFinalReset:
+        reset = newRound(BracketType.GRAND_FINAL, 1, 1)[0]
+        _link(grandFinal, "W", reset, 0)
+        _link(grandFinal, "L", reset, 1)
+        finals.append([reset])
+
+    rounds = winners + losers + finals
+    _collapseByes([node for roundNodes in rounds for node in roundNodes])
+
+    for roundNodes in rounds:
+        for node in roundNodes:
+            if not node.alive:
+                continue
+            match = node.match
+            for sideIndex, source in enumerate(node.slots):
+                if isinstance(source, Player):
+                    setattr(match, "player_left" if sideIndex == 0 else "player_right", source)
+            if node.winnerTo is not None:
+                target, sideIndex = node.winnerTo
+                match.next_match, match.next_side = target.match, _SIDES[sideIndex]
+            if node.loserTo is not None:
+                target, sideIndex = node.loserTo
+                match.loser_next_match, match.loser_next_side = target.match, _SIDES[sideIndex]
 
     if overwrite:
-        Match.objects.filter(tournament=tournament).delete()
-
-    # Finale
-    finalMatch = Match.objects.create(
-        tournament=tournament,
-        player_left=None,
-        player_right=None,
-        boss=random.choice(bosses),
-        first_pick_side=MatchSide.LEFT,
-        winner_player=None,
-        round_index=2,
-        match_index=1,
-        next_match=None,
-        next_side=None,
-    )
-
-    # Runde 1 (Halbfinale)
-    semi1 = Match.objects.create(
-        tournament=tournament,
-        player_left=None,
-        player_right=None,
-        boss=random.choice(bosses),
-        first_pick_side=MatchSide.LEFT,
-        winner_player=None,
-        round_index=1,
-        match_index=1,
-        next_match=finalMatch,
-        next_side=MatchSide.LEFT,
-    )
-    semi2 = Match.objects.create(
-        tournament=tournament,
-        player_left=None,
-        player_right=None,
-        boss=random.choice(bosses),
-        first_pick_side=MatchSide.LEFT,
-        winner_player=None,
-        round_index=1,
-        match_index=2,
-        next_match=finalMatch,
-        next_side=MatchSide.RIGHT,
-    )
-
-    # Runde 0 (Viertelfinale) – echte Losung
-    q1 = Match.objects.create(
-        tournament=tournament,
-        player_left=players[0],
-        player_right=players[1],
-        boss=random.choice(bosses),
-        first_pick_side=MatchSide.LEFT,
-        winner_player=None,
-        round_index=0,
-        match_index=1,
-        next_match=semi1,
-        next_side=MatchSide.LEFT,
-    )
-    q2 = Match.objects.create(
-        tournament=tournament,
-        player_left=players[2],
-        player_right=players[3],
-        boss=random.choice(bosses),
-        first_pick_side=MatchSide.LEFT,
-        winner_player=None,
-        round_index=0,
-        match_index=2,
-        next_match=semi1,
-        next_side=MatchSide.RIGHT,
-    )
-    q3 = Match.objects.create(
-        tournament=tournament,
-        player_left=players[4],
-        player_right=players[5],
-        boss=random.choice(bosses),
-        first_pick_side=MatchSide.LEFT,
-        winner_player=None,
-        round_index=0,
-        match_index=3,
-        next_match=semi2,
-        next_side=MatchSide.LEFT,
-    )
-    q4 = Match.objects.create(
-        tournament=tournament,
-        player_left=players[6],
-        player_right=players[7],
-        boss=random.choice(bosses),
-        first_pick_side=MatchSide.LEFT,
-        winner_player=None,
-        round_index=0,
-        match_index=4,
-        next_match=semi2,
-        next_side=MatchSide.RIGHT,
-    )
-
-    return [q1, q2, q3, q4, semi1, semi2, finalMatch]
+        Match.objects.filter(tournament=tournament, bracket__in=ELIMINATION_BRACKETS).delete()
+
+    # Ziele vor Zubringern einfügen
+    for roundNodes in reversed(rounds):
+        Match.objects.bulk_create([node.match for node in roundNodes if node.alive])
+
+    invalidateBracketTree(tournament.id)
+    return [node.match for roundNodes in rounds for node in roundNodes if node.alive]
+
+
+def advanceMatchResult(match: Match) -> list[Match]:
+    """
+    Trägt Sieger (next_match) und Verlierer (loser_next_match) in ihre nächsten Matches ein.
+    Beide Zielzeilen werden mit einer Query gesperrt und in derselben Transaktion geschrieben
+    (läuft in der Transaktion des Aufrufers). Gibt die geänderten Matches zurück.
+    """
+    if match.winner_player_id is None:
+        return []
+
+    loserId = match.player_right_id if match.winner_player_id == match.player_left_id else match.player_left_id
+
+    # Grand Final: gewinnt der Winners-Champion (LEFT), entfällt der Reset
+    if (
+        match.bracket == BracketType.GRAND_FINAL
+        and match.round_index == 0
+        and match.next_match_id is not None
+        and match.winner_player_id == match.player_left_id
+    ):
+        Match.objects.filter(id=match.next_match_id).delete()
+        match.next_match = None
+        match.next_side = None
+        match.loser_next_match = None
+        match.loser_next_side = None
+        return []
+
+    targets = [
+        (match.next_match_id, match.next_side, match.winner_player_id),
+        (match.loser_next_match_id, match.loser_next_side, loserId),
+    ]
+    targets = [t for t in targets if t[0] is not None]
+    if not targets:
+        return []
+
+    nextMatches = Match.objects.select_for_update().in_bulk([t[0] for t in targets])
+    for nextMatchId, side, playerId in targets:
+        nextMatch = nextMatches[nextMatchId]
+        if side == MatchSide.LEFT:
+            nextMatch.player_left_id = playerId
+        else:
+            nextMatch.player_right_id = playerId
+
+    for nextMatch in nextMatches.values():
+        nextMatch.save(update_fields=["player_left", "player_right"])
+    return list(nextMatches.values())
+
+
+def generateSingleElim8(tournament: Tournament, *, shuffleSeed: int | None = None, overwrite: bool = True) -> list[Match]:
+    """
+    Erzeugt 8er Single Elimination Bracket (3 Runden, 7 Matches), siehe generateSingleElim.
+    """
+    playerCount = tournament.players.count()
+    if playerCount != 8:
+        raise ValueError(f"Need exactly 8 players, got {playerCount}")
+
+    return generateSingleElim(tournament, shuffleSeed=shuffleSeed, overwrite=overwrite)
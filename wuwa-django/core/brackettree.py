@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import BracketType, Match, Tournament
+
+
+BRACKET_CACHE_ALIAS = "default"
+BRACKET_CACHE_TIMEOUT = 60 * 60
+
+# Reihenfolge der Brackets im Baum
+_BRACKET_ORDER = {value: i for i, value in enumerate(BracketType.values)}
+
+_TREE_FIELDS = (
+    "id",
+    "bracket",
+    "group_index",
+    "round_index",
+    "match_index",
+    "player_left_id",
+    "player_left__name",
+    "player_right_id",
+    "player_right__name",
+    "winner_player_id",
+    "left_time_ms",
+    "right_time_ms",
+    "started_at",
+    "finished_at",
+    "next_match_id",
+    "next_side",
+    "loser_next_match_id",
+    "loser_next_side",
+)
+
+
+def _treeKey(tournamentId: int) -> str:
+    return f"bracket:tree:{tournamentId}"
+
+
+def _generationKey(tournamentId: int) -> str:
+    return f"bracket:generation:{tournamentId}"
+
+
+def _player(playerId, name):
+    return {"id": playerId, "name": name} if playerId is not None else None
+
+
+def _status(row: dict) -> str:
+    if row["finished_at"] is not None:
+        return "finished"
+    if row["started_at"] is not None:
+        return "live"
+    return "pending"
+
+
+def buildBracketTree(tournamentId: int) -> dict:
+    """
+    Kompakter Baum brackets -> rounds -> matches aus einer einzigen Query (values() mit Spielernamen).
+    Verlinkung über nextMatchId/loserNextMatchId, Draft-Aktionen sind nicht enthalten.
+    """
+    rows = (
+        Match.objects.filter(tournament_id=tournamentId)
+        .order_by("bracket", "round_index", "group_index", "match_index", "id")
+        .values(*_TREE_FIELDS)
+    )
+
+    brackets: dict[str, dict[int, list]] = {}
+    for row in rows:
+        rounds = brackets.setdefault(row["bracket"], {})
+        rounds.setdefault(row["round_index"], []).append({
+            "id": row["id"],
+            "matchIndex": row["match_index"],
+            "groupIndex": row["group_index"],
+            "status": _status(row),
+            "playerLeft": _player(row["player_left_id"], row["player_left__name"]),
+            "playerRight": _player(row["player_right_id"], row["player_right__name"]),
+            "winnerId": row["winner_player_id"],
+            "leftTimeMs": row["left_time_ms"],
+            "rightTimeMs": row["right_time_ms"],
+            "nextMatchId": row["next_match_id"],
+            "nextSide": row["next_side"],
+            "loserNextMatchId": row["loser_next_match_id"],
+            "loserNextSide": row["loser_next_side"],
+        })
+
+    return {
+        "tournamentId": tournamentId,
+        "brackets": [
+            {
+                "bracket": bracket,
+                "rounds": [{"roundIndex": roundIndex, "matches": matches} for roundIndex, matches in rounds.items()],
+            }
+            for bracket, rounds in sorted(brackets.items(), key=lambda item: _BRACKET_ORDER.get(item[0], len(_BRACKET_ORDER)))
+        ],
+    }
+
+
+def getBracketTreeJson(tournamentId: int) -> str:
+    """
+    Bracket-Baum als fertiger JSON-Text, pro Turnier gecacht. Im warmen Fall ein Cache-Lookup,
+    sonst eine Query. Wirft Tournament.DoesNotExist für unbekannte Turniere.
+    """
+    cache = caches[BRACKET_CACHE_ALIAS]
+    text = cache.get(_treeKey(tournamentId))
+    if text is not None:
+        return text
+
+    if not Tournament.objects.filter(id=tournamentId).exists():
+        raise Tournament.DoesNotExist(f"Tournament {tournamentId} does not exist.")
+
+    generation = cache.get(_generationKey(tournamentId), 0)
+    text = json.dumps(buildBracketTree(tournamentId), separators=(",", ":"))
+    cache.set(_treeKey(tournamentId), text, BRACKET_CACHE_TIMEOUT)
+
+    # Während des Ladens invalidiert: eventuell veralteten Baum nicht stehen lassen
+    if cache.get(_generationKey(tournamentId), 0) != generation:
+        cache.delete(_treeKey(tournamentId))
+    return text
+
+
+def bracketGeneration(tournamentId: int) -> int:
+    """
+    Zähler, der bei jeder Invalidierung des Turniers steigt – für abgeleitete Caches
+    (z.B. Simulation), die mit dem Bracket-Baum zusammen ungültig werden.
+    """
+    return caches[BRACKET_CACHE_ALIAS].get(_generationKey(tournamentId), 0)
+
+
+def _forgetTree(tournamentId: int) -> None:
+    cache = caches[BRACKET_CACHE_ALIAS]
+    try:
+        cache.incr(_generationKey(tournamentId))
+    except ValueError:
+        cache.set(_generationKey(tournamentId), 1, None)
+    cache.delete(_treeKey(tournamentId))
+
+
+def invalidateBracketTree(tournamentId: int | None) -> None:
+    """
+    Gecachten Baum des Turniers verwerfen, sobald die laufende Transaktion committet.
+    Aufrufen überall, wo sich Paarungen, Zeiten, Status oder Sieger eines Matches ändern.
+    """
+    if tournamentId is None:
+        return
+    transaction.on_commit(lambda: _forgetTree(tournamentId))
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import threading
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Resonator
+
+
+class ResonatorCatalog:
+    """
+    Prozessweiter Katalog aller aktivierten Resonatoren.
+    Jeder Resonator bekommt einen dichten Index, Mengen (used/banned/available)
+    werden als Integer-Bitmasken dargestellt.
+    """
+
+    def __init__(self, resonators: list[Resonator]):
+        self.resonators = resonators
+        self._indexById = {r.id: i for i, r in enumerate(resonators)}
+        self.allMask = (1 << len(resonators)) - 1
+
+    def __len__(self) -> int:
+        return len(self.resonators)
+
+    def indexOf(self, resonatorId: int) -> int | None:
+        return self._indexById.get(resonatorId)
+
+    def get(self, resonatorId: int) -> Resonator | None:
+        index = self._indexById.get(resonatorId)
+        return self.resonators[index] if index is not None else None
+
+    def maskOf(self, resonatorIds) -> int:
+        # Deaktivierte/unbekannte IDs sind nicht im Pool und fallen einfach weg
+        mask = 0
+        for resonatorId in resonatorIds:
+            index = self._indexById.get(resonatorId)
+            if index is not None:
+                mask |= 1 << index
+        return mask
+
+    def contains(self, mask: int, resonatorId: int) -> bool:
+        index = self._indexById.get(resonatorId)
+        return index is not None and bool((mask >> index) & 1)
+
+    def resonatorsIn(self, mask: int) -> list[Resonator]:
+        result = []
+        while mask:
+            lowBit = mask & -mask
+            result.append(self.resonators[lowBit.bit_length() - 1])
+            mask ^= lowBit
+        return result
+
+
+_catalogLock = threading.Lock()
+_catalog: ResonatorCatalog | None = None
+
+
+def getResonatorCatalog() -> ResonatorCatalog:
+    global _catalog
+    catalog = _catalog
+    if catalog is not None:
+        return catalog
+
+    with _catalogLock:
+        if _catalog is None:
+            _catalog = ResonatorCatalog(list(Resonator.objects.filter(is_enabled=True).order_by("id")))
+        return _catalog
+
+
+def invalidateResonatorCatalog() -> None:
+    global _catalog
+    with _catalogLock:
+        _catalog = None
+
+
+@receiver(post_save, sender=Resonator)
+@receiver(post_delete, sender=Resonator)
+def _resonatorChanged(sender, **kwargs):
+    invalidateResonatorCatalog()
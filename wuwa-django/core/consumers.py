@@ -1,10 +1,36 @@
-from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.generic.websocket import AsyncJsonWebsocketConsumer, AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.template.loader import render_to_string
-from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
 
-from .models import Match, UserRole
-from .draft import buildDraftContext
+from .models import DraftActionType, Match
+from .draft import DraftConflict, DraftRejected, getDraftRole
+from .draftcache import getDraftHtml, getDraftSnapshot, getSnapshotHtml, getSpectatorJson
+from .draftservice import confirmDraftChoice, resetDraft
+
+
+# Websocket-Kommando -> Draft-Aktion (Feldname wie im Ban/Pick-Formular)
+_CHOICE_COMMANDS = {
+    "ban": (DraftActionType.BAN, "ban"),
+    "pick": (DraftActionType.PICK, "pick"),
+}
+
+
+def loadConnectPayload(matchId: int, user) -> tuple[str, dict] | None:
+    """
+    Rolle + initialer draftState für einen neuen Socket, beides aus demselben Snapshot.
+    Bei warmem Draft-Cache ohne DB-Zugriff. None = kein Zugriff (oder Match existiert nicht).
+    """
+    try:
+        snapshot = getDraftSnapshot(matchId)
+    except Match.DoesNotExist:
+        return None
+
+    role = getDraftRole(user, snapshot.match)
+    if role is None:
+        return None
+
+    html = getSnapshotHtml(snapshot, role)
+    return role, {"type": "draftState", "version": snapshot.version, "html": html}
 
 
 class MatchDraftConsumer(AsyncJsonWebsocketConsumer):
@@ -13,48 +39,99 @@ class MatchDraftConsumer(AsyncJsonWebsocketConsumer):
         self.matchId = int(self.scope["url_route"]["kwargs"]["matchId"])
         self.groupName = f"matchDraft_{self.matchId}"
 
+        # User kommt fertig geladen aus dem AuthMiddlewareStack
         user = self.scope["user"]
         if not user.is_authenticated:
             await self.close()
             return
 
-        allowed = await self._userAllowed(user.id)
-        if not allowed:
+        # Autorisieren und Initial-Payload in einem Thread-Hop
+        initial = await database_sync_to_async(loadConnectPayload)(self.matchId, user)
+        if initial is None:
             await self.close()
             return
+        self.role, payload = initial
 
         await self.channel_layer.group_add(self.groupName, self.channel_name)
         await self.accept()
-
-        payload = await self._buildPayload(user.id)
         await self.send_json(payload)
 
     async def disconnect(self, code):
         await self.channel_layer.group_discard(self.groupName, self.channel_name)
 
+    async def receive_json(self, content, **kwargs):
+        """
+        Kommandos: {"command": "ban"|"pick", "resonatorId": ..., "requestId": ...}
+        und {"command": "reset"} (nur Host). Antwort ist ein ack mit der neuen draft_version,
+        der neue Stand selbst kommt über den Group-Broadcast. Bei einem Versionskonflikt
+        kommt ein ack mit "retryable": true, das Kommando kann unverändert erneut gesendet werden.
+        """
+        command = content.get("command")
+        requestId = content.get("requestId")
+
+        if command in _CHOICE_COMMANDS:
+            actionType, fieldName = _CHOICE_COMMANDS[command]
+            result = await self._runCommand(confirmDraftChoice, actionType, {fieldName: content.get("resonatorId")})
+        elif command == "reset":
+            result = await self._runCommand(resetDraft)
+        else:
+            result = {"ok": False, "error": "Unknown command."}
+
+        await self.send_json({"type": "ack", "requestId": requestId, "command": command, **result})
+
     async def draft_refresh(self, event):
-        await self.send_json({"type": "draft_refresh"})
+        # Die Nachricht trägt nur die Version: Variante der eigenen Rolle aus dem Render-Cache holen
+        try:
+            html, version = await database_sync_to_async(getDraftHtml)(self.matchId, self.role)
+        except Match.DoesNotExist:
+            await self.send_json({"type": "draft_refresh"})
+            return
+        await self.send_json({"type": "draftState", "version": version, "html": html})
 
     async def page_refresh(self, event):
         await self.send_json({"type": "page_refresh"})
 
     @database_sync_to_async
-    def _userAllowed(self, userId):
-        User = get_user_model()
-        user = User.objects.select_related("player").get(id=userId)
-        match = Match.objects.get(id=self.matchId)
+    def _runCommand(self, func, *args):
+        try:
+            version = func(self.matchId, self.scope["user"], *args)
+        except PermissionDenied:
+            return {"ok": False, "error": "Forbidden"}
+        except DraftConflict as e:
+            return {"ok": False, "error": str(e), "retryable": True}
+        except (DraftRejected, Match.DoesNotExist) as e:
+            return {"ok": False, "error": str(e) or "Rejected."}
+        return {"ok": True, "version": version}
+
+
+class MatchSpectateConsumer(AsyncWebsocketConsumer):
+    """
+    Anonymer, read-only Kanal für Overlays/Zuschauer. Bekommt bei jeder Änderung den
+    vorab serialisierten Zuschauer-Snapshot – kein DB-Zugriff und kein Rendering pro Socket.
+    """
+
+    async def connect(self):
+        self.matchId = int(self.scope["url_route"]["kwargs"]["matchId"])
+        self.groupName = f"matchSpectate_{self.matchId}"
 
-        isHost = user.role in (UserRole.ADMIN, UserRole.COMMENTATOR)
-        isPlayer = user.player_id in (match.player_left_id, match.player_right_id)
-        return isHost or isPlayer
+        # Cache-Zugriff (Redis/Memcached) blockiert: immer im Thread, nie im Event-Loop.
+        # Nur beim ersten Zuschauer einer Version wird dabei aus der DB geladen
+        try:
+            text = await database_sync_to_async(getSpectatorJson)(self.matchId)
+        except Match.DoesNotExist:
+            await self.close()
+            return
 
-    @database_sync_to_async
-    def _buildPayload(self, userId):
-        User = get_user_model()
-        user = User.objects.select_related("player").get(id=userId)
-        match = Match.objects.get(id=self.matchId)
+        await self.channel_layer.group_add(self.groupName, self.channel_name)
+        await self.accept()
+        await self.send(text_data=text)
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.groupName, self.channel_name)
 
-        context = buildDraftContext(match, user)
-        html = render_to_string("core/partials/match_draft.html", context)
+    async def receive(self, text_data=None, bytes_data=None):
+        # Read-only: Eingaben werden ignoriert
+        pass
 
-        return {"type": "draftState", "html": html}
+    async def spectator_snapshot(self, event):
+        await self.send(text_data=event["text"])
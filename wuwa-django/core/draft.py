@@ -1,25 +1,32 @@
 from __future__ import annotations
 
+from typing import NamedTuple
+
+from django.template.loader import render_to_string
+
 from .models import (
     DraftActionType,
     MatchDraftAction,
     MatchSide,
-    Resonator,
     UserRole,
 )
+from .catalog import ResonatorCatalog, getResonatorCatalog
+from .draftformat import CompiledDraftFormat, DraftTurn, getDraftFormat, relativeSide
 from .forms import BanConfirmForm, PickConfirmForm
 
+DRAFT_TEMPLATE = "core/partials/match_draft.html"
 
-BAN_COUNT = 3
-PICK_COUNT = 3
+DRAFT_ROLE_HOST = "HOST"
+DRAFT_ROLES = (DRAFT_ROLE_HOST, "LEFT", "RIGHT")
 
+CSRF_TOKEN_PLACEHOLDER = "__csrf_token__"
 
 
 def _getUserSide(user, match) -> str | None:
     if not getattr(user, "is_authenticated", False):
         return None
-    player = getattr(user, "player", None)
-    if player is None:
+    # Nur die FK-ID vergleichen – kein Query für user.player
+    if getattr(user, "player_id", None) is None:
         return None
     if user.player_id == match.player_left_id:
         return MatchSide.LEFT
@@ -28,239 +35,245 @@ def _getUserSide(user, match) -> str | None:
     return None
 
 
-def _getCurrentBanSlot(match) -> int:
-    lockedSlots = (
-        MatchDraftAction.objects
-        .filter(match=match, action_type=DraftActionType.BAN, is_locked=True)
-        .values_list("slot_index", flat=True)
-        .distinct()
-    )
-    return len(set(lockedSlots)) + 1
+class DraftRejected(Exception):
+    """
+    Draft-Aktion abgelehnt (nicht am Zug, Resonator nicht verfügbar, ...).
+    """
+
+
+class DraftConflict(DraftRejected):
+    """
+    Der Draft hat sich seit dem gelesenen Snapshot geändert (draft_version passt nicht).
+    Die Aktion kann mit dem neuen Stand wiederholt werden.
+    """
+
+
+class DraftState:
+    """
+    Snapshot aller Draft-Actions eines Matches.
+    Lädt alle MatchDraftAction-Zeilen (inkl. Resonator) mit genau einer Query,
+    alle Listen, Slots und ID-Sets werden danach in Python berechnet.
+    Der aktuelle Zug ergibt sich aus der Übergangstabelle des Turnier-Formats.
+    """
+
+    def __init__(self, match, actions: list[MatchDraftAction], draftFormat: CompiledDraftFormat):
+        self.match = match
+        self.actions = actions
+        self.format = draftFormat
+
+    @classmethod
+    def load(cls, match) -> "DraftState":
+        actions = list(
+            MatchDraftAction.objects.select_related("resonator")
+            .filter(match=match)
+            .order_by("slot_index", "step_index")
+        )
+        draftFormat = getDraftFormat(match.tournament if match.tournament_id is not None else None)
+        return cls(match, actions, draftFormat)
+
+    def filter(self, actionType: str, *, actingSide=None, targetSide=None, isLocked=None, slotIndex=None) -> list[MatchDraftAction]:
+        return [
+            a for a in self.actions
+            if a.action_type == actionType
+            and (actingSide is None or a.acting_side == actingSide)
+            and (targetSide is None or a.target_side == targetSide)
+            and (isLocked is None or a.is_locked == isLocked)
+            and (slotIndex is None or a.slot_index == slotIndex)
+        ]
+
+    def currentTurn(self) -> DraftTurn | None:
+        """
+        Erster Zug der Tabelle, dessen Slots noch nicht alle gelockt sind (None = Draft fertig).
+        """
+        locked = {
+            (a.action_type, relativeSide(self.match, a.acting_side), a.slot_index)
+            for a in self.actions
+            if a.is_locked
+        }
+        for turn in self.format.turns:
+            if any((turn.actionType, side, slotIndex) not in locked for side, slotIndex in turn.slots):
+                return turn
+        return None
+
+    def isPhaseDone(self, actionType: str) -> bool:
+        turn = self.currentTurn()
+        return turn is None or turn.number > self.format.lastTurnNumber(actionType)
+
+    def sidesOf(self, turn: DraftTurn) -> list[str]:
+        return [side for side in (MatchSide.LEFT, MatchSide.RIGHT) if turn.slotFor(relativeSide(self.match, side)) is not None]
+
+    def slotFor(self, turn: DraftTurn, side: str) -> int | None:
+        return turn.slotFor(relativeSide(self.match, side))
+
+    def nextSlot(self, actionType: str, side: str) -> int:
+        return len(self.filter(actionType, actingSide=side, isLocked=True)) + 1
+
+    def slotCount(self, actionType: str, side: str) -> int:
+        return self.format.slotCount(actionType, relativeSide(self.match, side))
+
+    def pendingFor(self, actionType: str, side: str, slotIndex: int) -> MatchDraftAction | None:
+        pending = self.filter(actionType, actingSide=side, slotIndex=slotIndex, isLocked=False)
+        return pending[0] if pending else None
+
+    def usedResonatorIds(self, actionType: str, side: str) -> set[int]:
+        return {a.resonator_id for a in self.filter(actionType, actingSide=side)}
 
+    def bannedAgainst(self, side: str) -> set[int]:
+        return {a.resonator_id for a in self.filter(DraftActionType.BAN, targetSide=side, isLocked=True)}
 
-# def _getBanAvailable(match, *, allowReselectAction: MatchDraftAction | None):
-#     usedIds = set(
-#         MatchDraftAction.objects.filter(match=match).values_list("resonator_id", flat=True)
-#     )
-#     if allowReselectAction is not None:
-#         usedIds.discard(allowReselectAction.resonator_id)
+    def availableMask(self, catalog: ResonatorCatalog, actionType: str, side: str, slotIndex: int) -> int:
+        """
+        Bitmaske (Index im Katalog) der Resonatoren, die die Seite im Slot wählen darf.
+        """
+        usedIds = self.usedResonatorIds(actionType, side)
+        # Pending Auswahl im aktuellen Slot darf "re-choosed" werden
+        pending = self.pendingFor(actionType, side, slotIndex)
+        if pending is not None:
+            usedIds.discard(pending.resonator_id)
 
-#     return Resonator.objects.filter(is_enabled=True).exclude(id__in=usedIds)
+        blockedMask = catalog.maskOf(usedIds)
+        if actionType == DraftActionType.PICK:
+            blockedMask |= catalog.maskOf(self.bannedAgainst(side))
+        return catalog.allMask & ~blockedMask
 
 
-def _getCurrentPickSlot(match) -> int:
-    lockedSlots = (
-        MatchDraftAction.objects
-        .filter(match=match, action_type=DraftActionType.PICK, is_locked=True)
-        .values_list("slot_index", flat=True)
-        .distinct()
+def _isHost(user) -> bool:
+    return bool(
+        getattr(user, "is_authenticated", False)
+        and getattr(user, "role", None) in (UserRole.ADMIN, UserRole.COMMENTATOR)
     )
-    return len(set(lockedSlots)) + 1
 
 
-def buildDraftContext(match, requestUser) -> dict:
-    isHost = bool(
-        getattr(requestUser, "is_authenticated", False)
-        and getattr(requestUser, "role", None) in (UserRole.ADMIN, UserRole.COMMENTATOR)
+def getDraftRole(user, match) -> str | None:
+    """
+    Rolle für die Draft-Partial: Host geht vor Spielerseite, None = kein Zugriff.
+    """
+    if _isHost(user):
+        return DRAFT_ROLE_HOST
+    userSide = _getUserSide(user, match)
+    return str(userSide) if userSide is not None else None
+
+
+def buildDraftContext(match, requestUser, state: DraftState | None = None) -> dict:
+    return _buildDraftContext(
+        match,
+        state if state is not None else DraftState.load(match),
+        isHost=_isHost(requestUser),
+        userSide=_getUserSide(requestUser, match),
     )
-    userSide = _getUserSide(requestUser, match)
+
+
+def buildRoleDraftContext(match, role: str, state: DraftState) -> dict:
+    """
+    Kontext für eine Rollen-Variante (HOST/LEFT/RIGHT) statt für einen konkreten User.
+    """
+    isHost = role == DRAFT_ROLE_HOST
+    return _buildDraftContext(match, state, isHost=isHost, userSide=None if isHost else role)
+
+
+def renderDraftHtml(match, role: str, state: DraftState) -> str:
+    """
+    Rendert die Draft-Partial ohne Request. Der CSRF-Token ist ein Platzhalter,
+    den der Client (bzw. die HTTP-View) durch den eigenen Token ersetzt.
+    """
+    context = buildRoleDraftContext(match, role, state)
+    context["csrf_token"] = CSRF_TOKEN_PLACEHOLDER
+    return render_to_string(DRAFT_TEMPLATE, context)
+
+
+def _spectatorResonator(action: MatchDraftAction) -> dict:
+    return {"slug": action.resonator.slug, "name": action.resonator.name, "icon": action.resonator.icon_url}
+
+
+def buildSpectatorSnapshot(match, state: DraftState) -> dict:
+    """
+    Öffentlicher Stand für Overlays/Zuschauer: nur gelockte Bans/Picks,
+    Pending-Auswahl bleibt verborgen.
+    """
+    currentTurn = state.currentTurn()
+
+    def sideData(side: str, player, timeMs):
+        return {
+            "player": player.name if player is not None else None,
+            "bans": [_spectatorResonator(a) for a in state.filter(DraftActionType.BAN, actingSide=side, isLocked=True)],
+            "picks": [_spectatorResonator(a) for a in state.filter(DraftActionType.PICK, actingSide=side, isLocked=True)],
+            "timeMs": timeMs,
+        }
+
+    return {
+        "matchId": match.id,
+        "version": match.draft_version,
+        "phase": currentTurn.actionType if currentTurn is not None else "DONE",
+        "boss": match.boss.name if match.boss is not None else None,
+        "startedAt": match.started_at.isoformat() if match.started_at else None,
+        "finishedAt": match.finished_at.isoformat() if match.finished_at else None,
+        "winner": match.winner_player.name if match.winner_player is not None else None,
+        "left": sideData(MatchSide.LEFT, match.player_left, match.left_time_ms),
+        "right": sideData(MatchSide.RIGHT, match.player_right, match.right_time_ms),
+    }
+
+
+def _buildDraftContext(match, state: DraftState, *, isHost: bool, userSide: str | None) -> dict:
     isPlayerInMatch = userSide is not None
 
-    banPhaseDone = bool(match.left_bans_confirmed and match.right_bans_confirmed)
-    pickPhaseDone = bool(match.left_picks_confirmed and match.right_picks_confirmed)
+    currentTurn = state.currentTurn()
+    banPhaseDone = state.isPhaseDone(DraftActionType.BAN)
+    pickPhaseDone = state.isPhaseDone(DraftActionType.PICK)
+    isMyTurn = bool(isPlayerInMatch and currentTurn is not None and userSide in state.sidesOf(currentTurn))
 
-    currentBanSlot = _getCurrentBanSlot(match)
+    # Slot-Anzeige aus Sicht der eigenen Seite (Host: Seite mit First Pick)
+    countSide = userSide or match.first_pick_side or MatchSide.LEFT
+    currentBanSlot = state.nextSlot(DraftActionType.BAN, countSide)
+    currentPickSlot = state.nextSlot(DraftActionType.PICK, countSide)
 
-    bansLeftToRight = (
-        MatchDraftAction.objects.select_related("resonator")
-        .filter(
-            match=match,
-            action_type=DraftActionType.BAN,
-            acting_side=MatchSide.LEFT,
-            target_side=MatchSide.RIGHT,
-            is_locked=True,
-        )
-        .order_by("slot_index")
-    )
-    bansRightToLeft = (
-        MatchDraftAction.objects.select_related("resonator")
-        .filter(
-            match=match,
-            action_type=DraftActionType.BAN,
-            acting_side=MatchSide.RIGHT,
-            target_side=MatchSide.LEFT,
-            is_locked=True,
-        )
-        .order_by("slot_index")
-    )
+    bansLeftToRight = state.filter(DraftActionType.BAN, actingSide=MatchSide.LEFT, targetSide=MatchSide.RIGHT, isLocked=True)
+    bansRightToLeft = state.filter(DraftActionType.BAN, actingSide=MatchSide.RIGHT, targetSide=MatchSide.LEFT, isLocked=True)
 
     # Pending – nur Host
-    bansLeftToRightPending = (
-        MatchDraftAction.objects.select_related("resonator")
-        .filter(
-            match=match,
-            action_type=DraftActionType.BAN,
-            acting_side=MatchSide.LEFT,
-            target_side=MatchSide.RIGHT,
-            is_locked=False,
-        )
-        .order_by("slot_index")
-    )
-    bansRightToLeftPending = (
-        MatchDraftAction.objects.select_related("resonator")
-        .filter(
-            match=match,
-            action_type=DraftActionType.BAN,
-            acting_side=MatchSide.RIGHT,
-            target_side=MatchSide.LEFT,
-            is_locked=False,
-        )
-        .order_by("slot_index")
-    )
+    bansLeftToRightPending = state.filter(DraftActionType.BAN, actingSide=MatchSide.LEFT, targetSide=MatchSide.RIGHT, isLocked=False)
+    bansRightToLeftPending = state.filter(DraftActionType.BAN, actingSide=MatchSide.RIGHT, targetSide=MatchSide.LEFT, isLocked=False)
 
     banPending = None
-    allowReselectAction = None
-    if isPlayerInMatch and (not banPhaseDone) and currentBanSlot <= BAN_COUNT:
-        banPending = (
-            MatchDraftAction.objects.select_related("resonator")
-            .filter(
-                match=match,
-                action_type=DraftActionType.BAN,
-                acting_side=userSide,
-                slot_index=currentBanSlot,
-                is_locked=False,
-            )
-            .first()
-        )
-        allowReselectAction = banPending
-
     banForm = None
     banAvailableCount = 0
-    if isPlayerInMatch and (not banPhaseDone) and currentBanSlot <= BAN_COUNT:
-        usedBanIds = set(
-            MatchDraftAction.objects.filter(
-                match=match,
-                action_type=DraftActionType.BAN,
-                acting_side=userSide,
-            ).values_list("resonator_id", flat=True)
-        )
-
-        if allowReselectAction is not None:
-            usedBanIds.discard(allowReselectAction.resonator_id)
+    if isMyTurn and currentTurn.actionType == DraftActionType.BAN:
+        banPending = state.pendingFor(DraftActionType.BAN, userSide, currentBanSlot)
 
-        available = Resonator.objects.filter(is_enabled=True).exclude(id__in=usedBanIds)
-        banForm = BanConfirmForm(available=available)
-        banAvailableCount = available.count()
+        catalog = getResonatorCatalog()
+        availableMask = state.availableMask(catalog, DraftActionType.BAN, userSide, currentBanSlot)
+        banForm = BanConfirmForm(catalog=catalog, availableMask=availableMask)
+        banAvailableCount = availableMask.bit_count()
 
     # Locked picks (für Anzeige)
-    picksLeft = (
-        MatchDraftAction.objects.select_related("resonator")
-        .filter(
-            match=match,
-            action_type=DraftActionType.PICK,
-            acting_side=MatchSide.LEFT,
-            target_side=MatchSide.LEFT,
-            is_locked=True,
-        )
-        .order_by("slot_index")
-    )
-
-    picksRight = (
-        MatchDraftAction.objects.select_related("resonator")
-        .filter(
-            match=match,
-            action_type=DraftActionType.PICK,
-            acting_side=MatchSide.RIGHT,
-            target_side=MatchSide.RIGHT,
-            is_locked=True,
-        )
-        .order_by("slot_index")
-    )
-
-    currentPickSlot = _getCurrentPickSlot(match)
+    picksLeft = state.filter(DraftActionType.PICK, actingSide=MatchSide.LEFT, targetSide=MatchSide.LEFT, isLocked=True)
+    picksRight = state.filter(DraftActionType.PICK, actingSide=MatchSide.RIGHT, targetSide=MatchSide.RIGHT, isLocked=True)
 
     # Pending picks – nur Host
-    picksLeftPending = (
-        MatchDraftAction.objects.select_related("resonator")
-        .filter(
-            match=match,
-            action_type=DraftActionType.PICK,
-            acting_side=MatchSide.LEFT,
-            target_side=MatchSide.LEFT,
-            is_locked=False,
-        )
-        .order_by("slot_index")
-    )
-
-    picksRightPending = (
-        MatchDraftAction.objects.select_related("resonator")
-        .filter(
-            match=match,
-            action_type=DraftActionType.PICK,
-            acting_side=MatchSide.RIGHT,
-            target_side=MatchSide.RIGHT,
-            is_locked=False,
-        )
-        .order_by("slot_index")
-    )
+    picksLeftPending = state.filter(DraftActionType.PICK, actingSide=MatchSide.LEFT, targetSide=MatchSide.LEFT, isLocked=False)
+    picksRightPending = state.filter(DraftActionType.PICK, actingSide=MatchSide.RIGHT, targetSide=MatchSide.RIGHT, isLocked=False)
 
     pickPending = None
-    allowReselectPick = None
-    if isPlayerInMatch and banPhaseDone and (not pickPhaseDone) and currentPickSlot <= PICK_COUNT:
-        pickPending = (
-            MatchDraftAction.objects.select_related("resonator")
-            .filter(
-                match=match,
-                action_type=DraftActionType.PICK,
-                acting_side=userSide,
-                slot_index=currentPickSlot,
-                is_locked=False,
-            )
-            .first()
-        )
-        allowReselectPick = pickPending
-
     pickForm = None
     pickAvailableCount = 0
-    if isPlayerInMatch and banPhaseDone and (not pickPhaseDone) and currentPickSlot <= PICK_COUNT:
-        usedPickIds = set(
-            MatchDraftAction.objects.filter(
-                match=match,
-                action_type=DraftActionType.PICK,
-                acting_side=userSide,
-            ).values_list("resonator_id", flat=True)
-        )
-
-        if allowReselectPick is not None:
-            usedPickIds.discard(allowReselectPick.resonator_id)
-
-        bannedAgainstMe = set(
-            MatchDraftAction.objects.filter(
-                match=match,
-                action_type=DraftActionType.BAN,
-                target_side=userSide,
-                is_locked=True,
-            ).values_list("resonator_id", flat=True)
-        )
+    if isMyTurn and currentTurn.actionType == DraftActionType.PICK:
+        pickPending = state.pendingFor(DraftActionType.PICK, userSide, currentPickSlot)
 
-        available = (
-            Resonator.objects.filter(is_enabled=True)
-            .exclude(id__in=usedPickIds)
-            .exclude(id__in=bannedAgainstMe)
-        )
-
-        pickForm = PickConfirmForm(available=available)
-        pickAvailableCount = available.count()
+        catalog = getResonatorCatalog()
+        availableMask = state.availableMask(catalog, DraftActionType.PICK, userSide, currentPickSlot)
+        pickForm = PickConfirmForm(catalog=catalog, availableMask=availableMask)
+        pickAvailableCount = availableMask.bit_count()
 
     return {
         "match": match,
         "isHost": isHost,
         "userSide": userSide,
         "isPlayerInMatch": isPlayerInMatch,
+        "draftPhase": currentTurn.actionType if currentTurn is not None else "DONE",
+        "isMyTurn": isMyTurn,
         "banPhaseDone": banPhaseDone,
         "pickPhaseDone": pickPhaseDone,
         "currentBanSlot": currentBanSlot,
-        "banCount": BAN_COUNT,
+        "banCount": state.slotCount(DraftActionType.BAN, countSide),
         "banPending": banPending,
         "banForm": banForm,
         "banAvailableCount": banAvailableCount,
@@ -271,10 +284,110 @@ def buildDraftContext(match, requestUser) -> dict:
         "picksLeft": picksLeft,
         "picksRight": picksRight,
         "currentPickSlot": currentPickSlot,
-        "pickCount": PICK_COUNT,
+        "pickCount": state.slotCount(DraftActionType.PICK, countSide),
         "pickPending": pickPending,
         "pickForm": pickForm,
         "pickAvailableCount": pickAvailableCount,
         "picksLeftPending": picksLeftPending if isHost else [],
         "picksRightPending": picksRightPending if isHost else [],
     }
+
+
+class DraftChoice(NamedTuple):
+    """
+    Validierte Ban/Pick-Auswahl, bereit zum Schreiben.
+    """
+    actionType: str
+    actingSide: str
+    targetSide: str
+    slotIndex: int
+    stepIndex: int
+    resonator: object
+    lockActionIds: tuple[int, ...] | None  # Pending-Actions der Gegenseite(n), None = Zug noch offen
+    matchUpdates: dict
+    draftDone: bool
+
+
+def planDraftChoice(match, state: DraftState, userSide: str, actionType: str, data) -> DraftChoice:
+    """
+    Validiert die Auswahl (data: POST-Daten mit "ban"/"pick") gegen den aktuellen Zug
+    der Übergangstabelle – reine Berechnung auf dem Snapshot, ohne Schreibzugriff.
+    Wirft DraftRejected.
+    """
+    turn = state.currentTurn()
+    if turn is None or turn.actionType != actionType or userSide not in state.sidesOf(turn):
+        raise DraftRejected("Not your turn.")
+    slotIndex = state.slotFor(turn, userSide)
+
+    catalog = getResonatorCatalog()
+    availableMask = state.availableMask(catalog, actionType, userSide, slotIndex)
+    if actionType == DraftActionType.BAN:
+        form = BanConfirmForm(data, catalog=catalog, availableMask=availableMask)
+        fieldName = "ban"
+    else:
+        form = PickConfirmForm(data, catalog=catalog, availableMask=availableMask)
+        fieldName = "pick"
+    if not form.is_valid():
+        raise DraftRejected("Resonator not available.")
+
+    otherSide = MatchSide.RIGHT if userSide == MatchSide.LEFT else MatchSide.LEFT
+    targetSide = otherSide if actionType == DraftActionType.BAN else userSide
+
+    # Zug erst locken, wenn alle beteiligten Seiten gewählt haben
+    # (die anderen Seiten stehen als Pending im Snapshot)
+    lockActionIds = []
+    for side in state.sidesOf(turn):
+        if side == userSide:
+            continue
+        pending = state.pendingFor(actionType, side, state.slotFor(turn, side))
+        if pending is None:
+            lockActionIds = None
+            break
+        lockActionIds.append(pending.id)
+
+    matchUpdates = {}
+    draftDone = False
+    if lockActionIds is not None:
+        if turn.number >= state.format.lastTurnNumber(DraftActionType.BAN) and not match.left_bans_confirmed:
+            matchUpdates["left_bans_confirmed"] = True
+            matchUpdates["right_bans_confirmed"] = True
+
+        draftDone = turn.number == len(state.format.turns)
+        if draftDone:
+            matchUpdates["left_picks_confirmed"] = True
+            matchUpdates["right_picks_confirmed"] = True
+
+    return DraftChoice(
+        actionType=actionType,
+        actingSide=userSide,
+        targetSide=targetSide,
+        slotIndex=slotIndex,
+        stepIndex=state.format.stepIndex(turn, userSide),
+        resonator=form.cleaned_data[fieldName],
+        lockActionIds=tuple(lockActionIds) if lockActionIds is not None else None,
+        matchUpdates=matchUpdates,
+        draftDone=draftDone,
+    )
+
+
+def applyDraftChoice(match, choice: DraftChoice) -> None:
+    """
+    Schreibt eine geplante Auswahl. Läuft in der Transaktion des Aufrufers,
+    nachdem der Compare-and-swap auf draft_version gelungen ist.
+    """
+    # Upsert pro (match, action, slot, side)
+    action, _ = MatchDraftAction.objects.update_or_create(
+        match=match,
+        action_type=choice.actionType,
+        slot_index=choice.slotIndex,
+        acting_side=choice.actingSide,
+        defaults={
+            "target_side": choice.targetSide,
+            "resonator": choice.resonator,
+            "step_index": choice.stepIndex,
+            "is_locked": False,
+        },
+    )
+
+    if choice.lockActionIds is not None:
+        MatchDraftAction.objects.filter(id__in=(action.id, *choice.lockActionIds)).update(is_locked=True)
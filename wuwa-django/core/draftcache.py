@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import dataclass
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .draft import DraftConflict, DraftState, buildSpectatorSnapshot, renderDraftHtml
+from .models import Match, Tournament
+
+
+DRAFT_CACHE_ALIAS = "default"
+DRAFT_CACHE_TIMEOUT = 60 * 60
+
+_statsLock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "renderHits": 0, "renderMisses": 0}
+
+
+@dataclass
+class DraftSnapshot:
+    """
+    Match + DraftState zu einer festen draft_version.
+    Wird im Cache abgelegt und von allen Lesern einer Version geteilt.
+    """
+    match: Match
+    state: DraftState
+    version: int
+
+
+def _versionKey(matchId: int) -> str:
+    return f"draft:version:{matchId}"
+
+
+def _snapshotKey(matchId: int, version: int) -> str:
+    return f"draft:snapshot:{matchId}:{version}"
+
+
+def _htmlKey(matchId: int, version: int, role: str) -> str:
+    return f"draft:html:{matchId}:{version}:{role}"
+
+
+def _spectateKey(matchId: int, version: int) -> str:
+    return f"draft:spectate:{matchId}:{version}"
+
+
+def _count(key: str) -> None:
+    with _statsLock:
+        _stats[key] += 1
+
+
+def draftCacheStats() -> dict:
+    with _statsLock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    renderTotal = stats["renderHits"] + stats["renderMisses"]
+    stats["hitRate"] = (stats["hits"] / total) if total else None
+    stats["renderHitRate"] = (stats["renderHits"] / renderTotal) if renderTotal else None
+    return stats
+
+
+def resetDraftCacheStats() -> None:
+    with _statsLock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def _loadSnapshot(matchId: int) -> DraftSnapshot:
+    # Match + Actions in einer Transaktion lesen, damit Version und State zusammenpassen
+    with transaction.atomic():
+        match = (
+            Match.objects.select_related("player_left", "player_right", "boss", "tournament", "winner_player")
+            .get(id=matchId)
+        )
+        state = DraftState.load(match)
+    return DraftSnapshot(match=match, state=state, version=match.draft_version)
+
+
+def _storeSnapshot(snapshot: DraftSnapshot) -> None:
+    cache = caches[DRAFT_CACHE_ALIAS]
+    matchId = snapshot.match.id
+    cache.set(_snapshotKey(matchId, snapshot.version), snapshot, DRAFT_CACHE_TIMEOUT)
+
+    # Version nur vorwärts bewegen – ein langsamer Leser darf eine neuere Version nicht zurücksetzen
+    cachedVersion = cache.get(_versionKey(matchId))
+    if cachedVersion is None or snapshot.version > cachedVersion:
+        cache.set(_versionKey(matchId), snapshot.version, DRAFT_CACHE_TIMEOUT)
+
+
+def getDraftSnapshot(matchId: int) -> DraftSnapshot:
+    """
+    Liefert den Draft-Zustand zur aktuellen Version.
+    Bei unveränderter Version kommt er aus dem Cache, ohne SQLite anzufassen.
+    Wirft Match.DoesNotExist, wenn es das Match nicht gibt.
+    """
+    cache = caches[DRAFT_CACHE_ALIAS]
+    version = cache.get(_versionKey(matchId))
+    if version is not None:
+        snapshot = cache.get(_snapshotKey(matchId, version))
+        if snapshot is not None:
+            _count("hits")
+            return snapshot
+
+    _count("misses")
+    snapshot = _loadSnapshot(matchId)
+    _storeSnapshot(snapshot)
+    return snapshot
+
+
+def getDraftHtml(matchId: int, role: str) -> tuple[str, int]:
+    """
+    Gerenderte Draft-Partial für (Match, Version, Rolle). Pro Version wird jede
+    Rollen-Variante nur einmal gerendert – HTTP und Websocket teilen sich das Ergebnis.
+    Das HTML enthält CSRF_TOKEN_PLACEHOLDER statt eines echten Tokens.
+    """
+    snapshot = getDraftSnapshot(matchId)
+    return getSnapshotHtml(snapshot, role), snapshot.version
+
+
+def getSnapshotHtml(snapshot: DraftSnapshot, role: str) -> str:
+    """
+    Wie getDraftHtml, für einen bereits geladenen Snapshot.
+    """
+    cache = caches[DRAFT_CACHE_ALIAS]
+    key = _htmlKey(snapshot.match.id, snapshot.version, role)
+
+    html = cache.get(key)
+    if html is not None:
+        _count("renderHits")
+        return html
+
+    _count("renderMisses")
+    html = renderDraftHtml(snapshot.match, role, snapshot.state)
+    cache.set(key, html, DRAFT_CACHE_TIMEOUT)
+    return html
+
+
+def getSpectatorJson(matchId: int, load: bool = True) -> str | None:
+    """
+    Zuschauer-Snapshot als fertiger JSON-Text, pro Version einmal serialisiert und
+    an alle Zuschauer als dieselben Bytes verteilt. Mit load=False nur aus dem Cache
+    (None bei Miss) – für Aufrufer, die keinen DB-Zugriff machen wollen.
+    """
+    cache = caches[DRAFT_CACHE_ALIAS]
+    version = cache.get(_versionKey(matchId))
+    if version is not None:
+        text = cache.get(_spectateKey(matchId, version))
+        if text is not None:
+            return text
+    if not load:
+        return None
+
+    snapshot = getDraftSnapshot(matchId)
+    key = _spectateKey(matchId, snapshot.version)
+    text = cache.get(key)
+    if text is None:
+        text = json.dumps(buildSpectatorSnapshot(snapshot.match, snapshot.state), separators=(",", ":"))
+        cache.set(key, text, DRAFT_CACHE_TIMEOUT)
+    return text
+
+
+def _publishVersion(matchId: int) -> None:
+    # Write-through nach dem Commit: neuen Snapshot sofort ablegen,
+    # damit die anschließenden Refreshes aller Clients Cache-Hits sind
+    try:
+        snapshot = _loadSnapshot(matchId)
+    except Match.DoesNotExist:
+        caches[DRAFT_CACHE_ALIAS].delete(_versionKey(matchId))
+        return
+    _storeSnapshot(snapshot)
+
+
+def bumpDraftVersion(match: Match) -> int:
+    """
+    Zählt die draft_version des Matches hoch. Muss innerhalb der Transaktion
+    aufgerufen werden, die den Draft (oder Zeiten/Status des Matches) ändert; der Cache wird erst nach dem Commit aktualisiert.
+    """
+    Match.objects.filter(id=match.id).update(draft_version=F("draft_version") + 1)
+    match.draft_version = Match.objects.filter(id=match.id).values_list("draft_version", flat=True).get()
+
+    matchId = match.id
+    transaction.on_commit(lambda: _publishVersion(matchId))
+    return match.draft_version
+
+
+def bumpDraftVersions(matchIds: list[int]) -> None:
+    """
+    Wie bumpDraftVersion für viele Matches mit einem UPDATE (z.B. Runde abschließen).
+    Statt jeden Snapshot neu zu laden, wird nach dem Commit nur die gecachte Version
+    vergessen – der erste Leser lädt nach.
+    """
+    matchIds = list(matchIds)
+    if not matchIds:
+        return
+    Match.objects.filter(id__in=matchIds).update(draft_version=F("draft_version") + 1)
+
+    def forgetAll():
+        caches[DRAFT_CACHE_ALIAS].delete_many([_versionKey(matchId) for matchId in matchIds])
+    transaction.on_commit(forgetAll)
+
+
+def _forgetVersion(matchId: int) -> None:
+    # Veralteter Snapshot im Cache: Version vergessen, der nächste Leser lädt neu
+    caches[DRAFT_CACHE_ALIAS].delete(_versionKey(matchId))
+
+
+# Saves/Deletes am Draft-Code vorbei (Reset-Match löschen, Bracket überschreiben, Turnier-
+# Format ändern) ändern Spieler, Format oder Existenz des Matches ohne draft_version:
+# gecachte Version nach dem Commit vergessen. QuerySet.update() löst keine Signale aus –
+# solche Writes müssen weiterhin bumpDraftVersions aufrufen.
+@receiver(post_save, sender=Match)
+@receiver(post_delete, sender=Match)
+def _matchChanged(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    matchId = instance.id
+    transaction.on_commit(lambda: _forgetVersion(matchId))
+
+
+@receiver(post_save, sender=Tournament)
+def _tournamentChanged(sender, instance, created, **kwargs):
+    if created:
+        return
+    matchIds = list(Match.objects.filter(tournament_id=instance.id).values_list("id", flat=True))
+    if matchIds:
+        transaction.on_commit(
+            lambda: caches[DRAFT_CACHE_ALIAS].delete_many([_versionKey(matchId) for matchId in matchIds])
+        )
+
+
+def ensureCurrentSnapshot(snapshot: DraftSnapshot) -> None:
+    """
+    Prüft mit einem leichten Lesezugriff, ob der Snapshot noch der DB-Version entspricht.
+    Sonst DraftConflict – eine Ablehnung gegen veralteten Stand wäre nicht endgültig.
+    """
+    matchId = snapshot.match.id
+    if not Match.objects.filter(id=matchId, draft_version=snapshot.version).exists():
+        _forgetVersion(matchId)
+        raise DraftConflict("Draft changed, please retry.")
+
+
+def claimDraftVersion(match: Match, expectedVersion: int, **fields) -> int:
+    """
+    Compare-and-swap auf draft_version: zählt nur hoch (und setzt fields), wenn die
+    Version in der DB noch expectedVersion ist. Sonst DraftConflict – der Aufrufer
+    liest den neuen Stand und kann es erneut versuchen. Kein Row-Lock nötig.
+    """
+    updated = Match.objects.filter(id=match.id, draft_version=expectedVersion).update(
+        draft_version=expectedVersion + 1,
+        **fields,
+    )
+    if not updated:
+        _forgetVersion(match.id)
+        raise DraftConflict("Draft changed, please retry.")
+
+    match.draft_version = expectedVersion + 1
+    for name, value in fields.items():
+        setattr(match, name, value)
+
+    matchId = match.id
+    transaction.on_commit(lambda: _publishVersion(matchId))
+    return match.draft_version
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from types import MappingProxyType
+from typing import NamedTuple
+
+from .models import DraftActionType, MatchSide
+
+
+# Seiten in einer Format-Definition sind relativ zu match.first_pick_side
+FIRST = "FIRST"
+SECOND = "SECOND"
+BOTH = "BOTH"
+
+_SIDES_BY_KEYWORD = {
+    FIRST: (FIRST,),
+    SECOND: (SECOND,),
+    BOTH: (FIRST, SECOND),
+}
+
+# Bisheriges Format: 3 simultane Bans, danach 3 simultane Picks
+DEFAULT_DRAFT_FORMAT = [
+    {"action": DraftActionType.BAN.value, "sides": BOTH, "count": 3},
+    {"action": DraftActionType.PICK.value, "sides": BOTH, "count": 3},
+]
+
+
+class DraftTurn(NamedTuple):
+    """
+    Ein Eintrag der Übergangstabelle: welche Seiten in diesem Zug gleichzeitig
+    welche Aktion ausführen und in welchen Slot (pro Seite gezählt) sie schreiben.
+    """
+    number: int
+    actionType: str
+    slots: tuple[tuple[str, int], ...]  # (relative Seite, slot_index)
+
+    @property
+    def sides(self) -> tuple[str, ...]:
+        return tuple(side for side, _ in self.slots)
+
+    def slotFor(self, relSide: str) -> int | None:
+        for side, slotIndex in self.slots:
+            if side == relSide:
+                return slotIndex
+        return None
+
+
+class CompiledDraftFormat:
+    """
+    Unveränderliche Übergangstabelle eines Draft-Formats.
+    Alle Fragen (aktueller Zug, Slot, step_index, Phasenende) sind Lookups im Speicher.
+    """
+
+    def __init__(self, turns: tuple[DraftTurn, ...]):
+        self.turns = turns
+        self._turnBySlot = MappingProxyType({
+            (turn.actionType, side, slotIndex): turn
+            for turn in turns
+            for side, slotIndex in turn.slots
+        })
+        counts = {}
+        for (actionType, side, _) in self._turnBySlot:
+            counts[(actionType, side)] = counts.get((actionType, side), 0) + 1
+        self._slotCounts = MappingProxyType(counts)
+        self._lastTurnOf = MappingProxyType({turn.actionType: turn.number for turn in turns})
+
+    def __reduce__(self):
+        # Snapshots werden gepickelt – Lookups aus der Zugliste neu aufbauen
+        return (CompiledDraftFormat, (self.turns,))
+
+    def turnFor(self, actionType: str, relSide: str, slotIndex: int) -> DraftTurn | None:
+        return self._turnBySlot.get((actionType, relSide, slotIndex))
+
+    def slotCount(self, actionType: str, relSide: str) -> int:
+        return self._slotCounts.get((actionType, relSide), 0)
+
+    def lastTurnNumber(self, actionType: str) -> int:
+        return self._lastTurnOf.get(actionType, 0)
+
+    @staticmethod
+    def stepIndex(turn: DraftTurn, side: str) -> int:
+        return 1000 + turn.number * 10 + (1 if side == MatchSide.LEFT else 2)
+
+
+def _parseStep(step, position: int) -> tuple[str, str, int]:
+    if not isinstance(step, dict):
+        raise ValueError(f"Step {position}: must be an object.")
+
+    actionType = step.get("action")
+    if actionType not in DraftActionType.values:
+        raise ValueError(f"Step {position}: action must be one of {', '.join(DraftActionType.values)}.")
+
+    sides = step.get("sides", BOTH)
+    if sides not in _SIDES_BY_KEYWORD:
+        raise ValueError(f"Step {position}: sides must be one of {', '.join(_SIDES_BY_KEYWORD)}.")
+
+    count = step.get("count", 1)
+    if not isinstance(count, int) or count < 1:
+        raise ValueError(f"Step {position}: count must be a positive integer.")
+
+    return actionType, sides, count
+
+
+def _compile(definition: list) -> CompiledDraftFormat:
+    if not isinstance(definition, list) or not definition:
+        raise ValueError("Draft format must be a non-empty list of steps.")
+
+    turns = []
+    usedSlots: dict[tuple[str, str], int] = {}
+    for position, step in enumerate(definition, start=1):
+        actionType, sides, count = _parseStep(step, position)
+        for _ in range(count):
+            slots = []
+            for relSide in _SIDES_BY_KEYWORD[sides]:
+                slotIndex = usedSlots.get((actionType, relSide), 0) + 1
+                usedSlots[(actionType, relSide)] = slotIndex
+                slots.append((relSide, slotIndex))
+            turns.append(DraftTurn(number=len(turns) + 1, actionType=actionType, slots=tuple(slots)))
+
+    if len(turns) > 99:
+        raise ValueError("Draft format must not have more than 99 turns.")
+
+    return CompiledDraftFormat(tuple(turns))
+
+
+@lru_cache(maxsize=64)
+def _compileCached(definitionJson: str) -> CompiledDraftFormat:
+    return _compile(json.loads(definitionJson))
+
+
+def compileDraftFormat(definition: list | None) -> CompiledDraftFormat:
+    """
+    Kompiliert eine Format-Definition (Liste von {"action", "sides", "count"}) einmalig
+    zur Übergangstabelle. Wirft ValueError bei ungültiger Definition.
+    """
+    if definition is None:
+        definition = DEFAULT_DRAFT_FORMAT
+    return _compileCached(json.dumps(definition, sort_keys=True))
+
+
+def getDraftFormat(tournament) -> CompiledDraftFormat:
+    return compileDraftFormat(tournament.draft_format if tournament is not None else None)
+
+
+def relativeSide(match, side: str) -> str:
+    firstSide = match.first_pick_side or MatchSide.LEFT
+    return FIRST if side == firstSide else SECOND
+
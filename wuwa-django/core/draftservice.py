@@ -0,0 +1,86 @@
+"""
+Draft-Schreibpfade, gemeinsam genutzt von den HTTP-Views und dem MatchDraftConsumer.
+Fehler: Match.DoesNotExist, PermissionDenied (falsche Rolle), DraftRejected (ungültige Aktion),
+DraftConflict (Draft hat sich parallel geändert – wiederholbar).
+"""
+
+from __future__ import annotations
+
+import copy
+
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+
+from .draft import DraftConflict, DraftRejected, _getUserSide, _isHost, applyDraftChoice, planDraftChoice
+from .draftcache import bumpDraftVersion, claimDraftVersion, ensureCurrentSnapshot, getDraftSnapshot
+from .models import Match, MatchDraftAction
+from .ws import broadcastDraftUpdate, broadcastPageRefresh
+
+
+# Erster Versuch gegen den gecachten Snapshot, danach gegen frisch geladenen Stand
+DRAFT_WRITE_ATTEMPTS = 2
+
+
+def confirmDraftChoice(matchId: int, user, actionType: str, data) -> int:
+    """
+    Ban/Pick der Seite des Users für den aktuellen Zug setzen. Gibt die neue draft_version zurück.
+    Validiert gegen den Snapshot ohne Lock; geschrieben wird nur, wenn draft_version
+    in der DB noch zum Snapshot passt. Bleibt es beim Konflikt: DraftConflict.
+    """
+    for attempt in range(1, DRAFT_WRITE_ATTEMPTS + 1):
+        try:
+            return _confirmDraftChoice(matchId, user, actionType, data)
+        except DraftConflict:
+            if attempt == DRAFT_WRITE_ATTEMPTS:
+                raise
+
+
+def _confirmDraftChoice(matchId: int, user, actionType: str, data) -> int:
+    snapshot = getDraftSnapshot(matchId)
+    match = snapshot.match
+
+    userSide = _getUserSide(user, match)
+    if userSide is None:
+        raise PermissionDenied("Forbidden")
+
+    try:
+        choice = planDraftChoice(match, snapshot.state, userSide, actionType, data)
+    except DraftRejected:
+        # Nur endgültig ablehnen, wenn der Snapshot aktuell war
+        ensureCurrentSnapshot(snapshot)
+        raise
+
+    # Snapshot-Objekt wird geteilt – nicht verändern
+    match = copy.copy(match)
+    with transaction.atomic():
+        version = claimDraftVersion(match, snapshot.version, **choice.matchUpdates)
+        applyDraftChoice(match, choice)
+
+        if choice.draftDone:
+            broadcastPageRefresh(match.id)
+        broadcastDraftUpdate(match.id)
+    return version
+
+
+def resetDraft(matchId: int, user) -> int:
+    """
+    Alle Draft-Actions löschen und Phasen zurücksetzen (nur Host). Gibt die neue draft_version zurück.
+    """
+    with transaction.atomic():
+        match = Match.objects.get(id=matchId)
+
+        # Nur Host darf resetten
+        if not _isHost(user):
+            raise PermissionDenied("Forbidden")
+
+        MatchDraftAction.objects.filter(match=match).delete()
+
+        match.left_bans_confirmed = False
+        match.right_bans_confirmed = False
+        match.left_picks_confirmed = False
+        match.right_picks_confirmed = False
+        match.save()
+
+        version = bumpDraftVersion(match)
+        broadcastDraftUpdate(match.id)
+    return version
@@ -0,0 +1,123 @@
+from typing import NamedTuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .brackettree import invalidateBracketTree
+from .draftcache import bumpDraftVersions
+from .models import BracketType, Match, MatchSide, Tournament
+from .ratings import recordMatchRatings
+from .simulate import recordMatchTimes
+from .ws import broadcastPageRefreshMany
+
+
+# Gründe, warum ein Match beim Runden-Abschluss übersprungen wurde
+SKIP_NOT_FOUND = "notFound"
+SKIP_NOT_STARTED = "notStarted"
+SKIP_ALREADY_FINISHED = "alreadyFinished"
+SKIP_MISSING_TIMES = "missingTimes"
+SKIP_TIE = "tie"
+
+
+class FinalizeResult(NamedTuple):
+    finished: list[int]
+    skipped: dict[int, str]  # matchId -> Grund
+
+
+def _skipReason(match: Match) -> str | None:
+    if match.finished_at is not None:
+        return SKIP_ALREADY_FINISHED
+    if match.started_at is None:
+        return SKIP_NOT_STARTED
+    if match.left_time_ms is None or match.right_time_ms is None:
+        return SKIP_MISSING_TIMES
+    if match.left_time_ms == match.right_time_ms:
+        return SKIP_TIE
+    return None
+
+
+@transaction.atomic
+def finalizeMatches(
+    tournament: Tournament,
+    *,
+    bracket: str | None = None,
+    roundIndex: int | None = None,
+    matchIds: list[int] | None = None,
+) -> FinalizeResult:
+    """
+    Schließt alle fertig gespielten Matches einer Runde (bracket + roundIndex) oder eine
+    Auswahl (matchIds) in einer Transaktion ab: Sieger nach Zeit, Weitergabe von Sieger
+    und Verlierer mit einem bulk_update auf die Ziel-Matches, eine gemeinsame Version-/
+    Broadcast-Runde. Matches ohne Zeiten, mit Gleichstand usw. werden mit Grund übersprungen.
+    """
+    matches = Match.objects.select_for_update().filter(tournament=tournament)
+    if matchIds is not None:
+        matches = matches.filter(id__in=matchIds)
+    else:
+        if roundIndex is None:
+            raise ValueError("Either matchIds or roundIndex is required.")
+        matches = matches.filter(bracket=bracket or BracketType.WINNERS, round_index=roundIndex)
+    matches = list(matches.order_by("match_index", "id"))
+
+    skipped = {}
+    if matchIds is not None:
+        found = {m.id for m in matches}
+        skipped = {matchId: SKIP_NOT_FOUND for matchId in matchIds if matchId not in found}
+
+    now = timezone.now()
+    finishing = []
+    for match in matches:
+        reason = _skipReason(match)
+        if reason is not None:
+            skipped[match.id] = reason
+            continue
+        match.winner_player_id = match.player_left_id if match.left_time_ms < match.right_time_ms else match.player_right_id
+        match.finished_at = now
+        finishing.append(match)
+
+    # Ziele sammeln: (Ziel-Match, Seite, Spieler). Grand Final: gewinnt LEFT, entfällt der Reset
+    targets = []
+    droppedResets = []
+    for match in finishing:
+        loserId = match.player_right_id if match.winner_player_id == match.player_left_id else match.player_left_id
+        if (
+            match.bracket == BracketType.GRAND_FINAL
+            and match.round_index == 0
+            and match.next_match_id is not None
+            and match.winner_player_id == match.player_left_id
+        ):
+            droppedResets.append(match.next_match_id)
+            match.next_match, match.next_side = None, None
+            match.loser_next_match, match.loser_next_side = None, None
+            continue
+        if match.next_match_id is not None:
+            targets.append((match.next_match_id, match.next_side, match.winner_player_id))
+        if match.loser_next_match_id is not None:
+            targets.append((match.loser_next_match_id, match.loser_next_side, loserId))
+
+    Match.objects.bulk_update(
+        finishing,
+        ["winner_player", "finished_at", "next_match", "next_side", "loser_next_match", "loser_next_side"],
+    )
+
+    nextMatches = Match.objects.select_for_update().in_bulk([t[0] for t in targets])
+    for nextMatchId, side, playerId in targets:
+        nextMatch = nextMatches[nextMatchId]
+        if side == MatchSide.LEFT:
+            nextMatch.player_left_id = playerId
+        else:
+            nextMatch.player_right_id = playerId
+    Match.objects.bulk_update(nextMatches.values(), ["player_left", "player_right"])
+
+    if droppedResets:
+        Match.objects.filter(id__in=droppedResets).delete()
+
+    changedIds = [m.id for m in finishing] + list(nextMatches)
+    if changedIds:
+        bumpDraftVersions(changedIds)
+        broadcastPageRefreshMany(changedIds)
+        invalidateBracketTree(tournament.id)
+        recordMatchTimes(finishing)
+        recordMatchRatings(finishing)
+
+    return FinalizeResult(finished=[m.id for m in finishing], skipped=skipped)
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Boss, Match, Player, BossTime, MatchSide, Resonator, DraftActionType
+from .models import Boss, BracketType, Match, Player, BossTime, MatchSide, Resonator, DraftActionType
 import re
 
 class MatchTimeSubmitForm(forms.Form):
@@ -61,20 +61,55 @@ class DraftActionForm(forms.Form):
         if availableResonators is not None:
             self.fields["resonator"].queryset = availableResonators
 
+class CatalogResonatorField(forms.ChoiceField):
+    """
+    Auswahlfeld gegen den ResonatorCatalog: Optionen werden erst beim Rendern
+    aus der Bitmaske erzeugt, Validierung ist ein Bit-Test ohne Query.
+    """
+
+    def __init__(self, *, empty_label: str, **kwargs):
+        self.empty_label = empty_label
+        self.catalog = None
+        self.availableMask = 0
+        super().__init__(choices=(), **kwargs)
+
+    def setAvailable(self, catalog, availableMask: int) -> None:
+        self.catalog = catalog
+        self.availableMask = availableMask
+        self.choices = lambda: [("", self.empty_label)] + [
+            (r.id, r.name) for r in catalog.resonatorsIn(availableMask)
+        ]
+
+    def valid_value(self, value) -> bool:
+        if self.catalog is None:
+            return False
+        try:
+            resonatorId = int(value)
+        except (TypeError, ValueError):
+            return False
+        return self.catalog.contains(self.availableMask, resonatorId)
+
+    def clean(self, value):
+        value = super().clean(value)
+        if not value:
+            return None
+        return self.catalog.get(int(value))
+
+
 class BanConfirmForm(forms.Form):
-    ban = forms.ModelChoiceField(
-        queryset=Resonator.objects.none(),
+    ban = CatalogResonatorField(
         widget=forms.Select(),
         empty_label="-- bitte wählen --",
         label="Ban",
     )
 
     def __init__(self, *args, **kwargs):
-        available = kwargs.pop("available", None)
+        catalog = kwargs.pop("catalog", None)
+        availableMask = kwargs.pop("availableMask", 0)
         super().__init__(*args, **kwargs)
-        if available is not None:
-            self.fields["ban"].queryset = available
-        
+        if catalog is not None:
+            self.fields["ban"].setAvailable(catalog, availableMask)
+
     def clean_ban(self):
         ban = self.cleaned_data["ban"]
         if ban is None:
@@ -82,18 +117,18 @@ class BanConfirmForm(forms.Form):
         return ban
 
 class PickConfirmForm(forms.Form):
-    pick = forms.ModelChoiceField(
-        queryset=Resonator.objects.none(),
+    pick = CatalogResonatorField(
         widget=forms.Select(),
         empty_label="— bitte wählen —",
         label="Pick",
     )
 
     def __init__(self, *args, **kwargs):
-        available = kwargs.pop("available", None)
+        catalog = kwargs.pop("catalog", None)
+        availableMask = kwargs.pop("availableMask", 0)
         super().__init__(*args, **kwargs)
-        if available is not None:
-            self.fields["pick"].queryset = available
+        if catalog is not None:
+            self.fields["pick"].setAvailable(catalog, availableMask)
 
     def clean_pick(self):
         pick = self.cleaned_data["pick"]
@@ -106,10 +141,31 @@ class TournamentParticipantsForm(forms.Form):
         queryset=Player.objects.all().order_by("name"),
         widget=forms.CheckboxSelectMultiple,
         required=True,
-        label="Teilnehmer (genau 8 auswählen)",
+        label="Teilnehmer (mindestens 2 auswählen)",
     )
     def clean_players(self):
         players = self.cleaned_data["players"]
-        if len(players)  != 8:
-            raise forms.ValidationError("Bitte genau 8 Spieler auswählen.")
-        return players
\ No newline at end of file
+        if len(players) < 2:
+            raise forms.ValidationError("Bitte mindestens 2 Spieler auswählen.")
+        return players
+
+
+class BracketGenerateForm(forms.Form):
+    shuffleSeed = forms.IntegerField(
+        required=False,
+        label="Shuffle Seed (optional, für reproduzierbare Auslosung)",
+    )
+    # Setzliste nach BossTime-Bestzeiten statt Auslosung
+    seedByBossTime = forms.BooleanField(required=False, label="Seeding nach BossTime")
+    # Setzliste nach Elo-Rating (hat Vorrang vor seedByBossTime)
+    seedByRating = forms.BooleanField(required=False, label="Seeding nach Rating")
+    # Nur Double Elimination
+    grandFinalReset = forms.BooleanField(required=False, label="Grand Final Reset")
+
+
+class GroupStageForm(forms.Form):
+    groupCount = forms.IntegerField(min_value=1, label="Anzahl Gruppen")
+
+class RoundFinalizeForm(forms.Form):
+    bracket = forms.ChoiceField(choices=BracketType.choices, initial=BracketType.WINNERS, label="Bracket")
+    roundIndex = forms.IntegerField(min_value=0, initial=0, label="Runde (0 = erste Runde)")
@@ -0,0 +1,155 @@
+from typing import NamedTuple
+
+from django.db import connection, transaction
+
+from .brackettree import invalidateBracketTree
+from .models import Boss, BracketType, Match, MatchSide, Player, Tournament
+from .seeding import rankedPlayerIds
+
+
+class GroupStanding(NamedTuple):
+    playerId: int
+    name: str
+    played: int
+    wins: int
+    timeDiffMs: int  # Summe (Gegnerzeit - eigene Zeit), positiv = schneller
+
+
+def snakeGroups(playerIds: list[int], groupCount: int) -> list[list[int]]:
+    """
+    Verteilt die (nach Stärke sortierten) Spieler per Snake auf die Gruppen:
+    1..K, K..1, 1..K, ...
+    """
+    groups = [[] for _ in range(groupCount)]
+    for i, playerId in enumerate(playerIds):
+        row, column = divmod(i, groupCount)
+        groups[column if row % 2 == 0 else groupCount - 1 - column].append(playerId)
+    return groups
+
+
+def circleRounds(members: list[int]) -> list[list[tuple[int, int]]]:
+    """
+    Jeder gegen jeden per Circle-Methode: n-1 Runden (n gerade), ein Spieler bleibt fest,
+    die übrigen rotieren. Bei ungerader Anzahl hat pro Runde einer spielfrei.
+    """
+    players = list(members)
+    if len(players) % 2:
+        players.append(None)
+    n = len(players)
+
+    rounds = []
+    for roundIndex in range(n - 1):
+        pairs = []
+        for i in range(n // 2):
+            a, b = players[i], players[n - 1 - i]
+            if a is None or b is None:
+                continue
+            # Seiten pro Runde tauschen, damit niemand immer LEFT spielt
+            pairs.append((a, b) if roundIndex % 2 == 0 else (b, a))
+        rounds.append(pairs)
+        players = [players[0], players[-1]] + players[1:-1]
+    return rounds
+
+
+def _insertMatchRows(rows: list[dict]) -> None:
+    """
+    Insert-Pfad für zehntausende Matches: ein executemany mit fertigen Tupeln statt
+    Model-Instanzen (bulk_create verbringt dabei fast die ganze Zeit in Python).
+    Nicht gesetzte Felder bekommen ihren Model-Default.
+    """
+    fields = [f for f in Match._meta.concrete_fields if not f.primary_key]
+    defaults = {f.attname: f.get_default() for f in fields}
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(Match._meta.db_table),
+        ", ".join(quote(f.column) for f in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    params = [tuple(row.get(f.attname, defaults[f.attname]) for f in fields) for row in rows]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+@transaction.atomic
+def generateRoundRobinGroups(tournament: Tournament, groupCount: int, *, overwrite: bool = True) -> int:
+    """
+    Gruppenphase: Turnier-Spieler per Snake-Seeding (BossTime) auf groupCount Gruppen,
+    pro Gruppe jeder gegen jeden (Circle-Methode). Bosse rotieren pro Runde.
+    match_index zählt pro Runde über alle Gruppen, group_index hält die Gruppe.
+    Alles in einer Transaktion mit einem executemany. Gibt die Anzahl der Matches zurück.
+    """
+    playerIds = rankedPlayerIds(tournament)
+    if groupCount < 1:
+        raise ValueError("Need at least 1 group.")
+    if len(playerIds) < 2 * groupCount:
+        raise ValueError(f"Need at least 2 players per group, got {len(playerIds)} players for {groupCount} groups")
+
+    bossIds = list(Boss.objects.order_by("id").values_list("id", flat=True))
+    if not bossIds:
+        raise ValueError("No Bosses found. Please create at least 1 Boss before generating matches.")
+
+    rows = []
+    nextIndex: dict[int, int] = {}
+    for groupIndex, members in enumerate(snakeGroups(playerIds, groupCount)):
+        for roundIndex, pairs in enumerate(circleRounds(members)):
+            bossId = bossIds[roundIndex % len(bossIds)]
+            for leftId, rightId in pairs:
+                nextIndex[roundIndex] = nextIndex.get(roundIndex, 0) + 1
+                rows.append({
+                    "tournament_id": tournament.id,
+                    "bracket": BracketType.GROUP.value,
+                    "group_index": groupIndex,
+                    "round_index": roundIndex,
+                    "match_index": nextIndex[roundIndex],
+                    "player_left_id": leftId,
+                    "player_right_id": rightId,
+                    "boss_id": bossId,
+                    "first_pick_side": MatchSide.LEFT.value,
+                })
+
+    if overwrite:
+        Match.objects.filter(tournament=tournament, bracket=BracketType.GROUP).delete()
+
+    _insertMatchRows(rows)
+    invalidateBracketTree(tournament.id)
+    return len(rows)
+
+
+_STANDINGS_SQL = """
+    SELECT s.player_id, p.name, MIN(s.group_index), SUM(s.played), SUM(s.won), SUM(s.diff)
+    FROM (
+        SELECT player_left_id AS player_id, group_index,
+               CASE WHEN finished_at IS NOT NULL THEN 1 ELSE 0 END AS played,
+               CASE WHEN finished_at IS NOT NULL AND winner_player_id = player_left_id THEN 1 ELSE 0 END AS won,
+               CASE WHEN finished_at IS NOT NULL THEN COALESCE(right_time_ms - left_time_ms, 0) ELSE 0 END AS diff
+        FROM {match} WHERE tournament_id = %s AND bracket = %s
+        UNION ALL
+        SELECT player_right_id, group_index,
+               CASE WHEN finished_at IS NOT NULL THEN 1 ELSE 0 END,
+               CASE WHEN finished_at IS NOT NULL AND winner_player_id = player_right_id THEN 1 ELSE 0 END,
+               CASE WHEN finished_at IS NOT NULL THEN COALESCE(left_time_ms - right_time_ms, 0) ELSE 0 END
+        FROM {match} WHERE tournament_id = %s AND bracket = %s
+    ) s
+    JOIN {player} p ON p.id = s.player_id
+    GROUP BY s.player_id, p.name
+"""
+
+
+def groupStandings(tournament: Tournament) -> dict[int, list[GroupStanding]]:
+    """
+    Tabelle aller Gruppen mit einer aggregierten Query (ein Scan über beide Seiten per UNION ALL):
+    gespielte (beendete) Matches, Siege und Zeitdifferenz. Sortiert nach Siegen, dann Zeitdifferenz.
+    """
+    quote = connection.ops.quote_name
+    sql = _STANDINGS_SQL.format(match=quote(Match._meta.db_table), player=quote(Player._meta.db_table))
+    params = [tournament.id, BracketType.GROUP.value] * 2
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    standings: dict[int, list[GroupStanding]] = {}
+    for playerId, name, groupIndex, played, wins, diff in rows:
+        standings.setdefault(groupIndex, []).append(GroupStanding(playerId, name, played, wins, diff))
+    for groupRows in standings.values():
+        groupRows.sort(key=lambda s: (-s.wins, -s.timeDiffMs, s.playerId))
+    return dict(sorted(standings.items()))
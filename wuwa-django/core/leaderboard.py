@@ -0,0 +1,335 @@
+import base64
+import bisect
+from typing import NamedTuple
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Boss, BossLeaderboardEntry, BossTime, Player, Tournament
+from .rankindex import getRankIndexes, invalidateRankIndexes, rankKey
+
+
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 100
+# So viele Plätze pro Boss hält BossLeaderboardEntry vor – reicht für jedes erlaubte top
+MATERIALIZED_TOP_K = MAX_TOP_K
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class LeaderboardEntry(NamedTuple):
+    rank: int
+    playerId: int
+    playerName: str
+    bestTimeMs: int
+
+
+class LeaderboardPage(NamedTuple):
+    entries: list[LeaderboardEntry]
+    nextCursor: str | None
+    previousCursor: str | None
+
+
+# Top-K pro Boss: je Boss eine Index-Range (boss, best_time_ms, player) mit LIMIT,
+# gerankt per ROW_NUMBER() über die K Kandidaten. Ein Window über alle BossTimes würde
+# jede Zeile sortieren (Millionen bei vielen Bossen), die Index-Range liest nur K Zeilen je Boss.
+# Gleiche Zeit: niedrigere player_id zuerst, damit der Rang stabil ist.
+_TOP_K_SQL = """
+    SELECT bt.boss_id,
+           ROW_NUMBER() OVER (PARTITION BY bt.boss_id ORDER BY bt.best_time_ms, bt.player_id) AS rank,
+           bt.player_id, p.name, bt.best_time_ms
+    FROM {boss} b
+    JOIN {bosstime} bt ON bt.id IN (
+        SELECT x.id FROM {bosstime} x
+        WHERE x.boss_id = b.id AND x.best_time_ms IS NOT NULL {tournamentFilter}
+        ORDER BY x.best_time_ms, x.player_id
+        LIMIT %s
+    )
+    JOIN {player} p ON p.id = bt.player_id
+    ORDER BY bt.boss_id, rank
+"""
+
+# Einzelne Spieler: Rang = 1 + Anzahl schnellerer Einträge desselben Bosses (Index-Range-Count)
+_PLAYER_RANK_SQL = """
+    SELECT bt.boss_id,
+           1 + (
+               SELECT COUNT(*) FROM {bosstime} x
+               WHERE x.boss_id = bt.boss_id AND x.best_time_ms IS NOT NULL {tournamentFilter}
+                 AND (x.best_time_ms < bt.best_time_ms
+                      OR (x.best_time_ms = bt.best_time_ms AND x.player_id < bt.player_id))
+           ) AS rank,
+           bt.player_id, p.name, bt.best_time_ms
+    FROM {bosstime} bt
+    JOIN {player} p ON p.id = bt.player_id
+    WHERE bt.best_time_ms IS NOT NULL AND bt.player_id IN ({playerIds}) {outerTournamentFilter}
+    ORDER BY bt.boss_id, rank
+"""
+
+
+def leaderboardRows(
+    topK: int = DEFAULT_TOP_K,
+    *,
+    tournamentId: int | None = None,
+    playerIds: list[int] | None = None,
+) -> dict[int, list[LeaderboardEntry]]:
+    """
+    Top-K pro Boss. Ohne Filter aus der materialisierten Tabelle (rank-sortiert, keine Sortierung
+    beim Lesen), mit Turnier-/Spieler-Filter direkt aus BossTime (computeLeaderboardRows).
+    """
+    if tournamentId is None and playerIds is None and topK <= MATERIALIZED_TOP_K:
+        return materializedLeaderboardRows(topK)
+    return computeLeaderboardRows(topK, tournamentId=tournamentId, playerIds=playerIds)
+
+
+def materializedLeaderboardRows(topK: int = DEFAULT_TOP_K) -> dict[int, list[LeaderboardEntry]]:
+    # (boss, rank) ist eindeutig indiziert: Range-Scan in Rang-Reihenfolge
+    rows: dict[int, list[LeaderboardEntry]] = {}
+    entries = (
+        BossLeaderboardEntry.objects.filter(rank__lte=topK)
+        .order_by("boss_id", "rank")
+        .values_list("boss_id", "rank", "player_id", "player__name", "best_time_ms")
+    )
+    for bossId, rank, playerId, playerName, bestTimeMs in entries:
+        rows.setdefault(bossId, []).append(LeaderboardEntry(rank, playerId, playerName, bestTimeMs))
+    return rows
+
+
+def computeLeaderboardRows(
+    topK: int = DEFAULT_TOP_K,
+    *,
+    tournamentId: int | None = None,
+    playerIds: list[int] | None = None,
+) -> dict[int, list[LeaderboardEntry]]:
+    """
+    Top-K pro Boss für alle Bosse in einer Query direkt aus BossTime.
+    tournamentId: nur Teilnehmer dieses Turniers (Rang innerhalb des Turnierfelds).
+    playerIds: nur diese Spieler, mit ihrem Rang im Feld – Top-K gilt dann nicht.
+    Gibt bossId -> Einträge zurück; Bosse ohne Zeiten fehlen.
+    """
+    quote = connection.ops.quote_name
+    tables = {
+        "boss": quote(Boss._meta.db_table),
+        "bosstime": quote(BossTime._meta.db_table),
+        "player": quote(Player._meta.db_table),
+        "tournamentFilter": "",
+        "outerTournamentFilter": "",
+    }
+    tournamentParams = []
+    if tournamentId is not None:
+        participants = "SELECT player_id FROM {} WHERE tournament_id = %s".format(
+            quote(Tournament.players.through._meta.db_table)
+        )
+        tables["tournamentFilter"] = f"AND x.player_id IN ({participants})"
+        # Spieler außerhalb des Turniers haben dort keinen Rang
+        tables["outerTournamentFilter"] = f"AND bt.player_id IN ({participants})"
+        tournamentParams = [tournamentId]
+
+    if playerIds is not None:
+        playerIds = list(playerIds) or [-1]
+        sql = _PLAYER_RANK_SQL.format(playerIds=", ".join(["%s"] * len(playerIds)), **tables)
+        params = tournamentParams + playerIds + tournamentParams
+    else:
+        sql = _TOP_K_SQL.format(**tables)
+        params = tournamentParams + [topK]
+
+    rows: dict[int, list[LeaderboardEntry]] = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for bossId, rank, playerId, playerName, bestTimeMs in cursor.fetchall():
+            rows.setdefault(bossId, []).append(LeaderboardEntry(rank, playerId, playerName, bestTimeMs))
+    return rows
+
+
+def recordPersonalBest(bossId: int, playerId: int, timeMs: int) -> bool:
+    """
+    Neue Bestzeit ins materialisierte Top-K übernehmen. In der Transaktion aufrufen, die
+    BossTime schreibt. Schafft es die Zeit nicht ins Top-K, bleibt es bei einer Lese-Query;
+    sonst werden nur die Plätze ab der ersten Änderung neu geschrieben. True = Top-K geändert.
+    """
+    # Boss-Zeile sperren: gleichzeitige Bestzeiten desselben Bosses nacheinander einsortieren
+    Boss.objects.select_for_update().filter(id=bossId).exists()
+
+    current = list(
+        BossLeaderboardEntry.objects.filter(boss_id=bossId)
+        .order_by("rank")
+        .values_list("best_time_ms", "player_id")
+    )
+    entry = (timeMs, playerId)
+    inList = any(p == playerId for _, p in current)
+    if not inList and len(current) >= MATERIALIZED_TOP_K and entry >= current[-1]:
+        return False
+
+    updated = [e for e in current if e[1] != playerId]
+    bisect.insort(updated, entry)
+    updated = updated[:MATERIALIZED_TOP_K]
+
+    firstChanged = next(
+        (i for i, (old, new) in enumerate(zip(current, updated)) if old != new),
+        min(len(current), len(updated)),
+    )
+    if firstChanged == len(current) == len(updated):
+        return False
+
+    BossLeaderboardEntry.objects.filter(boss_id=bossId, rank__gt=firstChanged).delete()
+    BossLeaderboardEntry.objects.bulk_create(
+        BossLeaderboardEntry(boss_id=bossId, rank=i + 1, player_id=p, best_time_ms=t)
+        for i, (t, p) in enumerate(updated[firstChanged:], start=firstChanged)
+    )
+    return True
+
+
+@transaction.atomic
+def rebuildBossLeaderboards() -> int:
+    """
+    Materialisiertes Top-K komplett aus BossTime neu aufbauen (und die Rang-Indizes verwerfen).
+    Gibt die Anzahl Einträge zurück.
+    """
+    bossIds = list(Boss.objects.values_list("id", flat=True))
+    transaction.on_commit(lambda: invalidateRankIndexes(bossIds))
+    rows = computeLeaderboardRows(MATERIALIZED_TOP_K)
+    BossLeaderboardEntry.objects.all().delete()
+    entries = BossLeaderboardEntry.objects.bulk_create(
+        BossLeaderboardEntry(boss_id=bossId, rank=e.rank, player_id=e.playerId, best_time_ms=e.bestTimeMs)
+        for bossId, bossEntries in rows.items()
+        for e in bossEntries
+    )
+    return len(entries)
+
+
+def checkBossLeaderboards() -> list[str]:
+    """
+    Vergleicht das materialisierte Top-K mit dem aus BossTime berechneten.
+    Gibt eine Zeile pro abweichendem Boss zurück (leer = konsistent).
+    """
+    expected = computeLeaderboardRows(MATERIALIZED_TOP_K)
+    actual = materializedLeaderboardRows(MATERIALIZED_TOP_K)
+
+    def key(entries):
+        return [(e.rank, e.playerId, e.bestTimeMs) for e in entries]
+
+    problems = []
+    for bossId in sorted(set(expected) | set(actual)):
+        want, have = key(expected.get(bossId, [])), key(actual.get(bossId, []))
+        if want != have:
+            firstDiff = next((i for i, (w, h) in enumerate(zip(want, have)) if w != h), min(len(want), len(have)))
+            problems.append(
+                f"Boss {bossId}: {len(have)} entries, expected {len(want)}; first difference at rank {firstDiff + 1}"
+            )
+    return problems
+
+
+def bossLeaderboards(
+    topK: int = DEFAULT_TOP_K,
+    *,
+    tournamentId: int | None = None,
+    playerIds: list[int] | None = None,
+) -> list[tuple[Boss, list[LeaderboardEntry]]]:
+    """
+    Alle Bosse (nach Name) mit ihren Einträgen – zwei Queries, unabhängig von der Anzahl der Bosse.
+    """
+    rows = leaderboardRows(topK, tournamentId=tournamentId, playerIds=playerIds)
+    return [(boss, rows.get(boss.id, [])) for boss in Boss.objects.order_by("name")]
+
+
+def parseLeaderboardParams(params) -> dict:
+    """
+    Query-Parameter ?top=K&tournament=ID&player=ID&player=ID… (HTML-Seite und API).
+    Ungültige Werte fallen auf den Standard zurück, top wird auf 1..MAX_TOP_K begrenzt.
+    """
+    def toInt(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    topK = toInt(params.get("top")) or DEFAULT_TOP_K
+    playerIds = [p for p in (toInt(v) for v in params.getlist("player")) if p is not None]
+    return {
+        "topK": min(max(topK, 1), MAX_TOP_K),
+        "tournamentId": toInt(params.get("tournament")),
+        "playerIds": playerIds or None,
+    }
+
+
+def encodeCursor(entry: LeaderboardEntry) -> str:
+    # Nur die Position (Zeit, Spieler); der Rang kommt immer aus dem Rang-Index
+    raw = f"{entry.bestTimeMs}:{entry.playerId}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decodeCursor(cursor: str) -> tuple[int, int]:
+    """
+    (bestTimeMs, playerId) aus einem Cursor; ValueError bei ungültigem Cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timeMs, playerId = (int(part) for part in raw.split(":"))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.")
+    return timeMs, playerId
+
+
+def leaderboardPage(
+    bossId: int,
+    *,
+    after: str | None = None,
+    before: str | None = None,
+    playerId: int | None = None,
+    pageSize: int = DEFAULT_PAGE_SIZE,
+) -> LeaderboardPage:
+    """
+    Eine Seite des vollen Leaderboards eines Bosses, Keyset-paginiert auf (best_time_ms, player_id)
+    über den (boss, best_time_ms, player)-Index: jede Seite ist eine Index-Range mit LIMIT,
+    egal wie tief. after/before: Cursor aus einer vorherigen Seite. playerId: Seite, die mit
+    diesem Spieler beginnt. Ohne Angabe: Seite eins. Ränge kommen aus dem Rang-Index.
+    ValueError bei ungültigem Cursor, BossTime.DoesNotExist wenn der Spieler keine Zeit hat.
+    """
+    times = BossTime.objects.filter(boss_id=bossId, best_time_ms__isnull=False)
+    descending = False
+    if playerId is not None:
+        timeMs = times.values_list("best_time_ms", flat=True).get(player_id=playerId)
+        times = times.filter(Q(best_time_ms__gt=timeMs) | Q(best_time_ms=timeMs, player_id__gte=playerId))
+    elif after is not None:
+        timeMs, cursorPlayerId = decodeCursor(after)
+        times = times.filter(Q(best_time_ms__gt=timeMs) | Q(best_time_ms=timeMs, player_id__gt=cursorPlayerId))
+    elif before is not None:
+        timeMs, cursorPlayerId = decodeCursor(before)
+        descending = True
+        times = times.filter(Q(best_time_ms__lt=timeMs) | Q(best_time_ms=timeMs, player_id__lt=cursorPlayerId))
+
+    # Untere Grenze zusätzlich als Range, damit der Index ab der Cursor-Zeit gelesen wird
+    if playerId is not None or after is not None:
+        times = times.filter(best_time_ms__gte=timeMs)
+    elif before is not None:
+        times = times.filter(best_time_ms__lte=timeMs)
+
+    order = ("-best_time_ms", "-player_id") if descending else ("best_time_ms", "player_id")
+    rows = list(times.order_by(*order).values_list("best_time_ms", "player_id", "player__name")[:pageSize + 1])
+    hasMore = len(rows) > pageSize
+    rows = rows[:pageSize]
+    if descending:
+        rows.reverse()
+
+    # Rang der ersten Zeile aus dem Rang-Index, nie aus dem Cursor: ein Client kann ihn nicht
+    # fälschen, und neue Bestzeiten vor der Seite verschieben ihn korrekt mit
+    firstRank = 1
+    if rows and (playerId is not None or after is not None or before is not None):
+        keys = getRankIndexes([bossId])[bossId]
+        firstRank = int(np.searchsorted(keys, rankKey(rows[0][0], rows[0][1]))) + 1
+
+    entries = [
+        LeaderboardEntry(firstRank + i, rowPlayerId, playerName, bestTimeMs)
+        for i, (bestTimeMs, rowPlayerId, playerName) in enumerate(rows)
+    ]
+    if descending:
+        hasNext, hasPrevious = True, hasMore
+    else:
+        hasNext, hasPrevious = hasMore, firstRank > 1
+    return LeaderboardPage(
+        entries=entries,
+        nextCursor=encodeCursor(entries[-1]) if entries and hasNext else None,
+        previousCursor=encodeCursor(entries[0]) if entries and hasPrevious else None,
+    )
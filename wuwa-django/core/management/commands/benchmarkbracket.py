@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.bracket import generateDoubleElim, generateSingleElim
+from core.models import Boss, Player, Tournament
+
+
+class Command(BaseCommand):
+    help = "Misst Dauer und Query-Anzahl der Bracket-Generierung (Daten werden danach zurückgerollt)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, nargs="+", default=[8, 64, 256, 1024])
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--format", choices=["single", "double"], default="single")
+
+    def handle(self, *args, **options):
+        generate = generateDoubleElim if options["format"] == "double" else generateSingleElim
+        for playerCount in options["players"]:
+            with transaction.atomic():
+                tournament = Tournament.objects.create(name=f"Benchmark {playerCount}")
+                players = Player.objects.bulk_create(Player(name=f"Bench {i}") for i in range(playerCount))
+                tournament.players.set(players)
+                if not Boss.objects.exists():
+                    Boss.objects.create(slug="benchmark-boss", name="Benchmark Boss")
+
+                timings = []
+                for repeat in range(options["repeat"]):
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        matches = generate(tournament, shuffleSeed=repeat, overwrite=True)
+                        timings.append(time.perf_counter() - start)
+
+                self.stdout.write(
+                    f"{playerCount:>6} players: {len(matches):>5} matches, "
+                    f"{len(queries.captured_queries):>3} queries, best {min(timings) * 1000:.1f} ms"
+                )
+                transaction.set_rollback(True)
@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.leaderboard import rebuildBossLeaderboards
+from core.models import Boss, BossTime, Player
+from core.views import leaderboards
+
+
+class Command(BaseCommand):
+    help = "Misst die Leaderboard-Seite mit vielen Bossen und Spielern (Daten werden danach zurückgerollt)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bosses", type=int, default=200)
+        parser.add_argument("--players", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--top", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = random.Random(1)
+        with transaction.atomic():
+            start = time.perf_counter()
+            bosses = Boss.objects.bulk_create(
+                Boss(slug=f"bench-boss-{i}", name=f"Bench Boss {i}") for i in range(options["bosses"])
+            )
+            players = Player.objects.bulk_create(Player(name=f"Bench {i}") for i in range(options["players"]))
+
+            # Millionen Zeilen: executemany statt Model-Instanzen
+            quote = connection.ops.quote_name
+            now = timezone.now()
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO {} ({}, {}, {}, {}) VALUES (%s, %s, %s, %s)".format(
+                        quote(BossTime._meta.db_table), quote("player_id"), quote("boss_id"),
+                        quote("best_time_ms"), quote("updated_at"),
+                    ),
+                    ((p.id, b.id, rng.randint(20_000, 180_000), now) for b in bosses for p in players),
+                )
+            self.stdout.write(
+                f"Setup: {len(bosses)} bosses x {len(players)} players in {time.perf_counter() - start:.1f} s"
+            )
+
+            # Raw-Insert umgeht das inkrementelle Top-K
+            start = time.perf_counter()
+            rebuildBossLeaderboards()
+            self.stdout.write(f"Rebuild of materialized top-K: {time.perf_counter() - start:.1f} s")
+
+            request = RequestFactory().get("/leaderboards/", {"top": options["top"]})
+            timings = []
+            for _ in range(options["repeat"]):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = leaderboards(request)
+                    timings.append(time.perf_counter() - start)
+
+            self.stdout.write(
+                f"/leaderboards/ top {options['top']}: status {response.status_code}, "
+                f"{len(queries.captured_queries)} queries, best {min(timings) * 1000:.1f} ms"
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.leaderboard import checkBossLeaderboards, rebuildBossLeaderboards
+
+
+class Command(BaseCommand):
+    help = "Baut das materialisierte Top-K pro Boss aus BossTime neu auf (--check: nur vergleichen)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Nur prüfen, nichts schreiben.")
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            problems = checkBossLeaderboards()
+            for problem in problems:
+                self.stdout.write(problem)
+            if problems:
+                raise CommandError(f"{len(problems)} boss leaderboard(s) out of sync, run rebuildleaderboards.")
+            self.stdout.write("Leaderboards consistent.")
+            return
+
+        count = rebuildBossLeaderboards()
+        self.stdout.write(f"Rebuilt {count} leaderboard entries.")
@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.ratings import recomputeRatings
+
+
+class Command(BaseCommand):
+    help = "Berechnet alle Elo-Ratings und die RatingHistory aus der kompletten Match-Historie neu."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = recomputeRatings()
+        self.stdout.write(f"Replayed {count} matches in {time.perf_counter() - start:.1f} s.")
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_alter_match_player_left_alter_match_player_right'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='draft_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='players',
+            field=models.ManyToManyField(blank=True, related_name='tournaments', to='core.player'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_match_draft_version_tournament_players'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='draft_format',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
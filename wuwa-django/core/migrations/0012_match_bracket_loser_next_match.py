@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_tournament_draft_format'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='match',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='bracket',
+            field=models.CharField(choices=[('W', 'Winners'), ('L', 'Losers'), ('GF', 'Grand Final')], default='W', max_length=2),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='loser_next_match',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='previous_losers', to='core.match'),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='loser_next_side',
+            field=models.CharField(blank=True, choices=[('LEFT', 'Left'), ('RIGHT', 'Right')], max_length=5, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='match',
+            unique_together={('tournament', 'bracket', 'round_index', 'match_index')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_match_bracket_loser_next_match'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='match',
+            name='bracket',
+            field=models.CharField(choices=[('W', 'Winners'), ('L', 'Losers'), ('GF', 'Grand Final'), ('S', 'Swiss')], default='W', max_length=2),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_match_bracket_swiss'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='group_index',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='match',
+            name='bracket',
+            field=models.CharField(choices=[('W', 'Winners'), ('L', 'Losers'), ('GF', 'Grand Final'), ('S', 'Swiss'), ('G', 'Group Stage')], default='W', max_length=2),
+        ),
+    ]
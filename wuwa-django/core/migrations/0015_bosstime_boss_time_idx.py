@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_match_group_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bosstime',
+            index=models.Index(fields=['boss', 'best_time_ms', 'player'], name='bosstime_boss_time_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Stand der Migration (leaderboard.MATERIALIZED_TOP_K kann sich später ändern)
+TOP_K = 100
+
+
+def fillLeaderboards(apps, schemaEditor):
+    Boss = apps.get_model("core", "Boss")
+    BossTime = apps.get_model("core", "BossTime")
+    BossLeaderboardEntry = apps.get_model("core", "BossLeaderboardEntry")
+
+    entries = []
+    for bossId in Boss.objects.values_list("id", flat=True):
+        times = (
+            BossTime.objects.filter(boss_id=bossId, best_time_ms__isnull=False)
+            .order_by("best_time_ms", "player_id")
+            .values_list("player_id", "best_time_ms")[:TOP_K]
+        )
+        entries += [
+            BossLeaderboardEntry(boss_id=bossId, rank=i + 1, player_id=playerId, best_time_ms=timeMs)
+            for i, (playerId, timeMs) in enumerate(times)
+        ]
+    BossLeaderboardEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_bosstime_boss_time_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BossLeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('best_time_ms', models.PositiveIntegerField()),
+                ('boss', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='core.boss')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='core.player')),
+            ],
+            options={
+                'ordering': ['boss', 'rank'],
+                'unique_together': {('boss', 'player'), ('boss', 'rank')},
+            },
+        ),
+        migrations.RunPython(fillLeaderboards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_bossleaderboardentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time_ms', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('boss', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_submissions', to='core.boss')),
+                ('match', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='time_submissions', to='core.match')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_submissions', to='core.player')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['boss', 'time_ms'], name='timesub_boss_time_idx'), models.Index(fields=['player', 'boss', 'created_at'], name='timesub_player_boss_idx')],
+            },
+        ),
+    ]
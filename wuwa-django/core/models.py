@@ -1,5 +1,7 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 
 class UserRole(models.TextChoices):
@@ -13,6 +15,14 @@ class MatchSide(models.TextChoices):
     RIGHT = "RIGHT", "Right"
 
 
+class BracketType(models.TextChoices):
+    WINNERS = "W", "Winners"
+    LOSERS = "L", "Losers"
+    GRAND_FINAL = "GF", "Grand Final"
+    SWISS = "S", "Swiss"
+    GROUP = "G", "Group Stage"
+
+
 class DraftActionType(models.TextChoices):
     PICK = "PICK", "Pick"
     BAN = "BAN", "Ban"
@@ -43,9 +53,22 @@ class Tournament(models.Model):
     
     players = models.ManyToManyField(Player, blank=True, related_name="tournaments")
 
+    # Draft-Format als Liste von Steps, z.B. [{"action": "BAN", "sides": "BOTH", "count": 3}, ...]
+    # None = Standardformat (siehe draftformat.DEFAULT_DRAFT_FORMAT)
+    draft_format = models.JSONField(null=True, blank=True)
+
     def __str__(self) -> str:
         return self.name
 
+    def clean(self):
+        from .draftformat import compileDraftFormat
+
+        if self.draft_format is not None:
+            try:
+                compileDraftFormat(self.draft_format)
+            except ValueError as e:
+                raise ValidationError({"draft_format": str(e)})
+
 
 class Boss(models.Model):
     slug = models.SlugField(unique=True)
@@ -88,8 +111,13 @@ class Match(models.Model):
     left_picks_confirmed = models.BooleanField(default=False)
     right_picks_confirmed = models.BooleanField(default=False)
 
-    def __str__(self) -> str:
-        return f"{self.player_left} vs {self.player_right}"
+    # Monoton steigende Version des Draft-Zustands, Schlüssel für den Draft-Cache.
+    # Geschrieben nur per Update in draftcache (bumpDraftVersion(s), claimDraftVersion), nie über save().
+    # save()/delete() von Match und Tournament vergessen die gecachte Version per Signal
+    # (core/draftcache.py). Wer per QuerySet.update()/bulk_update oder über MatchDraftAction am
+    # Draft vorbei ändert, muss selbst bumpDraftVersions aufrufen – sonst liefert der Cache bis
+    # zum Timeout den alten Stand. Der Admin tut das (core/admin.py).
+    draft_version = models.PositiveIntegerField(default=0)
 
     round_index = models.PositiveIntegerField(default=0, db_index=True)
     match_index = models.PositiveIntegerField(default=0, db_index=True)
@@ -103,10 +131,36 @@ class Match(models.Model):
     )
     next_side = models.CharField(max_length=5, choices=MatchSide.choices, null=True, blank=True)
 
+    # Double Elimination: Bracket-Teil und Ziel des Verlierers (None = ausgeschieden)
+    bracket = models.CharField(max_length=2, choices=BracketType.choices, default=BracketType.WINNERS)
+    loser_next_match = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="previous_losers",
+    )
+    loser_next_side = models.CharField(max_length=5, choices=MatchSide.choices, null=True, blank=True)
+
+    # Gruppenphase: Gruppe (0-basiert), None außerhalb der Gruppenphase
+    group_index = models.PositiveIntegerField(null=True, blank=True)
+
     class Meta:
-        unique_together = [("tournament", "round_index", "match_index")]
+        unique_together = [("tournament", "bracket", "round_index", "match_index")]
         ordering = ["round_index", "match_index"]
 
+    def __str__(self) -> str:
+        return f"{self.player_left} vs {self.player_right}"
+
+    def save(self, *args, **kwargs):
+        # Normale Saves dürfen eine parallel hochgezählte draft_version nicht mit einem alten Wert überschreiben
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != "draft_version"
+            ]
+        super().save(*args, **kwargs)
+
 class MatchDraftAction(models.Model):
     match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name="draft_actions")
     
@@ -152,4 +206,89 @@ class BossTime(models.Model):
 
     class Meta:
         unique_together = [("player", "boss")]
+        # Leaderboards: Rang pro Boss nach Zeit direkt aus dem Index
+        indexes = [models.Index(fields=["boss", "best_time_ms", "player"], name="bosstime_boss_time_idx")]
         ordering = ["best_time_ms"]
+
+
+class BossLeaderboardEntry(models.Model):
+    """
+    Materialisiertes Top-K pro Boss (siehe leaderboard.MATERIALIZED_TOP_K), rank 1..K lückenlos.
+    Wird bei neuen Bestzeiten inkrementell nachgeführt; Quelle der Wahrheit bleibt BossTime
+    (Neuaufbau/Prüfung: manage.py rebuildleaderboards).
+    """
+    boss = models.ForeignKey(Boss, on_delete=models.CASCADE, related_name="leaderboard_entries")
+    rank = models.PositiveSmallIntegerField()
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="leaderboard_entries")
+    best_time_ms = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = [("boss", "rank"), ("boss", "player")]
+        ordering = ["boss", "rank"]
+
+    def __str__(self) -> str:
+        return f"{self.boss} #{self.rank} {self.player} ({self.best_time_ms} ms)"
+
+
+class TimeSubmission(models.Model):
+    """
+    Append-only Log aller eingereichten Zeiten (BossTime hält nur die Bestzeit).
+    Zeilen werden nie geändert; Auswertung über timestats.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="time_submissions")
+    boss = models.ForeignKey(Boss, on_delete=models.CASCADE, related_name="time_submissions")
+    match = models.ForeignKey(Match, null=True, blank=True, on_delete=models.SET_NULL, related_name="time_submissions")
+
+    time_ms = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["boss", "time_ms"], name="timesub_boss_time_idx"),
+            models.Index(fields=["player", "boss", "created_at"], name="timesub_player_boss_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.player} {self.boss} {self.time_ms} ms"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("TimeSubmission is append-only.")
+        super().save(*args, **kwargs)
+
+
+class PlayerRating(models.Model):
+    """
+    Aktuelles Elo pro Spieler (siehe ratings). Wird bei jedem Match-Ende fortgeschrieben;
+    Neuaufbau aus der ganzen Match-Historie: manage.py recomputeratings.
+    """
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name="rating")
+    rating = models.FloatField()
+    matches_played = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["-rating", "player"], name="rating_desc_idx")]
+        ordering = ["-rating"]
+
+    def __str__(self) -> str:
+        return f"{self.player} {self.rating:.0f}"
+
+
+class RatingHistory(models.Model):
+    """
+    Rating vor und nach jedem gewerteten Match, eine Zeile pro Spieler und Match.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="rating_history")
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name="rating_history")
+    rating_before = models.FloatField()
+    rating_after = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = [("player", "match")]
+        indexes = [models.Index(fields=["player", "created_at"], name="ratinghist_player_idx")]
+        ordering = ["created_at", "id"]
+
+    def __str__(self) -> str:
+        return f"{self.player} {self.rating_before:.0f} -> {self.rating_after:.0f}"
@@ -1,6 +1,9 @@
 from functools import wraps
 from django.http import HttpResponseForbidden
 from django.shortcuts import redirect
+from rest_framework.permissions import BasePermission
+
+from .models import UserRole
 
 def requireLogin(viewFunc):
     @wraps(viewFunc)
@@ -21,3 +24,12 @@ def requireRole(*allowedRoles):
             return viewFunc(request, *args, **kwargs)
         return wrapper
     return decorator
+
+
+class IsHost(BasePermission):
+    """
+    DRF-Gegenstück zu requireRole(ADMIN, COMMENTATOR) für Host-APIs.
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and user.role in (UserRole.ADMIN, UserRole.COMMENTATOR))
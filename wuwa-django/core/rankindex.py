@@ -0,0 +1,165 @@
+"""
+Rang eines Spielers auf allen Bossen ohne COUNT über die Index-Range.
+
+Pro Boss hält jeder Prozess ein sortiertes NumPy-Array der Bestzeiten (Schlüssel
+best_time_ms << 32 | player_id, also gleiche Reihenfolge wie das Leaderboard). Der Rang
+ist dann ein searchsorted (O(log n)) statt eines Counts über alle schnelleren Einträge.
+
+Eine Versionsnummer pro Boss im Cache hält die Prozesse synchron: neue Bestzeiten werden nach
+dem Commit im eigenen Array einsortiert und die Version hochgezählt; andere Prozesse sehen die
+neue Version und laden den Boss beim nächsten Zugriff neu.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+from typing import NamedTuple
+
+import numpy as np
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import BossTime
+
+
+RANK_INDEX_CACHE_ALIAS = "default"
+
+_PLAYER_BITS = 32
+
+_indexes: dict[int, tuple[int, np.ndarray]] = {}  # bossId -> (Version, sortierte Schlüssel)
+_lock = threading.Lock()
+
+
+class PlayerRank(NamedTuple):
+    bossId: int
+    bossName: str
+    bestTimeMs: int
+    rank: int
+    total: int
+    percentile: float  # Anteil des Felds hinter dem Spieler, 0..100
+
+
+def _versionKey(bossId: int) -> str:
+    return f"rankindex:version:{bossId}"
+
+
+def rankKey(timeMs: int, playerId: int) -> int:
+    return (timeMs << _PLAYER_BITS) | playerId
+
+
+def _currentVersions(bossIds: list[int]) -> dict[int, int]:
+    # Fehlende Versionen (neuer Boss, geleerter Cache) mit Zufallsstart anlegen, damit ein
+    # altes lokales Array nicht zufällig als aktuell gilt
+    cache = caches[RANK_INDEX_CACHE_ALIAS]
+    found = cache.get_many([_versionKey(b) for b in bossIds])
+    versions = {}
+    for bossId in bossIds:
+        version = found.get(_versionKey(bossId))
+        if version is None:
+            cache.add(_versionKey(bossId), random.getrandbits(31), None)
+            version = cache.get(_versionKey(bossId))
+        versions[bossId] = version
+    return versions
+
+
+def _loadIndexes(bossIds: list[int]) -> dict[int, np.ndarray]:
+    # Alle veralteten Bosse in einer Query über den (boss, best_time_ms, player)-Index
+    rows = np.asarray(
+        BossTime.objects.filter(boss_id__in=bossIds, best_time_ms__isnull=False)
+        .order_by("boss_id", "best_time_ms", "player_id")
+        .values_list("boss_id", "best_time_ms", "player_id"),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    keys = (rows[:, 1] << _PLAYER_BITS) | rows[:, 2]
+    bounds = np.searchsorted(rows[:, 0], bossIds)
+    ends = np.searchsorted(rows[:, 0], bossIds, side="right")
+    return {bossId: keys[start:end] for bossId, start, end in zip(bossIds, bounds, ends)}
+
+
+def getRankIndexes(bossIds: list[int]) -> dict[int, np.ndarray]:
+    """
+    Sortierte Schlüssel pro Boss; veraltete oder fehlende Bosse werden gemeinsam nachgeladen.
+    """
+    versions = _currentVersions(bossIds)
+    with _lock:
+        result = {b: _indexes[b][1] for b in bossIds if b in _indexes and _indexes[b][0] == versions[b]}
+    stale = [b for b in bossIds if b not in result]
+    if stale:
+        loaded = _loadIndexes(stale)
+        with _lock:
+            for bossId in stale:
+                _indexes[bossId] = (versions[bossId], loaded[bossId])
+        result.update(loaded)
+    return result
+
+
+def _applyChange(bossId: int, playerId: int, previousMs: int | None, timeMs: int) -> None:
+    cache = caches[RANK_INDEX_CACHE_ALIAS]
+    try:
+        version = cache.incr(_versionKey(bossId))
+    except ValueError:
+        # Noch keine Version: niemand hat den Boss geladen
+        return
+
+    with _lock:
+        entry = _indexes.get(bossId)
+        if entry is None:
+            return
+        if entry[0] != version - 1:
+            # Zwischendurch hat ein anderer Prozess geschrieben: beim nächsten Lesen neu laden
+            del _indexes[bossId]
+            return
+        keys = entry[1]
+        # Idempotent: das Array kann die neue Zeit schon aus der DB enthalten
+        if previousMs is not None:
+            old = rankKey(previousMs, playerId)
+            pos = np.searchsorted(keys, old)
+            if pos < len(keys) and keys[pos] == old:
+                keys = np.delete(keys, pos)
+        new = rankKey(timeMs, playerId)
+        pos = np.searchsorted(keys, new)
+        if pos == len(keys) or keys[pos] != new:
+            keys = np.insert(keys, pos, new)
+        _indexes[bossId] = (version, keys)
+
+
+def recordRankChange(bossId: int, playerId: int, previousMs: int | None, timeMs: int) -> None:
+    """
+    Neue Bestzeit nach dem Commit in den Rang-Index übernehmen (previousMs = alte Bestzeit oder None).
+    In der Transaktion aufrufen, die BossTime schreibt.
+    """
+    transaction.on_commit(lambda: _applyChange(bossId, playerId, previousMs, timeMs))
+
+
+def invalidateRankIndexes(bossIds: list[int]) -> None:
+    """
+    Nach Änderungen an BossTime außerhalb von matchSubmitTime (Admin, Import, Rebuild):
+    alle Prozesse laden die Bosse beim nächsten Zugriff neu.
+    """
+    caches[RANK_INDEX_CACHE_ALIAS].delete_many([_versionKey(b) for b in bossIds])
+
+
+def playerRanks(playerId: int) -> list[PlayerRank]:
+    """
+    Rang und Perzentil des Spielers auf jedem Boss mit Bestzeit (nach Bossname).
+    Eine Query für die eigenen Bestzeiten, danach nur searchsorted pro Boss.
+    """
+    bests = list(
+        BossTime.objects.filter(player_id=playerId, best_time_ms__isnull=False)
+        .order_by("boss__name")
+        .values_list("boss_id", "boss__name", "best_time_ms")
+    )
+    if not bests:
+        return []
+
+    indexes = getRankIndexes([bossId for bossId, _, _ in bests])
+    ranks = []
+    for bossId, bossName, bestTimeMs in bests:
+        keys = indexes[bossId]
+        rank = int(np.searchsorted(keys, rankKey(bestTimeMs, playerId))) + 1
+        total = max(len(keys), rank)
+        ranks.append(PlayerRank(
+            bossId, bossName, bestTimeMs, rank, total, round(100 * (total - rank) / total, 1),
+        ))
+    return ranks
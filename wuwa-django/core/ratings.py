@@ -0,0 +1,258 @@
+"""
+Elo-Rating aus Match-Ergebnissen.
+
+Live: recordMatchRatings schreibt beim Match-Ende (hostMatchFinish, finalizeMatches) die
+Ratings beider Spieler fort und legt je eine RatingHistory-Zeile an.
+
+Offline: recomputeRatings spielt die ganze Historie neu ab. Ein Elo-Update hängt nur von
+den beiden beteiligten Ratings ab, deshalb werden die Matches in Wellen eingeteilt, in denen
+jeder Spieler höchstens einmal vorkommt (Reihenfolge pro Spieler bleibt erhalten). Jede Welle
+ist ein NumPy-Update über alle ihre Matches – gleiches Ergebnis wie Match für Match.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Match, PlayerRating, RatingHistory
+
+
+INITIAL_RATING = 1500.0
+# Neue Spieler bewegen sich schneller zu ihrem Niveau
+PROVISIONAL_MATCHES = 20
+PROVISIONAL_K = 40.0
+K_FACTOR = 20.0
+
+DEFAULT_RATING_TOP = 50
+MAX_RATING_TOP = 500
+
+
+class RatingEntry(NamedTuple):
+    rank: int
+    playerId: int
+    playerName: str
+    rating: float
+    matchesPlayed: int
+
+
+class ReplayResult(NamedTuple):
+    ratings: np.ndarray  # Endstand pro Spieler-Index
+    played: np.ndarray
+    leftBefore: np.ndarray  # pro Match, in Eingabereihenfolge
+    leftAfter: np.ndarray
+    rightBefore: np.ndarray
+    rightAfter: np.ndarray
+
+
+def expectedScore(rating: np.ndarray | float, opponent: np.ndarray | float) -> np.ndarray | float:
+    return 1.0 / (1.0 + 10.0 ** ((opponent - rating) / 400.0))
+
+
+def kFactor(played: np.ndarray | int) -> np.ndarray | float:
+    return np.where(np.asarray(played) < PROVISIONAL_MATCHES, PROVISIONAL_K, K_FACTOR)
+
+
+def _ratedMatches():
+    # Gewertet wird jedes beendete Match mit zwei Spielern und Sieger
+    return Match.objects.filter(
+        finished_at__isnull=False,
+        winner_player__isnull=False,
+        player_left__isnull=False,
+        player_right__isnull=False,
+    )
+
+
+def _waves(left: np.ndarray, right: np.ndarray, playerCount: int) -> np.ndarray:
+    # Welle = eins nach der letzten Welle beider Spieler; ein linearer Durchlauf
+    last = [-1] * playerCount
+    waves = np.empty(len(left), dtype=np.int64)
+    for i, (l, r) in enumerate(zip(left.tolist(), right.tolist())):
+        wave = max(last[l], last[r]) + 1
+        last[l] = last[r] = wave
+        waves[i] = wave
+    return waves
+
+
+def replayRatings(
+    left: np.ndarray,
+    right: np.ndarray,
+    leftWon: np.ndarray,
+    playerCount: int,
+) -> ReplayResult:
+    """
+    Elo über Matches in chronologischer Reihenfolge. left/right: Spieler-Indizes 0..playerCount-1,
+    leftWon: bool pro Match. Alle starten bei INITIAL_RATING.
+    """
+    ratings = np.full(playerCount, INITIAL_RATING)
+    played = np.zeros(playerCount, dtype=np.int64)
+    n = len(left)
+    leftBefore, leftAfter = np.empty(n), np.empty(n)
+    rightBefore, rightAfter = np.empty(n), np.empty(n)
+    if not n:
+        return ReplayResult(ratings, played, leftBefore, leftAfter, rightBefore, rightAfter)
+
+    waves = _waves(left, right, playerCount)
+    order = np.argsort(waves, kind="stable")
+    bounds = np.flatnonzero(np.diff(waves[order])) + 1
+    score = leftWon.astype(np.float64)
+
+    for idx in np.split(order, bounds):
+        l, r = left[idx], right[idx]
+        rl, rr = ratings[l], ratings[r]
+        expected = expectedScore(rl, rr)
+        newL = rl + kFactor(played[l]) * (score[idx] - expected)
+        newR = rr + kFactor(played[r]) * (expected - score[idx])
+        leftBefore[idx], rightBefore[idx] = rl, rr
+        leftAfter[idx], rightAfter[idx] = newL, newR
+        ratings[l], ratings[r] = newL, newR
+        played[l] += 1
+        played[r] += 1
+
+    return ReplayResult(ratings, played, leftBefore, leftAfter, rightBefore, rightAfter)
+
+
+def recordMatchRatings(matches: list[Match]) -> int:
+    """
+    Ratings für frisch beendete Matches fortschreiben – in der Transaktion, die sie beendet
+    (jedes Match genau einmal; ein zweites Mal verletzt unique (player, match)).
+    Drei Queries, unabhängig von der Anzahl Matches. Gibt die Anzahl gewerteter Matches zurück.
+    """
+    matches = sorted(
+        (
+            m for m in matches
+            if m.finished_at is not None and m.winner_player_id is not None
+            and m.player_left_id is not None and m.player_right_id is not None
+        ),
+        key=lambda m: (m.finished_at, m.id),
+    )
+    if not matches:
+        return 0
+
+    playerIds = {p for m in matches for p in (m.player_left_id, m.player_right_id)}
+    existing = PlayerRating.objects.select_for_update().in_bulk(playerIds)
+    ratings = {
+        playerId: existing.get(playerId) or PlayerRating(player_id=playerId, rating=INITIAL_RATING)
+        for playerId in playerIds
+    }
+
+    now = timezone.now()
+    history = []
+    for match in matches:
+        leftRating, rightRating = ratings[match.player_left_id], ratings[match.player_right_id]
+        score = 1.0 if match.winner_player_id == match.player_left_id else 0.0
+        expected = expectedScore(leftRating.rating, rightRating.rating)
+        for rating, delta in (
+            (leftRating, kFactor(leftRating.matches_played) * (score - expected)),
+            (rightRating, kFactor(rightRating.matches_played) * (expected - score)),
+        ):
+            history.append(RatingHistory(
+                player_id=rating.player_id, match=match,
+                rating_before=rating.rating, rating_after=rating.rating + float(delta), created_at=match.finished_at,
+            ))
+            rating.rating += float(delta)
+            rating.matches_played += 1
+            rating.updated_at = now
+
+    # Neue und bestehende Ratings in einem Upsert
+    PlayerRating.objects.bulk_create(
+        ratings.values(),
+        update_conflicts=True,
+        unique_fields=["player"],
+        update_fields=["rating", "matches_played", "updated_at"],
+    )
+    RatingHistory.objects.bulk_create(history)
+    return len(matches)
+
+
+@transaction.atomic
+def recomputeRatings() -> int:
+    """
+    Alle Ratings und die komplette RatingHistory aus der Match-Historie neu aufbauen.
+    Gibt die Anzahl gewerteter Matches zurück.
+    """
+    # Roh über den Cursor: finished_at bleibt im DB-Format und geht unverändert in die History
+    sql, params = (
+        _ratedMatches()
+        .order_by("finished_at", "id")
+        .values_list("id", "player_left_id", "player_right_id", "winner_player_id", "finished_at")
+        .query.sql_with_params()
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    finishedAt = [row[4] for row in rows]
+    matchIds, leftIds, rightIds, winnerIds = np.asarray([row[:4] for row in rows], dtype=np.int64).reshape(-1, 4).T
+
+    playerIds, inverse = np.unique(np.concatenate([leftIds, rightIds]), return_inverse=True)
+    left, right = inverse[:len(rows)], inverse[len(rows):]
+    result = replayRatings(left, right, winnerIds == leftIds, len(playerIds))
+
+    RatingHistory.objects.all().delete()
+    PlayerRating.objects.all().delete()
+
+    now = timezone.now()
+    PlayerRating.objects.bulk_create(
+        (
+            PlayerRating(player_id=playerId, rating=rating, matches_played=played, updated_at=now)
+            for playerId, rating, played in zip(
+                playerIds.tolist(), result.ratings.tolist(), result.played.tolist()
+            )
+        ),
+        batch_size=1000,
+    )
+
+    # Millionen Zeilen: executemany statt Model-Instanzen
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO {} ({}, {}, {}, {}, {}) VALUES (%s, %s, %s, %s, %s)".format(
+                quote(RatingHistory._meta.db_table), quote("player_id"), quote("match_id"),
+                quote("rating_before"), quote("rating_after"), quote("created_at"),
+            ),
+            (
+                row
+                for matchId, leftId, rightId, lb, la, rb, ra, at in zip(
+                    matchIds.tolist(), leftIds.tolist(), rightIds.tolist(),
+                    result.leftBefore.tolist(), result.leftAfter.tolist(),
+                    result.rightBefore.tolist(), result.rightAfter.tolist(), finishedAt,
+                )
+                for row in ((leftId, matchId, lb, la, at), (rightId, matchId, rb, ra, at))
+            ),
+        )
+    return len(rows)
+
+
+def ratingLeaderboard(top: int = DEFAULT_RATING_TOP) -> list[RatingEntry]:
+    """
+    Die top besten Ratings über den (-rating, player)-Index.
+    """
+    rows = (
+        PlayerRating.objects.order_by("-rating", "player_id")
+        .values_list("player_id", "player__name", "rating", "matches_played")[:top]
+    )
+    return [
+        RatingEntry(rank, playerId, playerName, round(rating, 1), played)
+        for rank, (playerId, playerName, rating, played) in enumerate(rows, start=1)
+    ]
+
+
+def ratingRankedPlayerIds(playerIds) -> list[int]:
+    """
+    Spieler nach Rating, bester zuerst. Ohne Rating zählt INITIAL_RATING; Gleichstand:
+    mehr gewertete Matches zuerst, dann id.
+    """
+    stats = {
+        playerId: (rating, played)
+        for playerId, rating, played in PlayerRating.objects.filter(player_id__in=playerIds)
+        .values_list("player_id", "rating", "matches_played")
+    }
+
+    def key(playerId):
+        rating, played = stats.get(playerId, (INITIAL_RATING, 0))
+        return -rating, -played, playerId
+
+    return sorted(playerIds, key=key)
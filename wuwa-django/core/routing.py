@@ -1,6 +1,7 @@
 from django.urls import re_path
-from .consumers import MatchDraftConsumer
+from .consumers import MatchDraftConsumer, MatchSpectateConsumer
 
 websocket_urlpatterns = [
     re_path(r"ws/match/(?P<matchId>\d+)/draft/$", MatchDraftConsumer.as_asgi()),
+    re_path(r"ws/match/(?P<matchId>\d+)/spectate/$", MatchSpectateConsumer.as_asgi()),
 ]
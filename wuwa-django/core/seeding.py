@@ -0,0 +1,114 @@
+from typing import NamedTuple
+
+from django.db import connection
+
+from .models import BossTime, Player, Tournament
+from .ratings import ratingRankedPlayerIds
+
+
+class SeedEntry(NamedTuple):
+    playerId: int
+    score: float | None  # Ø normierte Bestzeit, 1.0 = schnellster im Feld auf jedem Boss; None = keine Daten
+    bossesCovered: int
+
+
+def nextPowerOfTwo(n: int) -> int:
+    return 1 << max(n - 1, 0).bit_length()
+
+
+def seedPositions(size: int) -> list[int]:
+    """
+    Standard-Setzliste für ein Bracket der Größe size (Zweierpotenz):
+    Seed an Position i, benachbarte Positionen spielen gegeneinander.
+    seedPositions(8) = [1, 8, 4, 5, 2, 7, 3, 6] -> 1 vs 8, 4 vs 5, 2 vs 7, 3 vs 6
+    """
+    if size < 1 or size & (size - 1):
+        raise ValueError(f"Bracket size must be a power of two, got {size}")
+
+    positions = [1]
+    while len(positions) < size:
+        total = len(positions) * 2 + 1
+        positions = [seed for s in positions for seed in (s, total - s)]
+    return positions
+
+
+def bracketSlots(seeded: list) -> list:
+    """
+    Verteilt Spieler in Seed-Reihenfolge auf die Positionen eines Brackets der nächsten
+    Zweierpotenz. Leere Positionen (None) sind Freilose und liegen immer neben den besten Seeds.
+    """
+    return [seeded[seed - 1] if seed <= len(seeded) else None for seed in seedPositions(nextPowerOfTwo(len(seeded)))]
+
+
+# Pro Boss wird die Bestzeit auf die schnellste Zeit im Turnierfeld normiert (1.0 = schnellster).
+# Fehlt einem Spieler ein Boss, zählt er dort wie der langsamste Spieler im Feld.
+# Bosse, für die im Feld niemand eine Zeit hat, unterscheiden niemanden und fallen heraus.
+_RANKING_SQL = """
+    WITH tp AS (
+        SELECT player_id FROM {through} WHERE tournament_id = %s
+    ),
+    times AS (
+        SELECT bt.player_id, bt.boss_id, bt.best_time_ms AS t
+        FROM {bosstime} bt JOIN tp ON tp.player_id = bt.player_id
+        WHERE bt.best_time_ms > 0 {bossFilter}
+    ),
+    b AS (
+        SELECT boss_id, MIN(t) AS fastest, 1.0 * MAX(t) / MIN(t) AS slowest
+        FROM times GROUP BY boss_id
+    )
+    SELECT tp.player_id,
+           AVG(COALESCE(1.0 * times.t / b.fastest, b.slowest)) AS score,
+           COUNT(times.t) AS covered
+    FROM tp
+    LEFT JOIN b ON 1 = 1
+    LEFT JOIN times ON times.player_id = tp.player_id AND times.boss_id = b.boss_id
+    GROUP BY tp.player_id
+    ORDER BY score IS NULL, score, covered DESC, tp.player_id
+"""
+
+
+def rankPlayers(tournament: Tournament, bossIds: list[int] | None = None) -> list[SeedEntry]:
+    """
+    Setzliste der Turnier-Spieler nach BossTime-Bestzeiten, bester zuerst – eine aggregierte Query.
+    bossIds schränkt auf die Bosse des Brackets ein (Standard: alle).
+    Gleichstand: mehr abgedeckte Bosse zuerst, dann id. Spieler ohne Zeiten ganz hinten.
+    """
+    quote = connection.ops.quote_name
+    params = [tournament.id]
+    bossFilter = ""
+    if bossIds is not None:
+        if not bossIds:
+            bossIds = [-1]
+        bossFilter = "AND bt.boss_id IN ({})".format(", ".join(["%s"] * len(bossIds)))
+        params += list(bossIds)
+
+    sql = _RANKING_SQL.format(
+        through=quote(Tournament.players.through._meta.db_table),
+        bosstime=quote(BossTime._meta.db_table),
+        bossFilter=bossFilter,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [SeedEntry(playerId, score, covered) for playerId, score, covered in cursor.fetchall()]
+
+
+def rankedPlayerIds(tournament: Tournament, bossIds: list[int] | None = None) -> list[int]:
+    return [entry.playerId for entry in rankPlayers(tournament, bossIds)]
+
+
+def seededPlayers(
+    tournament: Tournament,
+    bossIds: list[int] | None = None,
+    *,
+    byRating: bool = False,
+) -> list[Player]:
+    """
+    Spieler in Seed-Reihenfolge, direkt nutzbar als seededPlayers der Bracket-Generatoren.
+    byRating: nach Elo-Rating statt nach BossTime-Bestzeiten (bossIds wird dann ignoriert).
+    """
+    if byRating:
+        playerIds = ratingRankedPlayerIds(list(tournament.players.values_list("id", flat=True)))
+    else:
+        playerIds = rankedPlayerIds(tournament, bossIds)
+    players = Player.objects.in_bulk(playerIds)
+    return [players[playerId] for playerId in playerIds]
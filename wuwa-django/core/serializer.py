@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from core.models import Match, MatchDraftAction, Player, Boss, Resonator
+from core.models import BracketType, Match, MatchDraftAction, Player, Boss, Resonator
 
 
 class PlayerMiniSerializer(serializers.ModelSerializer):
@@ -85,3 +85,17 @@ class MatchDashboardSerializer(serializers.ModelSerializer):
     def get_rightPicks(self, obj): return self._by(obj, "PICK", "RIGHT")
     def get_leftBans(self, obj): return self._by(obj, "BAN", "LEFT")
     def get_rightBans(self, obj): return self._by(obj, "BAN", "RIGHT")
+
+
+class RoundFinalizeSerializer(serializers.Serializer):
+    """
+    Entweder bracket + roundIndex (ganze Runde) oder matchIds (Auswahl).
+    """
+    bracket = serializers.ChoiceField(choices=BracketType.choices, default=BracketType.WINNERS)
+    roundIndex = serializers.IntegerField(min_value=0, required=False)
+    matchIds = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if "roundIndex" not in attrs and "matchIds" not in attrs:
+            raise serializers.ValidationError("Either roundIndex or matchIds is required.")
+        return attrs
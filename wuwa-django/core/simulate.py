@@ -0,0 +1,301 @@
+"""
+Monte-Carlo-Simulation der restlichen K.-o.-Matches eines Turniers ("Chance auf den Turniersieg").
+
+Zeitmodell: pro (Spieler, Boss) eine Normalverteilung aus den bisherigen Match-Zeiten
+(Anzahl, Summe, Quadratsumme). Ohne Match-Zeiten dient die BossTime-Bestzeit (plus Aufschlag)
+als Mittelwert, ohne beides der Schnitt des Felds auf diesem Boss. Die Statistik wird pro
+Turnier gecacht, nach jedem Match-Ende verworfen und beim nächsten Abruf neu aggregiert.
+
+Simuliert wird vektorisiert: pro Match eine NumPy-Ziehung über alle Simulationen gleichzeitig.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections import deque
+
+import numpy as np
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .bracket import ELIMINATION_BRACKETS
+from .brackettree import bracketGeneration
+from .models import Boss, BossTime, BracketType, Match, MatchSide, Player, Tournament
+
+
+SIMULATION_CACHE_ALIAS = "default"
+SIMULATION_CACHE_TIMEOUT = 60 * 60
+# Modell nur begrenzt cachen: Matches anderer Turniere derselben Spieler (oder ein Leser, der
+# vor dem Commit geladen und nach dem Verwerfen gespeichert hat) veralten es höchstens so lange
+MODEL_CACHE_TIMEOUT = 10 * 60
+
+DEFAULT_SIMULATIONS = 100_000
+
+# Single-Flight: nur ein Request simuliert pro Generation, die anderen bekommen solange das
+# letzte Ergebnis (oder warten beim allerersten Aufruf kurz darauf)
+SIMULATION_LOCK_TIMEOUT = 60
+SIMULATION_WAIT_SECONDS = 5.0
+SIMULATION_POLL_SECONDS = 0.05
+
+# Streuung relativ zum Mittelwert, wenn zu wenige Match-Zeiten vorliegen
+DEFAULT_CV = 0.05
+MIN_CV = 0.01
+# Eine Bestzeit ist ein Best Case – typische Runs sind etwas langsamer
+PB_SLOWDOWN = 1.05
+# Ganz ohne Daten (weder Feld noch Spieler): alle gleich stark
+FALLBACK_MEAN_MS = 60_000.0
+
+
+def _modelKey(tournamentId: int) -> str:
+    return f"simulate:model:{tournamentId}"
+
+
+def _resultKey(tournamentId: int, generation: int, simulations: int) -> str:
+    return f"simulate:result:{tournamentId}:{generation}:{simulations}"
+
+
+def _latestKey(tournamentId: int, simulations: int) -> str:
+    # Letztes Ergebnis unabhängig von der Generation – wird ausgeliefert, während neu simuliert wird
+    return f"simulate:latest:{tournamentId}:{simulations}"
+
+
+def _lockKey(tournamentId: int, generation: int, simulations: int) -> str:
+    return f"simulate:lock:{tournamentId}:{generation}:{simulations}"
+
+
+def _loadTimeModel(playerIds: list[int]) -> dict:
+    """
+    Aggregierte Match-Zeiten pro (Spieler, Boss) – eine Query pro Seite – plus Bestzeiten.
+    """
+    stats: dict[tuple[int, int], list] = {}
+    for playerField, timeField in (("player_left_id", "left_time_ms"), ("player_right_id", "right_time_ms")):
+        rows = (
+            Match.objects.filter(**{f"{playerField}__in": playerIds, f"{timeField}__isnull": False}, boss__isnull=False)
+            .values(playerField, "boss_id")
+            .annotate(n=Count(timeField), total=Sum(timeField), totalSq=Sum(F(timeField) * F(timeField)))
+            .values_list(playerField, "boss_id", "n", "total", "totalSq")
+        )
+        for playerId, bossId, n, total, totalSq in rows:
+            entry = stats.setdefault((playerId, bossId), [0, 0, 0])
+            entry[0] += n
+            entry[1] += total
+            entry[2] += totalSq
+
+    bestTimes = dict(
+        ((playerId, bossId), best)
+        for playerId, bossId, best in BossTime.objects.filter(
+            player_id__in=playerIds, best_time_ms__isnull=False,
+        ).values_list("player_id", "boss_id", "best_time_ms")
+    )
+    return {"playerIds": set(playerIds), "stats": stats, "bestTimes": bestTimes}
+
+
+def getTimeModel(tournamentId: int, playerIds: list[int]) -> dict:
+    cache = caches[SIMULATION_CACHE_ALIAS]
+    model = cache.get(_modelKey(tournamentId))
+    if model is None or not model["playerIds"].issuperset(playerIds):
+        model = _loadTimeModel(playerIds)
+        cache.set(_modelKey(tournamentId), model, MODEL_CACHE_TIMEOUT)
+    return model
+
+
+def recordMatchTimes(matches: list[Match]) -> None:
+    """
+    Nach dem Commit das gecachte Zeitmodell der Turniere frisch beendeter Matches verwerfen;
+    der nächste Abruf aggregiert neu (eine Query pro Seite über die Match-Zeiten). Ein
+    Fortschreiben des gecachten Modells würde mit einem parallelen Neuaufbau doppelt zählen
+    oder Updates anderer Prozesse verlieren. Das Simulationsergebnis selbst hängt an der
+    Bracket-Generation und wird beim nächsten Abruf neu gerechnet.
+    """
+    tournamentIds = {m.tournament_id for m in matches if m.tournament_id is not None and m.boss_id is not None}
+    if tournamentIds:
+        transaction.on_commit(
+            lambda: caches[SIMULATION_CACHE_ALIAS].delete_many([_modelKey(t) for t in tournamentIds])
+        )
+
+
+def _distributions(model: dict, playerIds: list[int], bossIds: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Mittelwert- und Streuungs-Matrix [Spieler, Boss] aus dem Zeitmodell.
+    """
+    mu = np.full((len(playerIds), len(bossIds)), np.nan)
+    sigma = np.full_like(mu, np.nan)
+
+    for i, playerId in enumerate(playerIds):
+        for j, bossId in enumerate(bossIds):
+            n, total, totalSq = model["stats"].get((playerId, bossId), (0, 0, 0))
+            if n:
+                mean = total / n
+                std = np.sqrt(max(totalSq / n - mean * mean, 0.0)) if n > 1 else mean * DEFAULT_CV
+                mu[i, j], sigma[i, j] = mean, max(std, mean * MIN_CV)
+                continue
+            best = model["bestTimes"].get((playerId, bossId))
+            if best:
+                mu[i, j] = best * PB_SLOWDOWN
+                sigma[i, j] = mu[i, j] * DEFAULT_CV
+
+    # Lücken mit dem Feld-Schnitt des Bosses füllen (bzw. global), mit doppelter Unsicherheit
+    overall = np.nanmean(mu) if np.isfinite(mu).any() else FALLBACK_MEAN_MS
+    for j in range(len(bossIds)):
+        column = mu[:, j]
+        fieldMean = np.nanmean(column) if np.isfinite(column).any() else overall
+        missing = np.isnan(column)
+        mu[missing, j] = fieldMean
+        sigma[missing, j] = fieldMean * DEFAULT_CV * 2
+    return mu, sigma
+
+
+def _topologicalOrder(matches: list[dict]) -> list[dict]:
+    # Zubringer vor Ziel-Matches (Sieger- und Verliererkanten)
+    byId = {m["id"]: m for m in matches}
+    incoming = {m["id"]: 0 for m in matches}
+    for m in matches:
+        for target in (m["next_match_id"], m["loser_next_match_id"]):
+            if target in byId:
+                incoming[target] += 1
+
+    queue = deque(m for m in matches if incoming[m["id"]] == 0)
+    order = []
+    while queue:
+        m = queue.popleft()
+        order.append(m)
+        for target in (m["next_match_id"], m["loser_next_match_id"]):
+            if target in byId:
+                incoming[target] -= 1
+                if incoming[target] == 0:
+                    queue.append(byId[target])
+    return order
+
+
+def simulateBracket(tournamentId: int, simulations: int = DEFAULT_SIMULATIONS, seed: int | None = None) -> dict:
+    """
+    Simuliert die offenen K.-o.-Matches (W/L/GF) simulations-mal. Beendete Matches stehen fest.
+    Ergebnis: Turniersieg-Wahrscheinlichkeit pro Spieler und Sieg-Wahrscheinlichkeit pro
+    Spieler für jedes offene Match.
+    """
+    matches = list(
+        Match.objects.filter(tournament_id=tournamentId, bracket__in=ELIMINATION_BRACKETS)
+        .order_by("id")
+        .values(
+            "id", "bracket", "round_index", "player_left_id", "player_right_id", "boss_id",
+            "winner_player_id", "finished_at", "next_match_id", "next_side", "loser_next_match_id", "loser_next_side",
+        )
+    )
+    playerIds = sorted(
+        set(Tournament.players.through.objects.filter(tournament_id=tournamentId).values_list("player_id", flat=True))
+        | {m[side] for m in matches for side in ("player_left_id", "player_right_id") if m[side] is not None}
+    )
+    result = {"tournamentId": tournamentId, "simulations": simulations, "players": [], "matches": {}}
+    if not matches or not playerIds:
+        return result
+
+    bossIds = list(Boss.objects.order_by("id").values_list("id", flat=True)) or [None]
+    mu, sigma = _distributions(getTimeModel(tournamentId, playerIds), playerIds, bossIds)
+    playerIndex = {playerId: i for i, playerId in enumerate(playerIds)}
+    bossIndex = {bossId: j for j, bossId in enumerate(bossIds)}
+
+    def constant(playerId):
+        return np.full(simulations, playerIndex.get(playerId, -1) if playerId is not None else -1, dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    incoming: dict[tuple[int, str], np.ndarray] = {}
+    # GF-Reset entfällt in den Simulationen, in denen der Winners-Champion (LEFT) das erste Grand Final gewinnt
+    resetSkips: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+    champion = None
+
+    for m in _topologicalOrder(matches):
+        left = incoming.pop((m["id"], MatchSide.LEFT), None)
+        right = incoming.pop((m["id"], MatchSide.RIGHT), None)
+        left = constant(m["player_left_id"]) if left is None else left
+        right = constant(m["player_right_id"]) if right is None else right
+
+        if m["finished_at"] is not None:
+            winner = constant(m["winner_player_id"])
+        else:
+            if m["boss_id"] in bossIndex:
+                boss = np.full(simulations, bossIndex[m["boss_id"]])
+            else:
+                boss = rng.integers(len(bossIds), size=simulations)
+            safeLeft, safeRight = np.maximum(left, 0), np.maximum(right, 0)
+            leftTime = mu[safeLeft, boss] + sigma[safeLeft, boss] * rng.standard_normal(simulations)
+            rightTime = mu[safeRight, boss] + sigma[safeRight, boss] * rng.standard_normal(simulations)
+            winner = np.where(leftTime < rightTime, left, right)
+            # Fehlt eine Seite (Freilos), kommt die andere weiter
+            winner = np.where(left < 0, right, np.where(right < 0, left, winner))
+
+            if m["id"] in resetSkips:
+                previousWinner, skip = resetSkips.pop(m["id"])
+                winner = np.where(skip, previousWinner, winner)
+
+            counts = np.bincount(winner[winner >= 0], minlength=len(playerIds))
+            result["matches"][m["id"]] = {
+                playerIds[i]: round(float(counts[i]) / simulations, 4) for i in np.flatnonzero(counts)
+            }
+
+        loser = np.where(winner == left, right, left)
+
+        if m["bracket"] == BracketType.GRAND_FINAL and m["round_index"] == 0 and m["next_match_id"] is not None:
+            resetSkips[m["next_match_id"]] = (winner, winner == left)
+        if m["next_match_id"] is not None:
+            incoming[(m["next_match_id"], m["next_side"])] = winner
+        if m["loser_next_match_id"] is not None:
+            incoming[(m["loser_next_match_id"], m["loser_next_side"])] = loser
+        if m["next_match_id"] is None:
+            champion = winner
+
+    counts = np.bincount(champion[champion >= 0], minlength=len(playerIds))
+    names = dict(Player.objects.filter(id__in=playerIds).values_list("id", "name"))
+    result["players"] = sorted(
+        (
+            {"id": playerId, "name": names.get(playerId), "winProbability": round(float(counts[i]) / simulations, 4)}
+            for i, playerId in enumerate(playerIds)
+        ),
+        key=lambda p: (-p["winProbability"], p["id"]),
+    )
+    return result
+
+
+def getWinProbabilitiesJson(tournamentId: int, simulations: int = DEFAULT_SIMULATIONS) -> str:
+    """
+    Simulationsergebnis als JSON-Text, gecacht pro Turnier und Bracket-Generation:
+    jedes Match-Ende/jede Neugenerierung macht den alten Eintrag ungültig.
+    Nach einer neuen Generation simuliert genau ein Request (Lock per cache.add); parallele
+    Requests bekommen bis dahin das vorige Ergebnis statt selbst zu rechnen.
+    Wirft Tournament.DoesNotExist für unbekannte Turniere.
+    """
+    cache = caches[SIMULATION_CACHE_ALIAS]
+    generation = bracketGeneration(tournamentId)
+    key = _resultKey(tournamentId, generation, simulations)
+    text = cache.get(key)
+    if text is not None:
+        return text
+
+    if not Tournament.objects.filter(id=tournamentId).exists():
+        raise Tournament.DoesNotExist(f"Tournament {tournamentId} does not exist.")
+
+    lockKey = _lockKey(tournamentId, generation, simulations)
+    ownsLock = cache.add(lockKey, 1, SIMULATION_LOCK_TIMEOUT)
+    if not ownsLock:
+        # Jemand simuliert schon: veraltetes Ergebnis ausliefern oder kurz auf das neue warten
+        stale = cache.get(_latestKey(tournamentId, simulations))
+        if stale is not None:
+            return stale
+        deadline = time.monotonic() + SIMULATION_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(SIMULATION_POLL_SECONDS)
+            text = cache.get(key)
+            if text is not None:
+                return text
+        # Lock-Inhaber hängt oder ist abgestürzt: selbst rechnen
+
+    try:
+        text = json.dumps(simulateBracket(tournamentId, simulations), separators=(",", ":"))
+        cache.set_many(
+            {key: text, _latestKey(tournamentId, simulations): text}, SIMULATION_CACHE_TIMEOUT
+        )
+    finally:
+        if ownsLock:
+            cache.delete(lockKey)
+    return text
@@ -0,0 +1,291 @@
+import random
+from collections import deque
+from typing import NamedTuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .brackettree import invalidateBracketTree
+from .models import Boss, BracketType, Match, MatchSide, Tournament
+from .seeding import rankedPlayerIds
+
+
+class SwissStanding(NamedTuple):
+    playerId: int
+    score: int
+    buchholz: int
+    seed: int  # Setzlisten-Platz nach BossTime (1 = bester)
+    hadBye: bool
+
+
+class _SwissHistory(NamedTuple):
+    scores: dict[int, int]
+    opponents: dict[int, set[int]]
+    byes: set[int]
+    nextRound: int
+    openMatches: int
+
+
+def _loadHistory(tournament: Tournament, playerIds: list[int]) -> _SwissHistory:
+    # Alle bisherigen Swiss-Matches mit einer Query, der Rest in Python
+    scores = {playerId: 0 for playerId in playerIds}
+    opponents = {playerId: set() for playerId in playerIds}
+    byes = set()
+    nextRound = 0
+    openMatches = 0
+
+    rows = Match.objects.filter(tournament=tournament, bracket=BracketType.SWISS).values_list(
+        "round_index", "player_left_id", "player_right_id", "winner_player_id", "finished_at",
+    )
+    for roundIndex, leftId, rightId, winnerId, finishedAt in rows:
+        nextRound = max(nextRound, roundIndex + 1)
+        if finishedAt is None:
+            openMatches += 1
+        if rightId is None:
+            byes.add(leftId)
+        else:
+            opponents.setdefault(leftId, set()).add(rightId)
+            opponents.setdefault(rightId, set()).add(leftId)
+        if winnerId is not None:
+            scores[winnerId] = scores.get(winnerId, 0) + 1
+
+    return _SwissHistory(scores, opponents, byes, nextRound, openMatches)
+
+
+def _seeds(tournament: Tournament) -> dict[int, int]:
+    return {playerId: i + 1 for i, playerId in enumerate(rankedPlayerIds(tournament))}
+
+
+def _standings(playerIds: list[int], history: _SwissHistory, seeds: dict[int, int]) -> list[SwissStanding]:
+    standings = [
+        SwissStanding(
+            playerId=playerId,
+            score=history.scores.get(playerId, 0),
+            buchholz=sum(history.scores.get(o, 0) for o in history.opponents.get(playerId, ())),
+            seed=seeds.get(playerId, len(seeds) + 1),
+            hadBye=playerId in history.byes,
+        )
+        for playerId in playerIds
+    ]
+    # Punkte, dann Buchholz, dann Setzliste (BossTime)
+    standings.sort(key=lambda s: (-s.score, -s.buchholz, s.seed, s.playerId))
+    return standings
+
+
+def swissStandings(tournament: Tournament) -> list[SwissStanding]:
+    """
+    Swiss-Tabelle: Siege (Freilos zählt als Sieg), Buchholz, Setzliste nach BossTime-Bestzeiten.
+    """
+    playerIds = list(tournament.players.values_list("id", flat=True))
+    return _standings(playerIds, _loadHistory(tournament, playerIds), _seeds(tournament))
+
+
+def _scoreGroups(standings: list[SwissStanding]) -> list[list[int]]:
+    # Punktgruppen in Tabellenreihenfolge, beste Gruppe zuerst
+    groups: list[list[int]] = []
+    for i, standing in enumerate(standings):
+        if i == 0 or standing.score != standings[i - 1].score:
+            groups.append([])
+        groups[-1].append(standing.playerId)
+    return groups
+
+
+def _around(center: int, n: int):
+    # Positionen nach Abstand zu center: center, center+1, center-1, center+2, ...
+    yield center
+    for d in range(1, n):
+        if center + d < n:
+            yield center + d
+        if center - d >= 0:
+            yield center - d
+
+
+def _augment(root: int, match: list[int], allowed) -> bool:
+    """
+    Edmonds-Blossom: sucht per BFS einen augmentierenden Pfad ab dem freien Knoten root
+    (ungerade Kreise werden zu ihrer Basis kontrahiert) und vergrößert damit das Matching.
+    """
+    n = len(match)
+    parent = [-1] * n
+    base = list(range(n))
+    used = [False] * n
+    used[root] = True
+    queue = deque([root])
+
+    def lca(a: int, b: int) -> int:
+        seen = [False] * n
+        while True:
+            a = base[a]
+            seen[a] = True
+            if match[a] == -1:
+                break
+            a = parent[match[a]]
+        while True:
+            b = base[b]
+            if seen[b]:
+                return b
+            b = parent[match[b]]
+
+    def markPath(v: int, b: int, child: int, blossom: list[bool]) -> None:
+        while base[v] != b:
+            blossom[base[v]] = blossom[base[match[v]]] = True
+            parent[v] = child
+            child = match[v]
+            v = parent[match[v]]
+
+    while queue:
+        v = queue.popleft()
+        for u in range(n):
+            if base[v] == base[u] or match[v] == u or not allowed(v, u):
+                continue
+            if u == root or (match[u] != -1 and parent[match[u]] != -1):
+                current = lca(v, u)
+                blossom = [False] * n
+                markPath(v, current, u, blossom)
+                markPath(u, current, v, blossom)
+                for i in range(n):
+                    if blossom[base[i]]:
+                        base[i] = current
+                        if not used[i]:
+                            used[i] = True
+                            queue.append(i)
+            elif parent[u] == -1:
+                parent[u] = v
+                if match[u] == -1:
+                    while u != -1:
+                        previous = match[parent[u]]
+                        match[u], match[parent[u]] = parent[u], u
+                        u = previous
+                    return True
+                used[match[u]] = True
+                queue.append(match[u])
+    return False
+
+
+def _maxMatching(players: list[int], opponents: dict[int, set[int]]) -> list[int]:
+    """
+    Maximales Matching ohne Rematches über players (in Tabellenreihenfolge); match[i] = Partner-Index
+    oder -1. Start ist die Dutch-Wunschpaarung (obere gegen untere Hälfte, 1 vs n/2+1, ...),
+    gierig mit dem nächstgelegenen freien Gegner; nur was dabei frei bleibt, wird per Blossom
+    nachgebessert. Wer danach frei ist, kann in dieser Menge nicht gepaart werden.
+    """
+    n = len(players)
+    blocked = [opponents.get(p, ()) for p in players]
+
+    def allowed(v: int, u: int) -> bool:
+        return u != v and players[u] not in blocked[v] and players[v] not in blocked[u]
+
+    match = [-1] * n
+    half = n // 2
+    for i in range(n):
+        if match[i] != -1:
+            continue
+        for j in _around(i + half if i < half else i - half, n):
+            if match[j] == -1 and allowed(i, j):
+                match[i], match[j] = j, i
+                break
+
+    for root in range(n):
+        if match[root] == -1:
+            _augment(root, match, allowed)
+    return match
+
+
+def _pairGroups(groups: list[list[int]], opponents: dict[int, set[int]]) -> tuple[list[tuple[int, int]], list[int]]:
+    # Gruppe für Gruppe; Ungepaarte floaten an den Anfang der nächsten Gruppe
+    pairs = []
+    floaters: list[int] = []
+    for group in groups:
+        players = floaters + group
+        match = _maxMatching(players, opponents)
+        pairs += [(players[i], players[j]) for i, j in enumerate(match) if j > i]
+        floaters = [players[i] for i, j in enumerate(match) if j == -1]
+    return pairs, floaters
+
+
+def pairSwissRound(groups: list[list[int]], opponents: dict[int, set[int]]) -> list[tuple[int, int]] | None:
+    """
+    Paart Punktgruppen (beste zuerst, Spieler in Tabellenreihenfolge) ohne Rematches.
+    Pro Gruppe ein maximales Matching (Dutch-Wunschpaarung, Lücken per Edmonds-Blossom),
+    Ungepaarte floaten in die nächste Gruppe. Bleiben am Ende Spieler übrig, werden die
+    untersten Gruppen schrittweise zusammengelegt, bis das Matching aufgeht – zuletzt das
+    ganze Feld. None nur, wenn selbst dort kein perfektes Matching existiert, also wirklich
+    keine Runde ohne Rematch möglich ist.
+    """
+    groups = [list(g) for g in groups if g]
+    if sum(len(g) for g in groups) % 2:
+        raise ValueError("Need an even number of players to pair.")
+
+    for keep in range(len(groups), 0, -1):
+        tail = [p for g in groups[keep - 1:] for p in g]
+        pairs, floaters = _pairGroups(groups[:keep - 1] + [tail], opponents)
+        if not floaters:
+            return pairs
+    return None
+
+
+@transaction.atomic
+def generateSwissRound(tournament: Tournament, *, shuffleSeed: int | None = None) -> list[Match]:
+    """
+    Erzeugt die nächste Swiss-Runde für alle Turnier-Spieler.
+    - Paarung innerhalb der Punktgruppen (Dutch + Blossom-Matching), Floater nach unten, keine Rematches
+    - ungerade Anzahl: Freilos (als gewonnenes, beendetes Match ohne Gegner) an den
+      schlechtesten Spieler ohne bisheriges Freilos
+    - Tiebreak: Buchholz, danach Setzliste nach BossTime (seeding.rankPlayers)
+    Die vorherige Runde muss komplett beendet sein. Alle Matches der Runde per bulk_create.
+    """
+    playerIds = list(tournament.players.order_by("id").values_list("id", flat=True))
+    if len(playerIds) < 2:
+        raise ValueError(f"Need at least 2 players, got {len(playerIds)}")
+
+    bosses = list(Boss.objects.all())
+    if not bosses:
+        raise ValueError("No Bosses found. Please create at least 1 Boss before generating matches.")
+
+    history = _loadHistory(tournament, playerIds)
+    if history.openMatches:
+        raise ValueError(f"Swiss round {history.nextRound} still has {history.openMatches} unfinished matches.")
+
+    standings = _standings(playerIds, history, _seeds(tournament))
+
+    byePlayerId = None
+    if len(standings) % 2:
+        candidates = [s for s in reversed(standings) if not s.hadBye] or list(reversed(standings))
+        byePlayerId = candidates[0].playerId
+        standings = [s for s in standings if s.playerId != byePlayerId]
+
+    pairs = pairSwissRound(_scoreGroups(standings), history.opponents)
+    if pairs is None:
+        raise ValueError("No pairing without rematches possible for this round.")
+
+    rng = random.Random(shuffleSeed)
+    roundIndex = history.nextRound
+    matches = [
+        Match(
+            tournament=tournament,
+            bracket=BracketType.SWISS,
+            round_index=roundIndex,
+            match_index=i + 1,
+            player_left_id=leftId,
+            player_right_id=rightId,
+            boss=rng.choice(bosses),
+            first_pick_side=MatchSide.LEFT,
+        )
+        for i, (leftId, rightId) in enumerate(pairs)
+    ]
+    if byePlayerId is not None:
+        now = timezone.now()
+        matches.append(Match(
+            tournament=tournament,
+            bracket=BracketType.SWISS,
+            round_index=roundIndex,
+            match_index=len(matches) + 1,
+            player_left_id=byePlayerId,
+            winner_player_id=byePlayerId,
+            first_pick_side=MatchSide.LEFT,
+            started_at=now,
+            finished_at=now,
+        ))
+
+    invalidateBracketTree(tournament.id)
+    return Match.objects.bulk_create(matches)
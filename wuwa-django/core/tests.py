@@ -1,3 +1,1465 @@
-from django.test import TestCase
+import base64
+import json
+import random
+import time
+from collections import Counter
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.template.loader import render_to_string
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from config.asgi import application
+
+from .bracket import generateDoubleElim, generateSingleElim
+from .brackettree import bracketGeneration, getBracketTreeJson, invalidateBracketTree
+from .catalog import getResonatorCatalog, invalidateResonatorCatalog
+from .draft import CSRF_TOKEN_PLACEHOLDER, DraftConflict, buildDraftContext
+from .consumers import loadConnectPayload
+from .draftcache import (
+    claimDraftVersion,
+    draftCacheStats,
+    getDraftHtml,
+    getDraftSnapshot,
+    getSpectatorJson,
+    resetDraftCacheStats,
+)
+from .draftformat import compileDraftFormat
+from .finalize import SKIP_MISSING_TIMES, SKIP_NOT_FOUND, SKIP_TIE, finalizeMatches
+from .forms import BanConfirmForm
+from .groups import circleRounds, generateRoundRobinGroups, groupStandings, snakeGroups
+from .leaderboard import (
+    MATERIALIZED_TOP_K,
+    MAX_TOP_K,
+    checkBossLeaderboards,
+    computeLeaderboardRows,
+    encodeCursor,
+    leaderboardPage,
+    leaderboardRows,
+    rebuildBossLeaderboards,
+    recordPersonalBest,
+)
+from .draftservice import confirmDraftChoice
+from .routing import websocket_urlpatterns
+from .rankindex import getRankIndexes, invalidateRankIndexes, playerRanks, recordRankChange
+from .ratings import INITIAL_RATING, expectedScore, kFactor, recomputeRatings, recordMatchRatings, replayRatings
+from .seeding import bracketSlots, rankPlayers, seedPositions, seededPlayers
+from .simulate import getTimeModel, getWinProbabilitiesJson, recordMatchTimes, simulateBracket
+from .timestats import BIN_MS, bossTimeStats, playerTimeStats, recordTimeSubmissions
+from .swiss import generateSwissRound, pairSwissRound, swissStandings
+from .ws import broadcastDraftUpdate, broadcastPageRefresh, flushBroadcasts
+from .models import (
+    Boss,
+    BossTime,
+    BracketType,
+    DraftActionType,
+    Match,
+    MatchDraftAction,
+    MatchSide,
+    Player,
+    PlayerRating,
+    RatingHistory,
+    Resonator,
+    TimeSubmission,
+    Tournament,
+    User,
+    UserRole,
+)
+
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+# Broadcasts im Test nicht aus dem Hintergrund-Thread, sondern explizit per flushBroadcasts()
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_DISPATCH_THREAD=False)
+class DraftTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.playerLeft = Player.objects.create(name="Left")
+        cls.playerRight = Player.objects.create(name="Right")
+        cls.userLeft = User.objects.create_user("left", password="pw", role=UserRole.PLAYER, player=cls.playerLeft)
+        cls.userRight = User.objects.create_user("right", password="pw", role=UserRole.PLAYER, player=cls.playerRight)
+        cls.host = User.objects.create_user("host", password="pw", role=UserRole.ADMIN)
+        cls.resonators = [
+            Resonator.objects.create(slug=f"res-{i}", name=f"Resonator {i}", icon_url=f"https://example.com/{i}.png")
+            for i in range(10)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        resetDraftCacheStats()
+        invalidateResonatorCatalog()
+        flushBroadcasts()
+        self.match = Match.objects.create(
+            player_left=self.playerLeft,
+            player_right=self.playerRight,
+            first_pick_side=MatchSide.LEFT,
+        )
+
+    def _post(self, user, urlName, data):
+        self.client.force_login(user)
+        return self.client.post(reverse(urlName, args=[self.match.id]), data)
+
+    def _ban(self, user, resonator):
+        return self._post(user, "matchConfirmBans", {"ban": resonator.id})
+
+    def _pick(self, user, resonator):
+        return self._post(user, "matchConfirmPicks", {"pick": resonator.id})
+
+    def _render(self, user, match):
+        request = RequestFactory().get("/")
+        request.user = user
+        context = buildDraftContext(match, user)
+        return render_to_string("core/partials/match_draft.html", context, request=request)
+
+
+class DraftStateTests(DraftTestCase):
+    def test_ban_slot_locks_when_both_sides_confirmed(self):
+        self._ban(self.userLeft, self.resonators[0])
+        self.assertFalse(MatchDraftAction.objects.get(match=self.match).is_locked)
+
+        self._ban(self.userRight, self.resonators[1])
+        bans = MatchDraftAction.objects.filter(match=self.match, action_type=DraftActionType.BAN)
+        self.assertEqual(bans.count(), 2)
+        self.assertTrue(all(a.is_locked for a in bans))
+
+    def test_full_draft_confirms_both_phases(self):
+        for i in range(3):
+            self._ban(self.userLeft, self.resonators[i])
+            self._ban(self.userRight, self.resonators[i])
+        self.match.refresh_from_db()
+        self.assertTrue(self.match.left_bans_confirmed and self.match.right_bans_confirmed)
+
+        # gegen LEFT gebannt: 0..2 -> LEFT darf 3.. picken
+        self._pick(self.userLeft, self.resonators[0])
+        self.assertFalse(MatchDraftAction.objects.filter(match=self.match, action_type=DraftActionType.PICK).exists())
+
+        for i in range(3, 6):
+            self._pick(self.userLeft, self.resonators[i])
+            self._pick(self.userRight, self.resonators[i])
+        self.match.refresh_from_db()
+        self.assertTrue(self.match.left_picks_confirmed and self.match.right_picks_confirmed)
+
+    def test_render_query_count_is_constant(self):
+        for i in range(2):
+            self._ban(self.userLeft, self.resonators[i])
+            self._ban(self.userRight, self.resonators[i])
+        self._ban(self.userLeft, self.resonators[5])
+
+        match = Match.objects.get(id=self.match.id)
+        getResonatorCatalog()
+
+        # Host und Spieler: nur der Draft-Snapshot, Verfügbarkeit kommt aus dem Katalog
+        with self.assertNumQueries(1):
+            self._render(self.host, match)
+
+        with self.assertNumQueries(1):
+            html = self._render(self.userLeft, match)
+        self.assertIn(f'<option value="{self.resonators[5].id}">', html)
+        self.assertNotIn(f'<option value="{self.resonators[0].id}">', html)
+
+
+class DraftCacheTests(DraftTestCase):
+    def test_unchanged_version_is_served_from_cache(self):
+        getDraftSnapshot(self.match.id)
+        with self.assertNumQueries(0):
+            snapshot = getDraftSnapshot(self.match.id)
+        self.assertEqual(snapshot.version, 0)
+        self.assertEqual(draftCacheStats()["hits"], 1)
+
+    def test_draft_write_bumps_version_and_refreshes_cache(self):
+        getDraftSnapshot(self.match.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._ban(self.userLeft, self.resonators[0])
+
+        with self.assertNumQueries(0):
+            snapshot = getDraftSnapshot(self.match.id)
+        self.assertEqual(snapshot.version, 1)
+        self.assertEqual(len(snapshot.state.actions), 1)
+
+    def test_connect_payload_is_served_from_cache(self):
+        getDraftHtml(self.match.id, "LEFT")
+        user = User.objects.get(id=self.userLeft.id)
+        with self.assertNumQueries(0):
+            role, payload = loadConnectPayload(self.match.id, user)
+        self.assertEqual(role, "LEFT")
+        self.assertEqual(payload["version"], 0)
+
+        outsider = User.objects.create_user("outsider", password="pw", role=UserRole.PLAYER)
+        self.assertIsNone(loadConnectPayload(self.match.id, outsider))
+
+    def test_spectator_json_hides_pending_and_is_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._ban(self.userLeft, self.resonators[0])
+
+        text = getSpectatorJson(self.match.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(getSpectatorJson(self.match.id, load=False), text)
+        data = json.loads(text)
+        self.assertEqual(data["version"], 1)
+        self.assertEqual(data["left"]["bans"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._ban(self.userRight, self.resonators[1])
+        data = json.loads(getSpectatorJson(self.match.id))
+        self.assertEqual(data["left"]["bans"][0]["slug"], "res-0")
+        self.assertEqual(data["right"]["player"], "Right")
+
+    def test_plain_save_keeps_draft_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._ban(self.userLeft, self.resonators[0])
+        stale = Match.objects.get(id=self.match.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._ban(self.userRight, self.resonators[1])
+
+        stale.left_time_ms = 1000
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual(stale.draft_version, 2)
+
+    def test_admin_edits_invalidate_cached_draft(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._ban(self.userLeft, self.resonators[0])
+        self.assertEqual(len(getDraftSnapshot(self.match.id).state.actions), 1)
+
+        request = RequestFactory().post("/admin/")
+        request.user = self.host
+        actionAdmin = admin.site._registry[MatchDraftAction]
+        with self.captureOnCommitCallbacks(execute=True):
+            actionAdmin.delete_model(request, MatchDraftAction.objects.get(match=self.match))
+
+        snapshot = getDraftSnapshot(self.match.id)
+        self.assertEqual(snapshot.version, 2)
+        self.assertEqual(snapshot.state.actions, [])
+
+    def test_saves_and_deletes_outside_the_draft_invalidate_cached_draft(self):
+        tournament = Tournament.objects.create(name="Cup")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.tournament = tournament
+            self.match.save()
+        self.assertEqual(getDraftSnapshot(self.match.id).match.tournament_id, tournament.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tournament.draft_format = [{"action": "PICK", "sides": "BOTH"}]
+            tournament.save()
+        self.assertEqual(getDraftSnapshot(self.match.id).match.tournament.draft_format, tournament.draft_format)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Match.objects.filter(id=self.match.id).delete()
+        with self.assertRaises(Match.DoesNotExist):
+            getDraftSnapshot(self.match.id)
+
+
+class DraftConcurrencyTests(DraftTestCase):
+    def test_stale_snapshot_is_retried_against_fresh_state(self):
+        getDraftSnapshot(self.match.id)
+        # Parallele Änderung an der Version vorbei am Cache
+        Match.objects.filter(id=self.match.id).update(draft_version=5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._ban(self.userLeft, self.resonators[0])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(getDraftSnapshot(self.match.id).version, 6)
+        self.assertEqual(MatchDraftAction.objects.filter(match=self.match).count(), 1)
+
+    def test_stale_version_raises_conflict(self):
+        with self.assertRaises(DraftConflict):
+            claimDraftVersion(self.match, 3)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.draft_version, 0)
+
+    def test_persistent_conflict_returns_retryable_response(self):
+        with patch("core.draftservice.claimDraftVersion", side_effect=DraftConflict("Draft changed, please retry.")):
+            response = self._ban(self.userLeft, self.resonators[0])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "0")
+        self.assertFalse(MatchDraftAction.objects.filter(match=self.match).exists())
+
+
+class DraftBroadcastTests(DraftTestCase):
+    def test_draft_update_sends_only_the_version_and_prerenders_roles(self):
+        channelLayer = get_channel_layer()
+        channelName = async_to_sync(channelLayer.new_channel)()
+        async_to_sync(channelLayer.group_add)(f"matchDraft_{self.match.id}", channelName)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._ban(self.userLeft, self.resonators[0])
+        flushBroadcasts()
+
+        # Kein HTML über den Channel-Layer: verdeckte Picks bleiben auf dem Server
+        message = async_to_sync(channelLayer.receive)(channelName)
+        self.assertEqual(message, {"type": "draft_refresh", "version": 1})
+
+        with self.assertNumQueries(0):
+            html = {role: getDraftHtml(self.match.id, role)[0] for role in ("HOST", "LEFT", "RIGHT")}
+        self.assertIn("(pending)", html["HOST"])
+        self.assertIn("You selected (pending)", html["LEFT"])
+        self.assertNotIn("(pending)", html["RIGHT"])
+        self.assertIn(CSRF_TOKEN_PLACEHOLDER, html["RIGHT"])
+
+    def test_events_per_match_collapse_to_strongest(self):
+        channelLayer = get_channel_layer()
+        channelName = async_to_sync(channelLayer.new_channel)()
+        async_to_sync(channelLayer.group_add)(f"matchDraft_{self.match.id}", channelName)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                broadcastDraftUpdate(self.match.id)
+                broadcastPageRefresh(self.match.id)
+                broadcastDraftUpdate(self.match.id)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                broadcastPageRefresh(self.match.id)
+                transaction.set_rollback(True)
+        self.assertEqual(callbacks, [])
+
+        flushBroadcasts()
+        message = async_to_sync(channelLayer.receive)(channelName)
+        self.assertEqual(message, {"type": "page_refresh"})
+        self.assertNotIn(channelName, channelLayer.channels)  # keine zweite Nachricht
+
+
+class DraftRenderCacheTests(DraftTestCase):
+    def test_role_variant_is_rendered_once_per_version(self):
+        self.client.force_login(self.userLeft)
+        url = reverse("matchDraftPartial", args=[self.match.id])
+        first = self.client.get(url)
+        second = self.client.get(url)
+
+        stats = draftCacheStats()
+        self.assertEqual(stats["renderMisses"], 1)
+        self.assertEqual(stats["renderHits"], 1)
+        self.assertEqual(first["X-Draft-Version"], "0")
+        self.assertNotIn(CSRF_TOKEN_PLACEHOLDER, second.content.decode())
+        self.assertIn("csrfmiddlewaretoken", second.content.decode())
+
+    def test_spectating_user_is_forbidden(self):
+        outsider = User.objects.create_user("outsider", password="pw", role=UserRole.PLAYER)
+        self.client.force_login(outsider)
+        response = self.client.get(reverse("matchDraftPartial", args=[self.match.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class ResonatorCatalogTests(DraftTestCase):
+    def test_masks_and_invalidation(self):
+        catalog = getResonatorCatalog()
+        mask = catalog.allMask & ~catalog.maskOf([self.resonators[1].id, self.resonators[3].id])
+        self.assertEqual(mask.bit_count(), 8)
+        self.assertFalse(catalog.contains(mask, self.resonators[1].id))
+        self.assertEqual(catalog.resonatorsIn(catalog.maskOf([self.resonators[2].id])), [self.resonators[2]])
+
+        self.resonators[0].is_enabled = False
+        self.resonators[0].save()
+        self.assertIsNone(getResonatorCatalog().get(self.resonators[0].id))
+
+    def test_form_rejects_unavailable_resonator_without_query(self):
+        catalog = getResonatorCatalog()
+        mask = catalog.maskOf([self.resonators[2].id])
+        with self.assertNumQueries(0):
+            valid = BanConfirmForm({"ban": self.resonators[2].id}, catalog=catalog, availableMask=mask)
+            invalid = BanConfirmForm({"ban": self.resonators[3].id}, catalog=catalog, availableMask=mask)
+            self.assertTrue(valid.is_valid())
+            self.assertFalse(invalid.is_valid())
+        self.assertEqual(valid.cleaned_data["ban"], self.resonators[2])
+
+
+class DraftFormatTests(DraftTestCase):
+    SNAKE_FORMAT = [
+        {"action": "BAN", "sides": "BOTH", "count": 1},
+        {"action": "PICK", "sides": "FIRST"},
+        {"action": "PICK", "sides": "SECOND", "count": 2},
+        {"action": "PICK", "sides": "FIRST"},
+    ]
+
+    def test_default_format_table(self):
+        draftFormat = compileDraftFormat(None)
+        self.assertEqual(len(draftFormat.turns), 6)
+        self.assertEqual(draftFormat.slotCount("BAN", "FIRST"), 3)
+        self.assertEqual(draftFormat.lastTurnNumber("BAN"), 3)
+        self.assertIs(compileDraftFormat(None), draftFormat)
+
+    def test_invalid_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            compileDraftFormat([{"action": "BAN", "sides": "THIRD"}])
+        with self.assertRaises(ValueError):
+            compileDraftFormat([])
+
+    def test_snake_picks_follow_tournament_format(self):
+        tournament = Tournament.objects.create(name="Snake", draft_format=self.SNAKE_FORMAT)
+        self.match.tournament = tournament
+        self.match.first_pick_side = MatchSide.RIGHT
+        self.match.save()
+
+        self._ban(self.userLeft, self.resonators[0])
+        self._ban(self.userRight, self.resonators[1])
+
+        # RIGHT hat First Pick, LEFT ist noch nicht am Zug
+        self._pick(self.userLeft, self.resonators[2])
+        self.assertFalse(MatchDraftAction.objects.filter(match=self.match, action_type="PICK").exists())
+
+        self._pick(self.userRight, self.resonators[2])
+        self._pick(self.userLeft, self.resonators[3])
+        self._pick(self.userLeft, self.resonators[4])
+        self.match.refresh_from_db()
+        self.assertFalse(self.match.left_picks_confirmed)
+
+        self._pick(self.userRight, self.resonators[5])
+        self.match.refresh_from_db()
+        self.assertTrue(self.match.left_picks_confirmed and self.match.right_picks_confirmed)
+
+        picks = MatchDraftAction.objects.filter(match=self.match, action_type="PICK").order_by("step_index")
+        self.assertEqual(
+            [(a.acting_side, a.slot_index) for a in picks],
+            [("RIGHT", 1), ("LEFT", 1), ("LEFT", 2), ("RIGHT", 2)],
+        )
+        self.assertTrue(all(a.is_locked for a in picks))
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_DISPATCH_THREAD=False)
+class DraftConsumerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        invalidateResonatorCatalog()
+        flushBroadcasts()
+        self.playerLeft = Player.objects.create(name="Left")
+        self.playerRight = Player.objects.create(name="Right")
+        self.userLeft = User.objects.create_user("left", password="pw", role=UserRole.PLAYER, player=self.playerLeft)
+        self.host = User.objects.create_user("host", password="pw", role=UserRole.ADMIN)
+        self.resonator = Resonator.objects.create(slug="res", name="Res", icon_url="https://example.com/res.png")
+        self.match = Match.objects.create(
+            player_left=self.playerLeft,
+            player_right=self.playerRight,
+            first_pick_side=MatchSide.LEFT,
+        )
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/match/{self.match.id}/draft/")
+        communicator.scope["user"] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        initial = await communicator.receive_json_from()
+        self.assertEqual(initial["type"], "draftState")
+        return communicator
+
+    async def test_ban_command_is_acked_and_broadcast(self):
+        communicator = await self._connect(self.userLeft)
+        await communicator.send_json_to({"command": "ban", "resonatorId": self.resonator.id, "requestId": 7})
+
+        ack = await communicator.receive_json_from()
+        await database_sync_to_async(flushBroadcasts)()
+        state = await communicator.receive_json_from()
+        self.assertEqual(ack, {"type": "ack", "requestId": 7, "command": "ban", "ok": True, "version": 1})
+        self.assertEqual(state["version"], 1)
+        self.assertIn("You selected (pending)", state["html"])
+        await communicator.disconnect()
+
+    async def test_reset_requires_host(self):
+        communicator = await self._connect(self.userLeft)
+        await communicator.send_json_to({"command": "reset"})
+        ack = await communicator.receive_json_from()
+        self.assertEqual(ack["ok"], False)
+        await communicator.disconnect()
+
+        communicator = await self._connect(self.host)
+        await communicator.send_json_to({"command": "reset"})
+        ack = await communicator.receive_json_from()
+        self.assertEqual(ack, {"type": "ack", "requestId": None, "command": "reset", "ok": True, "version": 1})
+        await database_sync_to_async(flushBroadcasts)()
+        self.assertEqual((await communicator.receive_json_from())["type"], "draftState")
+        await communicator.disconnect()
+
+    async def test_spectator_receives_shared_snapshot_read_only(self):
+        spectator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/match/{self.match.id}/spectate/")
+        connected, _ = await spectator.connect()
+        self.assertTrue(connected)
+        initial = await spectator.receive_json_from()
+        self.assertEqual((initial["version"], initial["phase"]), (0, "BAN"))
+
+        await spectator.send_json_to({"command": "reset"})
+        self.assertTrue(await spectator.receive_nothing())
+
+        await database_sync_to_async(confirmDraftChoice)(self.match.id, self.userLeft, "BAN", {"ban": self.resonator.id})
+        await database_sync_to_async(flushBroadcasts)()
+        update = await spectator.receive_json_from()
+        self.assertEqual(update["version"], 1)
+        self.assertEqual(update["left"]["bans"], [])
+        await spectator.disconnect()
+
+    async def test_foreign_origin_is_rejected(self):
+        path = f"/ws/match/{self.match.id}/spectate/"
+        foreign = WebsocketCommunicator(application, path, headers=[(b"origin", b"https://evil.example")])
+        connected, _ = await foreign.connect()
+        self.assertFalse(connected)
+
+        own = WebsocketCommunicator(application, path, headers=[(b"origin", b"http://192.168.2.128")])
+        connected, _ = await own.connect()
+        self.assertTrue(connected)
+        await own.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_DISPATCH_THREAD=False)
+class BracketTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = Boss.objects.create(slug="boss", name="Boss")
+        cls.tournament = Tournament.objects.create(name="Open")
+
+    def setUp(self):
+        flushBroadcasts()
+
+    def _addPlayers(self, count):
+        players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(count))
+        self.tournament.players.set(players)
+        return players
+
+    def test_seed_positions(self):
+        self.assertEqual(seedPositions(8), [1, 8, 4, 5, 2, 7, 3, 6])
+        with self.assertRaises(ValueError):
+            seedPositions(6)
+
+    def test_byes_go_to_top_seeds(self):
+        players = self._addPlayers(5)
+        matches = generateSingleElim(self.tournament, seededPlayers=players)
+
+        firstRound = [m for m in matches if m.round_index == 0]
+        self.assertEqual([(m.player_left, m.player_right) for m in firstRound], [(players[3], players[4])])
+        semis = Match.objects.filter(tournament=self.tournament, round_index=1).order_by("match_index")
+        self.assertEqual([(m.player_left, m.player_right) for m in semis], [(players[0], None), (players[1], players[2])])
+        self.assertEqual((firstRound[0].next_match_id, firstRound[0].next_side), (semis[0].id, MatchSide.RIGHT))
+
+    def test_large_bracket_uses_constant_queries_per_round(self):
+        self._addPlayers(256)
+        with CaptureQueriesContext(connection) as queries:
+            matches = generateSingleElim(self.tournament, shuffleSeed=1)
+        self.assertEqual(len(matches), 255)
+        self.assertLess(len(queries.captured_queries), 20)
+
+        final = Match.objects.get(tournament=self.tournament, round_index=7)
+        self.assertIsNone(final.next_match_id)
+        self.assertEqual(Match.objects.filter(tournament=self.tournament, next_match__isnull=True).count(), 1)
+
+    def _assertEveryMatchHasTwoEntrants(self):
+        matches = list(Match.objects.filter(tournament=self.tournament))
+        incoming = {m.id: (m.player_left_id is not None) + (m.player_right_id is not None) for m in matches}
+        for m in matches:
+            for targetId in (m.next_match_id, m.loser_next_match_id):
+                if targetId is not None:
+                    incoming[targetId] += 1
+        self.assertEqual(set(incoming.values()), {2})
+
+    def test_double_elim_structure(self):
+        self._addPlayers(8)
+        matches = generateDoubleElim(self.tournament, shuffleSeed=3)
+
+        counts = Counter(m.bracket for m in matches)
+        self.assertEqual(counts, {BracketType.WINNERS: 7, BracketType.LOSERS: 6, BracketType.GRAND_FINAL: 2})
+        self._assertEveryMatchHasTwoEntrants()
+
+    def test_double_elim_with_byes(self):
+        self._addPlayers(11)
+        generateDoubleElim(self.tournament, shuffleSeed=3, grandFinalReset=False)
+        self._assertEveryMatchHasTwoEntrants()
+        self.assertEqual(Match.objects.filter(tournament=self.tournament, bracket=BracketType.GRAND_FINAL).count(), 1)
+
+    def test_large_double_elim_uses_constant_queries_per_round(self):
+        self._addPlayers(128)
+        with CaptureQueriesContext(connection) as queries:
+            matches = generateDoubleElim(self.tournament, shuffleSeed=1)
+        # 7 Winners-, 12 Losers-, 2 Grand-Final-Runden
+        self.assertEqual(len(matches), 127 + 126 + 2)
+        self.assertLess(len(queries.captured_queries), 30)
+
+    def _finish(self, match, leftTime, rightTime):
+        host = User.objects.create_user(f"host{match.id}", password="pw", role=UserRole.ADMIN)
+        Match.objects.filter(id=match.id).update(started_at=timezone.now(), left_time_ms=leftTime, right_time_ms=rightTime)
+        self.client.force_login(host)
+        self.client.post(reverse("hostMatchFinish", args=[match.id]))
+
+    def test_finish_advances_winner_and_drops_loser(self):
+        players = self._addPlayers(4)
+        generateDoubleElim(self.tournament, seededPlayers=players)
+        opener = Match.objects.get(tournament=self.tournament, bracket=BracketType.WINNERS, round_index=0, match_index=1)
+
+        self._finish(opener, 1000, 2000)
+        winnersFinal = Match.objects.get(id=opener.next_match_id)
+        losersOpener = Match.objects.get(id=opener.loser_next_match_id)
+        self.assertEqual(winnersFinal.player_left_id, players[0].id)
+        self.assertEqual(losersOpener.player_left_id, players[3].id)
+
+    def test_grand_final_reset_is_dropped_when_winners_champion_wins(self):
+        players = self._addPlayers(2)
+        generateDoubleElim(self.tournament, seededPlayers=players)
+        self._finish(Match.objects.get(tournament=self.tournament, bracket=BracketType.WINNERS), 1000, 2000)
+
+        grandFinal = Match.objects.get(tournament=self.tournament, bracket=BracketType.GRAND_FINAL, round_index=0)
+        self.assertEqual((grandFinal.player_left_id, grandFinal.player_right_id), (players[0].id, players[1].id))
+        self._finish(grandFinal, 1000, 2000)
+        self.assertFalse(Match.objects.filter(tournament=self.tournament, round_index=1, bracket=BracketType.GRAND_FINAL).exists())
+
+
+class SwissTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = Boss.objects.create(slug="boss", name="Boss")
+        cls.tournament = Tournament.objects.create(name="Open Qualifier")
+
+    def _addPlayers(self, count):
+        players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(count))
+        self.tournament.players.set(players)
+        return players
+
+    def _playRound(self, matches, rng):
+        for m in matches:
+            if m.player_right_id is not None:
+                m.winner_player_id = rng.choice((m.player_left_id, m.player_right_id))
+                m.finished_at = timezone.now()
+        Match.objects.bulk_update(matches, ["winner_player", "finished_at"])
+
+    def test_pairing_backtracks_instead_of_rematching(self):
+        opponents = {1: {2}, 2: {1}, 3: {4}, 4: {3}}
+        self.assertEqual(pairSwissRound([[1, 2, 3, 4]], opponents), [(1, 3), (2, 4)])
+        self.assertIsNone(pairSwissRound([[1, 2]], {1: {2}}))
+
+    def test_pairing_floats_down_and_merges_groups_when_needed(self):
+        # 1 hat in der eigenen Gruppe schon gegen 2 gespielt: floatet zu 3, 2 floatet zu 4
+        self.assertEqual(pairSwissRound([[1, 2], [3, 4]], {1: {2}, 2: {1}}), [(1, 3), (2, 4)])
+        # 3 kann unten nur gegen 4, 1/2 nur gegen 3 bzw. 4: erst das ganze Feld geht auf
+        opponents = {1: {2, 4}, 2: {1, 3}, 3: {2, 4}, 4: {1, 3}}
+        self.assertEqual(sorted(map(sorted, pairSwissRound([[1, 2], [3, 4]], opponents))), [[1, 3], [2, 4]])
+
+    def test_pairing_finds_the_only_perfect_matching_in_a_dense_field(self):
+        # Jeder hat gegen alle außer seinem festen Partner gespielt: eine einzige gültige Paarung
+        rng = random.Random(3)
+        players = list(range(1, 301))
+        shuffled = players[:]
+        rng.shuffle(shuffled)
+        partner = {}
+        for a, b in zip(shuffled[::2], shuffled[1::2]):
+            partner[a], partner[b] = b, a
+        opponents = {p: set(players) - {p, partner[p]} for p in players}
+
+        start = time.perf_counter()
+        pairs = pairSwissRound([players], opponents)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual({frozenset(p) for p in pairs}, {frozenset((p, partner[p])) for p in players})
+
+    def test_odd_field_gets_bye_and_no_rematches(self):
+        self._addPlayers(7)
+        rng = random.Random(1)
+        byes = set()
+        for _ in range(3):
+            matches = generateSwissRound(self.tournament)
+            bye = [m for m in matches if m.player_right_id is None]
+            self.assertEqual(len(bye), 1)
+            self.assertNotIn(bye[0].player_left_id, byes)
+            byes.add(bye[0].player_left_id)
+            self._playRound(matches, rng)
+
+        pairings = Match.objects.filter(tournament=self.tournament, player_right__isnull=False).values_list("player_left_id", "player_right_id")
+        self.assertEqual(len(pairings), len({frozenset(p) for p in pairings}))
+
+        standings = swissStandings(self.tournament)
+        self.assertEqual(sum(s.score for s in standings), 9 + 3)
+
+    def test_unfinished_round_blocks_next_round(self):
+        self._addPlayers(4)
+        generateSwissRound(self.tournament)
+        with self.assertRaises(ValueError):
+            generateSwissRound(self.tournament)
+
+    def test_thousand_players_pair_quickly(self):
+        self._addPlayers(1000)
+        rng = random.Random(2)
+        for _ in range(4):
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                matches = generateSwissRound(self.tournament)
+            self.assertLess(time.perf_counter() - start, 1.0)
+            # bulk_create teilt SQLite-bedingt in Batches (max. 999 Parameter pro Query)
+            self.assertLess(len(queries.captured_queries), 25)
+            self.assertEqual(len(matches), 500)
+            self._playRound(matches, rng)
+
+
+class GroupStageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bosses = [Boss.objects.create(slug=f"boss-{i}", name=f"Boss {i}") for i in range(2)]
+        cls.tournament = Tournament.objects.create(name="Groups")
+
+    def _addPlayers(self, count):
+        players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(count))
+        self.tournament.players.set(players)
+        return players
+
+    def test_snake_and_circle(self):
+        self.assertEqual(snakeGroups([1, 2, 3, 4, 5, 6], 2), [[1, 4, 5], [2, 3, 6]])
+        rounds = circleRounds([1, 2, 3, 4, 5])
+        self.assertEqual(len(rounds), 5)
+        pairs = [frozenset(p) for r in rounds for p in r]
+        self.assertEqual(len(pairs), 10)
+        self.assertEqual(len(set(pairs)), 10)
+
+    def test_groups_use_boss_time_snake_seeding(self):
+        players = self._addPlayers(4)
+        BossTime.objects.bulk_create([
+            BossTime(player=players[3], boss=self.bosses[0], best_time_ms=1000),
+            BossTime(player=players[2], boss=self.bosses[0], best_time_ms=2000),
+        ])
+        self.assertEqual(generateRoundRobinGroups(self.tournament, 2), 2)
+
+        groups = {
+            frozenset(m) for m in Match.objects.filter(tournament=self.tournament).values_list("player_left_id", "player_right_id")
+        }
+        # Seeds 1 (P3) + 4 (P1) und 2 (P2) + 3 (P0)
+        self.assertEqual(groups, {frozenset((players[3].id, players[1].id)), frozenset((players[2].id, players[0].id))})
+
+    def test_standings_in_one_query(self):
+        players = self._addPlayers(6)
+        generateRoundRobinGroups(self.tournament, 2)
+        match = Match.objects.filter(tournament=self.tournament, group_index=0).first()
+        Match.objects.filter(id=match.id).update(
+            finished_at=timezone.now(), left_time_ms=1000, right_time_ms=1500, winner_player_id=match.player_left_id,
+        )
+        Match.objects.create(tournament=self.tournament, player_left=players[0], player_right=players[1], first_pick_side=MatchSide.LEFT)
+
+        with self.assertNumQueries(1):
+            standings = groupStandings(self.tournament)
+        self.assertEqual([len(rows) for rows in standings.values()], [3, 3])
+        leader = standings[0][0]
+        self.assertEqual((leader.playerId, leader.played, leader.wins, leader.timeDiffMs), (match.player_left_id, 1, 1, 500))
+
+    def test_bracket_overwrite_keeps_group_stage(self):
+        self._addPlayers(8)
+        generateRoundRobinGroups(self.tournament, 2)
+        generateSingleElim(self.tournament, shuffleSeed=1)
+        self.assertEqual(Match.objects.filter(tournament=self.tournament, bracket=BracketType.GROUP).count(), 12)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_DISPATCH_THREAD=False)
+class BracketTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = Boss.objects.create(slug="boss", name="Boss")
+        cls.tournament = Tournament.objects.create(name="Tree")
+        cls.players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(4))
+        cls.tournament.players.set(cls.players)
+        cls.host = User.objects.create_user("host", password="pw", role=UserRole.ADMIN)
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            generateSingleElim(self.tournament, seededPlayers=self.players)
+        self.url = reverse("api_tournament_bracket", args=[self.tournament.id])
+
+    def test_tree_is_built_in_one_query_and_cached(self):
+        with self.assertNumQueries(2):  # Existenz-Check + Matches
+            tree = json.loads(getBracketTreeJson(self.tournament.id))
+        rounds = tree["brackets"][0]["rounds"]
+        self.assertEqual(tree["brackets"][0]["bracket"], BracketType.WINNERS)
+        self.assertEqual([len(r["matches"]) for r in rounds], [2, 1])
+        first = rounds[0]["matches"][0]
+        self.assertEqual((first["playerLeft"]["name"], first["playerRight"]["name"]), ("P0", "P3"))
+        self.assertEqual(first["nextMatchId"], rounds[1]["matches"][0]["id"])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), tree)
+
+    def test_unknown_tournament_is_404(self):
+        response = self.client.get(reverse("api_tournament_bracket", args=[self.tournament.id + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_finish_invalidates_tree(self):
+        getBracketTreeJson(self.tournament.id)
+        match = Match.objects.get(tournament=self.tournament, round_index=0, match_index=1)
+        Match.objects.filter(id=match.id).update(started_at=timezone.now(), left_time_ms=1000, right_time_ms=2000)
+
+        self.client.force_login(self.host)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("hostMatchFinish", args=[match.id]))
+
+        tree = json.loads(self.client.get(self.url).content)
+        rounds = tree["brackets"][0]["rounds"]
+        self.assertEqual(rounds[0]["matches"][0]["status"], "finished")
+        self.assertEqual(rounds[0]["matches"][0]["winnerId"], self.players[0].id)
+        self.assertEqual(rounds[1]["matches"][0]["playerLeft"]["id"], self.players[0].id)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_DISPATCH_THREAD=False)
+class FinalizeRoundTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = Boss.objects.create(slug="boss", name="Boss")
+        cls.tournament = Tournament.objects.create(name="Finalize")
+        cls.players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(8))
+        cls.tournament.players.set(cls.players)
+        cls.host = User.objects.create_user("host", password="pw", role=UserRole.ADMIN)
+
+    def setUp(self):
+        cache.clear()
+        flushBroadcasts()
+        generateSingleElim(self.tournament, seededPlayers=self.players)
+        self.firstRound = list(Match.objects.filter(tournament=self.tournament, round_index=0).order_by("match_index"))
+        now = timezone.now()
+        times = [(1000, 2000), (3000, 2500), (1500, 1500), (1200, None)]
+        for match, (left, right) in zip(self.firstRound, times):
+            Match.objects.filter(id=match.id).update(started_at=now, left_time_ms=left, right_time_ms=right)
+
+    def test_round_is_finalized_in_bulk_with_skips(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = finalizeMatches(self.tournament, bracket=BracketType.WINNERS, roundIndex=0)
+        # Konstant statt pro Match (inkl. drei Queries fürs Rating)
+        self.assertLess(len(queries.captured_queries), 12)
+
+        first, second, tied, open_ = self.firstRound
+        self.assertEqual(result.finished, [first.id, second.id])
+        self.assertEqual(result.skipped, {tied.id: SKIP_TIE, open_.id: SKIP_MISSING_TIMES})
+
+        semi = Match.objects.get(id=first.next_match_id)
+        self.assertEqual((semi.player_left_id, semi.player_right_id), (first.player_left_id, second.player_right_id))
+        self.assertEqual(semi.draft_version, 1)
+        self.assertIsNone(Match.objects.get(id=tied.id).finished_at)
+
+    def test_single_broadcast_per_changed_match(self):
+        channelLayer = get_channel_layer()
+        semiId = self.firstRound[0].next_match_id
+        channelName = async_to_sync(channelLayer.new_channel)()
+        async_to_sync(channelLayer.group_add)(f"matchDraft_{semiId}", channelName)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            finalizeMatches(self.tournament, bracket=BracketType.WINNERS, roundIndex=0)
+        flushBroadcasts()
+
+        self.assertEqual(async_to_sync(channelLayer.receive)(channelName), {"type": "page_refresh"})
+        self.assertNotIn(channelName, channelLayer.channels)
+        # Version-Cache, Broadcast, Bracket-Baum, Zeitmodell der Simulation
+        self.assertEqual(len(callbacks), 4)
+
+    def test_api_with_match_ids(self):
+        self.client.force_login(self.host)
+        url = reverse("api_tournament_finalize_round", args=[self.tournament.id])
+        response = self.client.post(
+            url, {"matchIds": [self.firstRound[0].id, self.firstRound[2].id, 999999]}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "finished": [self.firstRound[0].id],
+            "skipped": {str(self.firstRound[2].id): SKIP_TIE, "999999": SKIP_NOT_FOUND},
+        })
+
+        self.assertEqual(self.client.post(url, {}, content_type="application/json").status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.post(url, {"roundIndex": 0}, content_type="application/json").status_code, 403)
+
+
+class SeedingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bosses = [Boss.objects.create(slug=f"boss-{i}", name=f"Boss {i}") for i in range(2)]
+        cls.tournament = Tournament.objects.create(name="Seeding")
+
+    def _addPlayers(self, count):
+        players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(count))
+        self.tournament.players.set(players)
+        return players
+
+    def test_normalized_ranking_and_missing_bosses(self):
+        a, b, c, d = self._addPlayers(4)
+        BossTime.objects.bulk_create([
+            # Boss 0: 1000..2000, Boss 1: 10000..20000 – normiert zählen beide gleich
+            BossTime(player=a, boss=self.bosses[0], best_time_ms=2000),
+            BossTime(player=a, boss=self.bosses[1], best_time_ms=10000),
+            BossTime(player=b, boss=self.bosses[0], best_time_ms=1000),
+            BossTime(player=b, boss=self.bosses[1], best_time_ms=12000),
+            # c fehlt Boss 1 -> zählt dort wie der langsamste (20000)
+            BossTime(player=c, boss=self.bosses[0], best_time_ms=1000),
+            BossTime(player=d, boss=self.bosses[1], best_time_ms=20000),
+        ])
+        player = Player.objects.create(name="No times")
+        self.tournament.players.add(player)
+
+        with self.assertNumQueries(1):
+            ranking = rankPlayers(self.tournament)
+        self.assertEqual([e.playerId for e in ranking], [b.id, a.id, c.id, d.id, player.id])
+        self.assertAlmostEqual(ranking[0].score, (1.0 + 1.2) / 2)
+        self.assertEqual(ranking[-1].bossesCovered, 0)
+
+        onlyBoss0 = [e.playerId for e in rankPlayers(self.tournament, [self.bosses[0].id])]
+        self.assertEqual(onlyBoss0[:3], [b.id, c.id, a.id])
+
+    def test_bracket_slots_and_seeded_bracket(self):
+        self.assertEqual(bracketSlots(["a", "b", "c"]), ["a", None, "b", "c"])
+
+        players = self._addPlayers(4)
+        BossTime.objects.bulk_create(
+            BossTime(player=p, boss=self.bosses[0], best_time_ms=1000 * (4 - i)) for i, p in enumerate(players)
+        )
+        generateSingleElim(self.tournament, seededPlayers=seededPlayers(self.tournament))
+        first = Match.objects.get(tournament=self.tournament, round_index=0, match_index=1)
+        self.assertEqual((first.player_left_id, first.player_right_id), (players[3].id, players[0].id))
+
+    def test_thousands_of_players(self):
+        rng = random.Random(3)
+        players = self._addPlayers(3000)
+        BossTime.objects.bulk_create(
+            BossTime(player=p, boss=boss, best_time_ms=rng.randint(30000, 90000))
+            for p in players for boss in self.bosses if rng.random() < 0.9
+        )
+        start = time.perf_counter()
+        ranking = rankPlayers(self.tournament)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(len(ranking), 3000)
+
+
+class SimulationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = Boss.objects.create(slug="boss", name="Boss")
+        cls.tournament = Tournament.objects.create(name="Simulation")
+        cls.players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(4))
+        cls.tournament.players.set(cls.players)
+        # P0 klar am schnellsten, P3 ohne Daten (Feld-Schnitt)
+        BossTime.objects.bulk_create(
+            BossTime(player=p, boss=cls.boss, best_time_ms=t) for p, t in zip(cls.players, (30000, 60000, 61000))
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_probabilities_sum_to_one(self):
+        generateDoubleElim(self.tournament, seededPlayers=self.players)
+        result = simulateBracket(self.tournament.id, 20000, seed=1)
+
+        self.assertAlmostEqual(sum(p["winProbability"] for p in result["players"]), 1.0, places=3)
+        self.assertEqual(result["players"][0]["id"], self.players[0].id)
+        self.assertGreater(result["players"][0]["winProbability"], 0.9)
+        for probabilities in result["matches"].values():
+            self.assertAlmostEqual(sum(probabilities.values()), 1.0, places=3)
+
+    def test_finished_match_is_fixed_and_result_recomputed(self):
+        generateSingleElim(self.tournament, seededPlayers=self.players)
+        json.loads(getWinProbabilitiesJson(self.tournament.id, 5000))
+
+        # Außenseiter P3 schlägt P0 im ersten Match
+        match = Match.objects.get(tournament=self.tournament, round_index=0, player_left=self.players[0])
+        match.started_at = match.finished_at = timezone.now()
+        match.left_time_ms, match.right_time_ms = 90000, 50000
+        match.winner_player = self.players[3]
+        with self.captureOnCommitCallbacks(execute=True):
+            match.save()
+            Match.objects.filter(id=match.next_match_id).update(player_left=self.players[3])
+            invalidateBracketTree(self.tournament.id)
+            recordMatchTimes([match])
+
+        result = json.loads(getWinProbabilitiesJson(self.tournament.id, 5000))
+        probabilities = {p["id"]: p["winProbability"] for p in result["players"]}
+        self.assertEqual(probabilities[self.players[0].id], 0.0)
+        self.assertNotIn(str(match.id), result["matches"])
+
+    def test_concurrent_miss_serves_stale_result_instead_of_simulating(self):
+        generateSingleElim(self.tournament, seededPlayers=self.players)
+        stale = getWinProbabilitiesJson(self.tournament.id, 5000)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidateBracketTree(self.tournament.id)
+
+        # Ein anderer Request hält den Lock der neuen Generation
+        lockKey = f"simulate:lock:{self.tournament.id}:{bracketGeneration(self.tournament.id)}:5000"
+        cache.add(lockKey, 1)
+        with patch("core.simulate.simulateBracket") as simulate:
+            self.assertEqual(getWinProbabilitiesJson(self.tournament.id, 5000), stale)
+        simulate.assert_not_called()
+
+        cache.delete(lockKey)
+        self.assertEqual(json.loads(getWinProbabilitiesJson(self.tournament.id, 5000))["players"][0]["id"], self.players[0].id)
+
+    def test_finished_match_times_enter_the_model_once(self):
+        playerIds = [p.id for p in self.players]
+        getTimeModel(self.tournament.id, playerIds)
+        with self.captureOnCommitCallbacks(execute=True):
+            match = Match.objects.create(
+                tournament=self.tournament, boss=self.boss, player_left=self.players[0], player_right=self.players[1],
+                left_time_ms=31000, right_time_ms=59000,
+            )
+            recordMatchTimes([match])
+            # Leser innerhalb der Transaktion sieht die Zeiten schon – das Verwerfen danach darf nicht doppelt zählen
+            getTimeModel(self.tournament.id, playerIds)
+
+        model = getTimeModel(self.tournament.id, playerIds)
+        self.assertEqual(model["stats"][(self.players[0].id, self.boss.id)], [1, 31000, 31000 * 31000])
+        with self.assertNumQueries(0):
+            getTimeModel(self.tournament.id, playerIds)
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bosses = [Boss.objects.create(slug=f"boss-{i}", name=f"Boss {i}") for i in range(3)]
+        cls.players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(8))
+        cls.tournament = Tournament.objects.create(name="Leaderboard")
+        cls.tournament.players.set(cls.players[4:])
+        # Boss 0: P0 schnellster, P1/P2 zeitgleich; Boss 2 ohne Einträge
+        BossTime.objects.bulk_create(
+            [BossTime(player=p, boss=cls.bosses[0], best_time_ms=t) for p, t in zip(cls.players, (1000, 2000, 2000, 4000, 5000, 6000, 7000, None))]
+            + [BossTime(player=p, boss=cls.bosses[1], best_time_ms=9000 - 1000 * i) for i, p in enumerate(cls.players)]
+        )
+        rebuildBossLeaderboards()
+
+    def _ranking(self, rows, boss):
+        return [(e.rank, e.playerId) for e in rows.get(boss.id, [])]
+
+    def test_top_k_per_boss(self):
+        with self.assertNumQueries(1):
+            rows = leaderboardRows(3)
+        p = self.players
+        self.assertEqual(self._ranking(rows, self.bosses[0]), [(1, p[0].id), (2, p[1].id), (3, p[2].id)])
+        self.assertEqual(self._ranking(rows, self.bosses[1]), [(1, p[7].id), (2, p[6].id), (3, p[5].id)])
+        self.assertNotIn(self.bosses[2].id, rows)
+
+    def test_tournament_and_player_filters(self):
+        p = self.players
+        rows = leaderboardRows(2, tournamentId=self.tournament.id)
+        self.assertEqual(self._ranking(rows, self.bosses[0]), [(1, p[4].id), (2, p[5].id)])
+
+        rows = leaderboardRows(playerIds=[p[2].id, p[6].id])
+        self.assertEqual(self._ranking(rows, self.bosses[0]), [(3, p[2].id), (7, p[6].id)])
+        self.assertEqual(self._ranking(rows, self.bosses[1]), [(2, p[6].id), (6, p[2].id)])
+
+        rows = leaderboardRows(playerIds=[p[2].id, p[6].id], tournamentId=self.tournament.id)
+        self.assertEqual(self._ranking(rows, self.bosses[0]), [(3, p[6].id)])
+
+    def test_page_query_count_does_not_grow_with_bosses(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("leaderboards"), {"top": 2})
+        self.assertContains(response, "P0")
+
+        Boss.objects.bulk_create(Boss(slug=f"extra-{i}", name=f"Extra {i}") for i in range(20))
+        with self.assertNumQueries(2):
+            self.client.get(reverse("leaderboards"))
+
+    def test_api(self):
+        response = self.client.get(reverse("api_leaderboards"), {"top": 1, "tournament": self.tournament.id})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["topK"], 1)
+        boss0 = next(b for b in data["bosses"] if b["id"] == self.bosses[0].id)
+        self.assertEqual(boss0["entries"], [{"rank": 1, "playerId": self.players[4].id, "playerName": "P4", "bestTimeMs": 5000}])
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_DISPATCH_THREAD=False)
+class MaterializedLeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = Boss.objects.create(slug="boss", name="Boss")
+
+    def _submit(self, player, timeMs):
+        user = User.objects.filter(player=player).first() or User.objects.create_user(
+            f"user-{player.id}", password="pw", role=UserRole.PLAYER, player=player,
+        )
+        match = Match.objects.create(
+            player_left=player, boss=self.boss,
+            first_pick_side=MatchSide.LEFT, started_at=timezone.now(),
+        )
+        self.client.force_login(user)
+        self.client.post(reverse("matchSubmitTime", args=[match.id]), {"timeInput": f"0:{timeMs // 1000:02d}.{timeMs % 1000:03d}"})
+
+    def test_submissions_keep_top_k_in_sync(self):
+        players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(4))
+        for player, timeMs in zip(players, (50000, 40000, 45000, 40000)):
+            self._submit(player, timeMs)
+        # Neue Bestzeit verschiebt P0 nach vorn, eine schlechtere Zeit ändert nichts
+        self._submit(players[0], 30000)
+        self._submit(players[1], 55000)
+
+        with self.assertNumQueries(1):
+            rows = leaderboardRows(10)
+        self.assertEqual(
+            [(e.rank, e.playerId, e.bestTimeMs) for e in rows[self.boss.id]],
+            [(1, players[0].id, 30000), (2, players[1].id, 40000), (3, players[3].id, 40000), (4, players[2].id, 45000)],
+        )
+        self.assertEqual(checkBossLeaderboards(), [])
+
+    def test_slow_time_outside_top_k_is_a_single_read(self):
+        players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(MATERIALIZED_TOP_K + 1))
+        BossTime.objects.bulk_create(
+            BossTime(player=p, boss=self.boss, best_time_ms=1000 + i) for i, p in enumerate(players[:-1])
+        )
+        rebuildBossLeaderboards()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(recordPersonalBest(self.boss.id, players[-1].id, 999999))
+        self.assertFalse([q for q in queries.captured_queries if not q["sql"].lstrip().upper().startswith("SELECT")])
+
+        self.assertTrue(recordPersonalBest(self.boss.id, players[-1].id, 500))
+        BossTime.objects.create(player=players[-1], boss=self.boss, best_time_ms=500)
+        self.assertEqual(checkBossLeaderboards(), [])
+        self.assertEqual(leaderboardRows(1)[self.boss.id][0].playerId, players[-1].id)
+
+    def test_check_detects_drift(self):
+        player = Player.objects.create(name="Admin edit")
+        BossTime.objects.create(player=player, boss=self.boss, best_time_ms=1234)
+        self.assertEqual(len(checkBossLeaderboards()), 1)
+        rebuildBossLeaderboards()
+        self.assertEqual(checkBossLeaderboards(), [])
+        self.assertEqual(leaderboardRows(5), computeLeaderboardRows(5))
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_DISPATCH_THREAD=False)
+class TimeStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = Boss.objects.create(slug="boss", name="Boss")
+        cls.player = Player.objects.create(name="Runner")
+
+    def setUp(self):
+        cache.clear()
+        flushBroadcasts()
+
+    def _log(self, times, player=None):
+        recordTimeSubmissions([
+            TimeSubmission(player=player or self.player, boss=self.boss, time_ms=t) for t in times
+        ])
+
+    def test_percentiles_and_histogram(self):
+        # Jede Zeit in einem eigenen Bin: Perzentile landen exakt auf Bin-Kanten
+        self._log(10000 + i * BIN_MS for i in range(100))
+        stats = bossTimeStats(self.boss.id)
+        self.assertEqual(stats["count"], 100)
+        self.assertEqual(stats["startMs"], 10000)
+        self.assertEqual(stats["histogram"], [1] * 100)
+        self.assertEqual(stats["percentiles"], {"p50": 22500, "p90": 32500, "p99": 34750})
+
+    def test_new_submissions_are_read_incrementally(self):
+        self._log([20000, 21000])
+        self.assertEqual(bossTimeStats(self.boss.id)["count"], 2)
+
+        self._log([5000, 90000])
+        # Nur die pk-Range nach lastId, keine neue Aggregation
+        with CaptureQueriesContext(connection) as queries:
+            stats = bossTimeStats(self.boss.id)
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertIn('"id" >', queries.captured_queries[0]["sql"])
+        self.assertEqual(stats["count"], 4)
+        self.assertEqual(stats["startMs"], 5000)
+        self.assertEqual(sum(stats["histogram"]), 4)
+
+        cache.clear()
+        self.assertEqual(bossTimeStats(self.boss.id), stats)
+
+    def test_late_commit_below_last_id_is_counted_once(self):
+        self._log([20000])
+        firstId = TimeSubmission.objects.get().id
+        # Parallele Schreiber: id firstId + 2 committet erst nach firstId + 5
+        TimeSubmission.objects.create(id=firstId + 5, player=self.player, boss=self.boss, time_ms=21000)
+        self.assertEqual(bossTimeStats(self.boss.id)["count"], 2)
+
+        TimeSubmission.objects.create(id=firstId + 2, player=self.player, boss=self.boss, time_ms=22000)
+        self.assertEqual(bossTimeStats(self.boss.id)["count"], 3)
+        self.assertEqual(bossTimeStats(self.boss.id)["count"], 3)
+
+    def test_log_is_append_only(self):
+        self._log([30000])
+        entry = TimeSubmission.objects.get()
+        entry.time_ms = 1
+        with self.assertRaises(ValueError):
+            entry.save()
+
+    def test_submit_time_logs_every_run(self):
+        user = User.objects.create_user("runner", password="pw", role=UserRole.PLAYER, player=self.player)
+        self.client.force_login(user)
+        for timeInput in ("0:40.000", "0:45.500"):
+            match = Match.objects.create(
+                player_left=self.player, boss=self.boss,
+                first_pick_side=MatchSide.LEFT, started_at=timezone.now(),
+            )
+            self.client.post(reverse("matchSubmitTime", args=[match.id]), {"timeInput": timeInput})
+
+        # BossTime hält nur die Bestzeit, das Log beide Runs
+        self.assertEqual(BossTime.objects.get(player=self.player, boss=self.boss).best_time_ms, 40000)
+        self.assertEqual(
+            list(TimeSubmission.objects.order_by("id").values_list("time_ms", flat=True)), [40000, 45500]
+        )
+
+    def test_player_stats_and_api(self):
+        other = Player.objects.create(name="Other")
+        self._log([60000] * 3, player=other)
+        self._log([40000, 44000, 42000])
+
+        stats = playerTimeStats(self.player.id, self.boss.id)
+        self.assertEqual(stats["count"], 3)
+        self.assertEqual((stats["bestMs"], stats["meanMs"], stats["medianMs"]), (40000, 42000, 42000))
+        self.assertEqual(stats["recentMs"], [40000, 44000, 42000])
+        self.assertEqual(stats["bestPercentileRank"], 1.0)
+
+        response = self.client.get(
+            reverse("api_boss_time_stats", args=[self.boss.id]), {"player": self.player.id}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 6)
+        self.assertEqual(response.json()["player"]["bestMs"], 40000)
+        self.assertEqual(self.client.get(reverse("api_boss_time_stats", args=[self.boss.id + 1])).status_code, 404)
+        self.assertEqual(
+            self.client.get(reverse("api_boss_time_stats", args=[self.boss.id]), {"player": "x"}).status_code, 404
+        )
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_DISPATCH_THREAD=False)
+class RankIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        cls.bosses = Boss.objects.bulk_create(Boss(slug=f"boss-{i}", name=f"Boss {i}") for i in range(3))
+        cls.players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(40))
+        # Grobe Zeiten erzeugen Gleichstände, die über player_id aufgelöst werden
+        BossTime.objects.bulk_create(
+            BossTime(player=p, boss=b, best_time_ms=rng.randint(10, 30) * 1000)
+            for b in cls.bosses for p in cls.players if rng.random() < 0.8
+        )
+
+    def setUp(self):
+        cache.clear()
+        flushBroadcasts()
+
+    def _expected(self, player):
+        rows = computeLeaderboardRows(playerIds=[player.id])
+        return {bossId: entries[0].rank for bossId, entries in rows.items()}
+
+    def _ranks(self, player):
+        return {r.bossId: r.rank for r in playerRanks(player.id)}
+
+    def test_ranks_match_count_based_leaderboard(self):
+        for player in self.players:
+            self.assertEqual(self._ranks(player), self._expected(player))
+
+        top = min(playerRanks(self.players[0].id), key=lambda r: r.rank)
+        totals = dict(BossTime.objects.filter(boss_id=top.bossId).values_list("boss_id").annotate(n=Count("id")))
+        self.assertEqual(top.total, totals[top.bossId])
+        self.assertEqual(top.percentile, round(100 * (top.total - top.rank) / top.total, 1))
+
+        # Warm: nur noch die eigenen Bestzeiten
+        with self.assertNumQueries(1):
+            playerRanks(self.players[1].id)
+
+    def test_submit_updates_index_in_place(self):
+        player, boss = self.players[5], self.bosses[0]
+        self._ranks(player)
+        user = User.objects.create_user("runner", password="pw", role=UserRole.PLAYER, player=player)
+        self.client.force_login(user)
+        match = Match.objects.create(
+            player_left=player, boss=boss, first_pick_side=MatchSide.LEFT, started_at=timezone.now(),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("matchSubmitTime", args=[match.id]), {"timeInput": "0:01.000"})
+        flushBroadcasts()
+
+        with self.assertNumQueries(1):
+            ranks = self._ranks(player)
+        self.assertEqual(ranks[boss.id], 1)
+        self.assertEqual(ranks, self._expected(player))
+        self.assertEqual(self._ranks(self.players[6]), self._expected(self.players[6]))
+
+    def test_invalidate_reloads_after_bulk_changes(self):
+        player = self.players[0]
+        self._ranks(player)
+        BossTime.objects.filter(boss=self.bosses[1]).exclude(player=player).update(best_time_ms=1)
+        invalidateRankIndexes([self.bosses[1].id])
+        self.assertEqual(self._ranks(player), self._expected(player))
+
+    def test_dashboard_and_api(self):
+        player = self.players[3]
+        user = User.objects.create_user("viewer", password="pw", role=UserRole.PLAYER, player=player)
+        self.client.force_login(user)
+        response = self.client.get(reverse("playerDashboard"))
+        self.assertContains(response, "Your ranks")
+        self.assertEqual([r.bossId for r in response.context["ranks"]], sorted(self._expected(player)))
+
+        data = self.client.get(reverse("api_player_ranks", args=[player.id])).json()
+        self.assertEqual({r["bossId"]: r["rank"] for r in data["ranks"]}, self._expected(player))
+        self.assertEqual(self.client.get(reverse("api_player_ranks", args=[10**6])).status_code, 404)
+
+
+class LeaderboardPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = Boss.objects.create(slug="boss", name="Boss")
+        cls.players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(23))
+        # Viele Gleichstände: Reihenfolge über player_id
+        BossTime.objects.bulk_create(
+            BossTime(player=p, boss=cls.boss, best_time_ms=10000 + (i % 5) * 1000) for i, p in enumerate(cls.players)
+        )
+        cls.expected = computeLeaderboardRows(MAX_TOP_K)[cls.boss.id]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_walk_forward_and_back(self):
+        pages, page = [], leaderboardPage(self.boss.id, pageSize=5)
+        self.assertIsNone(page.previousCursor)
+        while True:
+            pages.append(page)
+            if page.nextCursor is None:
+                break
+            page = leaderboardPage(self.boss.id, after=page.nextCursor, pageSize=5)
+        self.assertEqual([e for p in pages for e in p.entries], self.expected)
+        self.assertEqual([len(p.entries) for p in pages], [5, 5, 5, 5, 3])
+
+        back = leaderboardPage(self.boss.id, before=pages[-1].previousCursor, pageSize=5)
+        self.assertEqual(back, pages[-2])
+        self.assertIsNone(leaderboardPage(self.boss.id, before=pages[1].previousCursor, pageSize=5).previousCursor)
+
+    def test_jump_to_player(self):
+        target = self.expected[12]
+        page = leaderboardPage(self.boss.id, playerId=target.playerId, pageSize=4)
+        self.assertEqual(page.entries, self.expected[12:16])
+        self.assertEqual(leaderboardPage(self.boss.id, before=page.previousCursor, pageSize=4).entries, self.expected[8:12])
+
+        with self.assertRaises(BossTime.DoesNotExist):
+            leaderboardPage(self.boss.id, playerId=Player.objects.create(name="No time").id)
+
+    def test_deep_page_is_one_index_range(self):
+        cursor = encodeCursor(self.expected[19])
+        getRankIndexes([self.boss.id])
+        with CaptureQueriesContext(connection) as queries:
+            page = leaderboardPage(self.boss.id, after=cursor, pageSize=5)
+        self.assertEqual(page.entries, self.expected[20:])
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertNotIn("OFFSET", queries.captured_queries[0]["sql"].upper())
+
+    def test_ranks_come_from_the_index_not_the_cursor(self):
+        forged = base64.urlsafe_b64encode(f"{self.expected[4].bestTimeMs}:{self.expected[4].playerId}:1000".encode()).decode()
+        with self.assertRaises(ValueError):
+            leaderboardPage(self.boss.id, after=forged, pageSize=5)
+
+        # Kurze erste Seite rückwärts: Ränge ab 1
+        back = leaderboardPage(self.boss.id, before=encodeCursor(self.expected[2]), pageSize=5)
+        self.assertEqual([e.rank for e in back.entries], [1, 2])
+
+        # Neue Bestzeit vor der Seite: Ränge verschieben sich mit
+        page = leaderboardPage(self.boss.id, pageSize=5)
+        faster = Player.objects.create(name="Faster")
+        with self.captureOnCommitCallbacks(execute=True):
+            BossTime.objects.create(player=faster, boss=self.boss, best_time_ms=1000)
+            recordRankChange(self.boss.id, faster.id, None, 1000)
+        nextPage = leaderboardPage(self.boss.id, after=page.nextCursor, pageSize=5)
+        self.assertEqual([e.rank for e in nextPage.entries], list(range(7, 12)))
+
+    def test_api(self):
+        url = reverse("api_boss_leaderboard", args=[self.boss.id])
+        data = self.client.get(url, {"size": 10}).json()
+        self.assertEqual([e["rank"] for e in data["entries"]], list(range(1, 11)))
+        data = self.client.get(url, {"size": 10, "after": data["next"]}).json()
+        self.assertEqual(data["entries"][0]["playerId"], self.expected[10].playerId)
+
+        self.assertEqual(self.client.get(url, {"after": "garbage!"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"player": 10**6}).status_code, 404)
+        self.assertEqual(self.client.get(reverse("api_boss_leaderboard", args=[self.boss.id + 1])).status_code, 404)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_DISPATCH_THREAD=False)
+class RatingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.boss = Boss.objects.create(slug="boss", name="Boss")
+        cls.players = Player.objects.bulk_create(Player(name=f"P{i}") for i in range(6))
+        cls.host = User.objects.create_user("host", password="pw", role=UserRole.ADMIN)
+
+    def setUp(self):
+        cache.clear()
+        flushBroadcasts()
+
+    def _finished(self, left, right, leftWins=True):
+        now = timezone.now()
+        return Match.objects.create(
+            player_left=left, player_right=right, boss=self.boss, first_pick_side=MatchSide.LEFT,
+            started_at=now, finished_at=now, winner_player=left if leftWins else right,
+        )
+
+    def test_wave_replay_matches_sequential_elo(self):
+        rng = random.Random(3)
+        left = [rng.randrange(12) for _ in range(500)]
+        right = [(l + rng.randrange(1, 12)) % 12 for l in left]
+        leftWon = [rng.random() < 0.6 for _ in left]
+
+        ratings, played = [INITIAL_RATING] * 12, [0] * 12
+        for l, r, won in zip(left, right, leftWon):
+            expected = expectedScore(ratings[l], ratings[r])
+            deltaL = kFactor(played[l]) * (won - expected)
+            deltaR = kFactor(played[r]) * (expected - won)
+            ratings[l] += deltaL
+            ratings[r] += deltaR
+            played[l] += 1
+            played[r] += 1
+
+        result = replayRatings(*(np.asarray(a) for a in (left, right, leftWon)), 12)
+        np.testing.assert_allclose(result.ratings, ratings)
+        self.assertEqual(result.played.tolist(), played)
+
+    def test_host_finish_updates_ratings_and_history(self):
+        a, b = self.players[:2]
+        match = Match.objects.create(
+            player_left=a, player_right=b, boss=self.boss, first_pick_side=MatchSide.LEFT,
+            started_at=timezone.now(), left_time_ms=40000, right_time_ms=45000,
+        )
+        self.client.force_login(self.host)
+        self.client.post(reverse("hostMatchFinish", args=[match.id]))
+        flushBroadcasts()
+
+        # Ein zweiter Finish-Request wertet nicht noch einmal
+        self.client.post(reverse("hostMatchFinish", args=[match.id]))
+        self.assertEqual(RatingHistory.objects.filter(match=match).count(), 2)
+
+        ratings = dict(PlayerRating.objects.values_list("player_id", "rating"))
+        self.assertEqual(ratings, {a.id: INITIAL_RATING + 20, b.id: INITIAL_RATING - 20})
+        history = RatingHistory.objects.get(player=a, match=match)
+        self.assertEqual((history.rating_before, history.rating_after), (INITIAL_RATING, INITIAL_RATING + 20))
+
+        # Zweites Match: bestehende Ratings werden fortgeschrieben
+        recordMatchRatings([self._finished(b, a)])
+        self.assertEqual(PlayerRating.objects.get(player=a).matches_played, 2)
+        self.assertLess(PlayerRating.objects.get(player=a).rating, INITIAL_RATING + 20)
+
+    def test_recompute_reproduces_live_ratings(self):
+        rng = random.Random(5)
+        for _ in range(30):
+            left, right = rng.sample(self.players, 2)
+            recordMatchRatings([self._finished(left, right, rng.random() < 0.5)])
+        live = dict(PlayerRating.objects.values_list("player_id", "rating"))
+        liveHistory = set(RatingHistory.objects.values_list("player_id", "match_id", "rating_after"))
+
+        self.assertEqual(recomputeRatings(), 30)
+        recomputed = dict(PlayerRating.objects.values_list("player_id", "rating"))
+        self.assertEqual(live.keys(), recomputed.keys())
+        for playerId, rating in live.items():
+            self.assertAlmostEqual(recomputed[playerId], rating)
+        self.assertEqual(RatingHistory.objects.count(), 60)
+        self.assertEqual(
+            {(p, m) for p, m, _ in RatingHistory.objects.values_list("player_id", "match_id", "rating_after")},
+            {(p, m) for p, m, _ in liveHistory},
+        )
+
+    def test_api_and_rating_seeding(self):
+        strong, weak, fresh = self.players[:3]
+        for _ in range(3):
+            recordMatchRatings([self._finished(strong, weak)])
+        tournament = Tournament.objects.create(name="Rated")
+        tournament.players.set([weak, fresh, strong])
+
+        self.assertEqual(seededPlayers(tournament, byRating=True), [strong, fresh, weak])
+
+        data = self.client.get(reverse("api_ratings"), {"top": 2}).json()
+        self.assertEqual([(e["rank"], e["playerId"]) for e in data["entries"]], [(1, strong.id), (2, weak.id)])
+        self.assertEqual(self.client.get(reverse("api_ratings"), {"top": "x"}).status_code, 400)
@@ -0,0 +1,217 @@
+"""
+Auswertung des TimeSubmission-Logs: Histogramm und Perzentile pro Boss, Verlauf pro Spieler.
+
+Pro Boss wird ein kompaktes Histogramm (feste Bins von BIN_MS) im Cache gehalten. Es merkt sich
+die höchste verarbeitete Submission-id; jeder Lesezugriff liest nur die neuen Zeilen
+(pk-Range) und zählt sie dazu. Eine volle Aggregation läuft nur, wenn der Cache leer ist.
+
+ids werden nicht in Commit-Reihenfolge sichtbar (parallele Schreiber auf Postgres/MySQL): eine
+Transaktion mit kleinerer id kann nach einer größeren committen. Deshalb wird ein Fenster von
+ID_WINDOW ids unter lastId erneut gelesen und per id dedupliziert; was selbst dafür zu spät
+kommt, fängt der Neuaufbau nach SUMMARY_TIMEOUT auf.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.db.models.functions import Floor
+
+from .models import TimeSubmission
+
+
+TIME_STATS_CACHE_ALIAS = "default"
+BIN_MS = 250
+PERCENTILES = (0.5, 0.9, 0.99)
+RECENT_SUBMISSIONS = 20
+
+# Nachzügler-Fenster unter lastId und maximale Lebensdauer einer inkrementellen Summary
+ID_WINDOW = 200
+SUMMARY_TIMEOUT = 10 * 60
+
+_SUMMARY_KEY = "timestats:summary"
+
+
+@dataclass
+class BossHistogram:
+    offset: int  # erster Bin (Index, nicht ms)
+    counts: np.ndarray  # int64, Bin offset + i = [(offset + i) * BIN_MS, (offset + i + 1) * BIN_MS)
+
+    def add(self, bins: np.ndarray, counts: np.ndarray | None = None) -> None:
+        # counts: Anzahl pro Eintrag in bins (Standard: je 1)
+        if not len(bins):
+            return
+        low, high = int(bins.min()), int(bins.max())
+        if not len(self.counts):
+            self.offset, self.counts = low, np.zeros(high - low + 1, dtype=np.int64)
+        elif low < self.offset or high >= self.offset + len(self.counts):
+            newOffset = min(low, self.offset)
+            grown = np.zeros(max(high + 1, self.offset + len(self.counts)) - newOffset, dtype=np.int64)
+            grown[self.offset - newOffset:self.offset - newOffset + len(self.counts)] = self.counts
+            self.offset, self.counts = newOffset, grown
+        self.counts += np.bincount(bins - self.offset, weights=counts, minlength=len(self.counts)).astype(np.int64)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+
+@dataclass
+class TimeSummary:
+    lastId: int
+    bosses: dict[int, BossHistogram]
+    recentIds: set[int]  # verarbeitete ids im Fenster (lastId - ID_WINDOW, lastId]
+    builtAt: float  # time.time() der vollen Aggregation
+
+
+def _emptyHistogram() -> BossHistogram:
+    return BossHistogram(0, np.zeros(0, dtype=np.int64))
+
+
+def _buildSummary() -> TimeSummary:
+    # Kalter Start: eine gruppierte Aggregation über den (boss, time_ms)-Index
+    with transaction.atomic():
+        lastId = TimeSubmission.objects.aggregate(lastId=Max("id"))["lastId"] or 0
+        rows = (
+            TimeSubmission.objects.filter(id__lte=lastId)
+            .annotate(bin=Floor(F("time_ms") / BIN_MS))
+            .values_list("boss_id", "bin")
+            .annotate(n=Count("id"))
+            .order_by()
+        )
+        grouped: dict[int, tuple[list, list]] = {}
+        for bossId, bin_, n in rows:
+            bins, counts = grouped.setdefault(bossId, ([], []))
+            bins.append(int(bin_))
+            counts.append(n)
+        recentIds = set(
+            TimeSubmission.objects.filter(id__gt=lastId - ID_WINDOW, id__lte=lastId).values_list("id", flat=True)
+        )
+
+    bosses = {}
+    for bossId, (bins, counts) in grouped.items():
+        histogram = _emptyHistogram()
+        histogram.add(np.asarray(bins, dtype=np.int64), np.asarray(counts, dtype=np.int64))
+        bosses[bossId] = histogram
+    return TimeSummary(lastId=lastId, bosses=bosses, recentIds=recentIds, builtAt=time.time())
+
+
+def _applyNewSubmissions(summary: TimeSummary) -> bool:
+    # Zeilen nach lastId plus das Nachzügler-Fenster darunter (pk-Range), bereits gezählte ids raus
+    rows = [
+        row for row in TimeSubmission.objects.filter(id__gt=summary.lastId - ID_WINDOW)
+        .order_by("id")
+        .values_list("id", "boss_id", "time_ms")
+        if row[0] not in summary.recentIds
+    ]
+    if not rows:
+        return False
+
+    data = np.asarray(rows, dtype=np.int64)
+    summary.lastId = max(summary.lastId, int(data[-1, 0]))
+    low = summary.lastId - ID_WINDOW
+    summary.recentIds = {i for i in summary.recentIds if i > low} | {i for i in data[:, 0].tolist() if i > low}
+    for bossId in np.unique(data[:, 1]):
+        bins = data[data[:, 1] == bossId, 2] // BIN_MS
+        summary.bosses.setdefault(int(bossId), _emptyHistogram()).add(bins)
+    return True
+
+
+def getTimeSummary() -> TimeSummary:
+    """
+    Aktuelle Histogramme aller Bosse: aus dem Cache plus inkrementell die neuen Submissions.
+    """
+    cache = caches[TIME_STATS_CACHE_ALIAS]
+    summary = cache.get(_SUMMARY_KEY)
+    if summary is None:
+        summary = _buildSummary()
+        _applyNewSubmissions(summary)
+        cache.set(_SUMMARY_KEY, summary, SUMMARY_TIMEOUT)
+    elif _applyNewSubmissions(summary):
+        # Zwei Leser mit demselben Stand schreiben dasselbe Ergebnis; ein älterer Stand
+        # kostet den nächsten Leser nur ein paar Zeilen mehr (lastId steckt in der Summary).
+        # Die Lebensdauer wird nicht verlängert: spätestens SUMMARY_TIMEOUT nach dem Aufbau neu aggregieren
+        remaining = SUMMARY_TIMEOUT - (time.time() - summary.builtAt)
+        cache.set(_SUMMARY_KEY, summary, max(int(remaining), 1))
+    return summary
+
+
+def _cdf(histogram: BossHistogram) -> tuple[np.ndarray, np.ndarray]:
+    # Bin-Kanten in ms und kumulierter Anteil an jeder Kante (innerhalb eines Bins linear)
+    edges = (histogram.offset + np.arange(len(histogram.counts) + 1)) * BIN_MS
+    cdf = np.concatenate(([0], np.cumsum(histogram.counts))) / histogram.total
+    return edges, cdf
+
+
+def _percentiles(histogram: BossHistogram, quantiles) -> list[float]:
+    edges, cdf = _cdf(histogram)
+    return np.interp(quantiles, cdf, edges).tolist()
+
+
+def bossTimeStats(bossId: int) -> dict:
+    """
+    Histogramm (Bins à BIN_MS, ab startMs) und p50/p90/p99 aller Submissions eines Bosses.
+    """
+    histogram = getTimeSummary().bosses.get(bossId)
+    if histogram is None or not histogram.total:
+        return {"bossId": bossId, "count": 0, "binMs": BIN_MS, "startMs": None, "histogram": [], "percentiles": {}}
+
+    return {
+        "bossId": bossId,
+        "count": histogram.total,
+        "binMs": BIN_MS,
+        "startMs": histogram.offset * BIN_MS,
+        "histogram": histogram.counts.tolist(),
+        "percentiles": {
+            f"p{round(q * 100)}": round(value) for q, value in zip(PERCENTILES, _percentiles(histogram, PERCENTILES))
+        },
+    }
+
+
+def percentileRank(bossId: int, timeMs: int) -> float | None:
+    """
+    Anteil der Submissions eines Bosses, die langsamer sind als timeMs (0..1, 1 = schnellste).
+    """
+    histogram = getTimeSummary().bosses.get(bossId)
+    if histogram is None or not histogram.total:
+        return None
+    edges, cdf = _cdf(histogram)
+    return float(1 - np.interp(timeMs, edges, cdf))
+
+
+def playerTimeStats(playerId: int, bossId: int) -> dict:
+    """
+    Konstanz und Verlauf eines Spielers auf einem Boss, über den (player, boss, created_at)-Index.
+    """
+    times = np.asarray(
+        TimeSubmission.objects.filter(player_id=playerId, boss_id=bossId)
+        .order_by("created_at", "id")
+        .values_list("time_ms", flat=True),
+        dtype=np.int64,
+    )
+    if not len(times):
+        return {"playerId": playerId, "count": 0}
+
+    best = int(times.min())
+    return {
+        "playerId": playerId,
+        "count": len(times),
+        "bestMs": best,
+        "meanMs": round(float(times.mean())),
+        "stdMs": round(float(times.std())),
+        "medianMs": round(float(np.median(times))),
+        "bestPercentileRank": percentileRank(bossId, best),
+        "recentMs": times[-RECENT_SUBMISSIONS:].tolist(),
+    }
+
+
+def recordTimeSubmissions(entries: list[TimeSubmission]) -> list[TimeSubmission]:
+    """
+    Bulk-Ingest ins Log (z.B. Import alter Runs). Die Statistik holt die Zeilen beim nächsten Lesen nach.
+    """
+    return TimeSubmission.objects.bulk_create(entries, batch_size=500)
@@ -24,6 +24,7 @@ urlpatterns = [
 
     path("host/match/<int:matchId>/start/", views.hostMatchStart, name="hostMatchStart"),
     path("host/match/<int:matchId>/finish/", views.hostMatchFinish, name="hostMatchFinish"),
+    path("host/draft-cache-stats/", views.hostDraftCacheStats, name="hostDraftCacheStats"),
 
     path("match/<int:matchId>/", views.matchDetail, name="matchDetail"),
     path("match/<int:matchId>/confirm-bans/", views.matchConfirmBans, name="matchConfirmBans"),
@@ -33,6 +34,11 @@ urlpatterns = [
     path("match/<int:matchId>/draft-partial/", views.matchDraftPartial, name="matchDraftPartial"),
 
     path("host/tournament/<int:tournamentId>/generate-bracket-8/", views.hostGenerateBracket8, name="hostGenerateBracket8"),
+    path("host/tournament/<int:tournamentId>/generate-bracket/", views.hostGenerateBracket, name="hostGenerateBracket"),
+    path("host/tournament/<int:tournamentId>/generate-double-elim/", views.hostGenerateDoubleElim, name="hostGenerateDoubleElim"),
+    path("host/tournament/<int:tournamentId>/generate-swiss-round/", views.hostGenerateSwissRound, name="hostGenerateSwissRound"),
+    path("host/tournament/<int:tournamentId>/generate-groups/", views.hostGenerateGroups, name="hostGenerateGroups"),
+    path("host/tournament/<int:tournamentId>/finalize-round/", views.hostFinalizeRound, name="hostFinalizeRound"),
 
     # Leaderboards
     path("leaderboards/", views.leaderboards, name="leaderboards"),
@@ -1,17 +1,29 @@
 from django.contrib.auth import authenticate, login, logout
+from django.core.exceptions import PermissionDenied
 from django.db import transaction
 from django.db.models import Q
-from django.http import HttpResponse, HttpResponseForbidden
+from django.middleware.csrf import get_token
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.template.loader import render_to_string
 from django.utils import timezone
 
-from .draft import BAN_COUNT, PICK_COUNT, _getCurrentBanSlot, _getCurrentPickSlot, _getUserSide, buildDraftContext
+from .draft import (
+    CSRF_TOKEN_PLACEHOLDER,
+    DraftConflict,
+    DraftRejected,
+    _getUserSide,
+    buildDraftContext,
+    getDraftRole,
+)
+from .brackettree import invalidateBracketTree
+from .draftcache import bumpDraftVersion, draftCacheStats, getDraftHtml, getDraftSnapshot
+from .draftservice import confirmDraftChoice, resetDraft
 from .forms import (
-    BanConfirmForm,
+    BracketGenerateForm,
     DraftActionForm,
+    GroupStageForm,
     MatchTimeSubmitForm,
-    PickConfirmForm,
+    RoundFinalizeForm,
     TournamentParticipantsForm,
 )
 from .models import (
@@ -22,12 +34,21 @@ from .models import (
     MatchDraftAction,
     MatchSide,
     Resonator,
+    TimeSubmission,
     Tournament,
     UserRole,
 )
 from .permissions import requireLogin, requireRole
+from .finalize import finalizeMatches
+from .groups import generateRoundRobinGroups, groupStandings
+from .leaderboard import bossLeaderboards, parseLeaderboardParams, recordPersonalBest
+from .rankindex import playerRanks, recordRankChange
+from .ratings import recordMatchRatings
+from .seeding import seededPlayers
+from .simulate import recordMatchTimes
+from .swiss import generateSwissRound
 from .ws import broadcastDraftUpdate, broadcastPageRefresh
-from .bracket import generateSingleElim8
+from .bracket import advanceMatchResult, generateDoubleElim, generateSingleElim, generateSingleElim8
 
 
 def home(request):
@@ -35,21 +56,29 @@ def home(request):
 
 
 def matchDraftPartial(request, matchId: int):
-    match = get_object_or_404(
-        Match.objects.select_related("player_left", "player_right", "boss", "tournament", "winner_player"),
-        id=matchId,
-    )
+    try:
+        snapshot = getDraftSnapshot(matchId)
+    except Match.DoesNotExist:
+        raise Http404("Match not found")
 
     # gleiche Permission-Logik wie matchDetail
-    isHost = request.user.is_authenticated and request.user.role in (UserRole.ADMIN, UserRole.COMMENTATOR)
-    userSide = _getUserSide(request.user, match)
-    isPlayerInMatch = userSide is not None
-    if not (isHost or isPlayerInMatch):
+    role = getDraftRole(request.user, snapshot.match)
+    if role is None:
         return HttpResponseForbidden("Forbidden")
 
-    context = buildDraftContext(match, request.user)
-    html = render_to_string("core/partials/match_draft.html", context, request=request)
-    return HttpResponse(html)
+    # Gecachte Rollen-Variante, nur der CSRF-Token ist pro User
+    html, version = getDraftHtml(matchId, role)
+    response = HttpResponse(html.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request)))
+    response["X-Draft-Version"] = str(version)
+    return response
+
+
+@requireRole(UserRole.ADMIN, UserRole.COMMENTATOR)
+def hostDraftCacheStats(request):
+    """
+    Hit/Miss-Zähler des Draft-Caches (pro Prozess) – zum Prüfen während Live-Events.
+    """
+    return JsonResponse(draftCacheStats())
 
 
 def userLogin(request):
@@ -91,9 +120,37 @@ def playerDashboard(request):
         {
             "player": player,
             "matches": matches,
+            "ranks": playerRanks(player.id),
         },
     )
 
+def _renderTournamentDetail(request, tournament, **extra):
+    # Matches wieder wie in hostTournamentDetail laden, damit die Seite rendern kann
+    matches = (
+        Match.objects.select_related("player_left", "player_right", "boss", "winner_player")
+        .filter(tournament=tournament)
+        .order_by("-id")
+    )
+    return render(
+        request,
+        "core/host_tournament_detail.html",
+        {"tournament": tournament, "matches": matches, "groupStandings": groupStandings(tournament), **extra},
+    )
+
+
+def _renderBracketError(request, tournament, error: str):
+    return _renderTournamentDetail(request, tournament, error=error)
+
+
+def _formSeeding(tournament, form):
+    # None = Auslosung im Generator
+    if form.cleaned_data["seedByRating"]:
+        return seededPlayers(tournament, byRating=True)
+    if form.cleaned_data["seedByBossTime"]:
+        return seededPlayers(tournament)
+    return None
+
+
 @requireRole(UserRole.ADMIN, UserRole.COMMENTATOR)
 def hostGenerateBracket8(request, tournamentId: int):
     if request.method != "POST":
@@ -104,21 +161,129 @@ def hostGenerateBracket8(request, tournamentId: int):
     try:
         generateSingleElim8(tournament, overwrite=True)
     except ValueError as e:
-        # Matches wieder wie in hostTournamentDetail laden, damit die Seite rendern kann
-        matches = (
-            Match.objects.select_related("player_left", "player_right", "boss", "winner_player")
-            .filter(tournament=tournament)
-            .order_by("-id")
+        return _renderBracketError(request, tournament, str(e))
+
+    return redirect("hostTournamentDetail", tournamentId=tournament.id)
+
+
+@requireRole(UserRole.ADMIN, UserRole.COMMENTATOR)
+def hostGenerateBracket(request, tournamentId: int):
+    """
+    Single Elimination für alle Teilnehmer (beliebige Anzahl, Freilose für die besten Seeds).
+    """
+    if request.method != "POST":
+        return redirect("hostTournamentDetail", tournamentId=tournamentId)
+
+    tournament = get_object_or_404(Tournament, id=tournamentId)
+
+    form = BracketGenerateForm(request.POST)
+    if not form.is_valid():
+        return _renderBracketError(request, tournament, "Invalid bracket options.")
+
+    try:
+        generateSingleElim(
+            tournament,
+            seededPlayers=_formSeeding(tournament, form),
+            shuffleSeed=form.cleaned_data["shuffleSeed"],
+            overwrite=True,
         )
-        return render(
-            request,
-            "core/host_tournament_detail.html",
-            {"tournament": tournament, "matches": matches, "error": str(e)},
+    except ValueError as e:
+        return _renderBracketError(request, tournament, str(e))
+
+    return redirect("hostTournamentDetail", tournamentId=tournament.id)
+
+
+@requireRole(UserRole.ADMIN, UserRole.COMMENTATOR)
+def hostGenerateDoubleElim(request, tournamentId: int):
+    """
+    Double Elimination für alle Teilnehmer, optional mit Grand-Final-Reset.
+    """
+    if request.method != "POST":
+        return redirect("hostTournamentDetail", tournamentId=tournamentId)
+
+    tournament = get_object_or_404(Tournament, id=tournamentId)
+
+    form = BracketGenerateForm(request.POST)
+    if not form.is_valid():
+        return _renderBracketError(request, tournament, "Invalid bracket options.")
+
+    try:
+        generateDoubleElim(
+            tournament,
+            seededPlayers=_formSeeding(tournament, form),
+            shuffleSeed=form.cleaned_data["shuffleSeed"],
+            grandFinalReset=form.cleaned_data["grandFinalReset"],
+            overwrite=True,
         )
+    except ValueError as e:
+        return _renderBracketError(request, tournament, str(e))
+
+    return redirect("hostTournamentDetail", tournamentId=tournament.id)
+
+
+@requireRole(UserRole.ADMIN, UserRole.COMMENTATOR)
+def hostGenerateSwissRound(request, tournamentId: int):
+    """
+    Nächste Swiss-Runde paaren (vorherige Runde muss beendet sein).
+    """
+    if request.method != "POST":
+        return redirect("hostTournamentDetail", tournamentId=tournamentId)
+
+    tournament = get_object_or_404(Tournament, id=tournamentId)
+
+    try:
+        generateSwissRound(tournament)
+    except ValueError as e:
+        return _renderBracketError(request, tournament, str(e))
 
     return redirect("hostTournamentDetail", tournamentId=tournament.id)
 
 
+@requireRole(UserRole.ADMIN, UserRole.COMMENTATOR)
+def hostGenerateGroups(request, tournamentId: int):
+    """
+    Gruppenphase (jeder gegen jeden) für alle Teilnehmer erzeugen, Snake-Seeding nach BossTime.
+    """
+    if request.method != "POST":
+        return redirect("hostTournamentDetail", tournamentId=tournamentId)
+
+    tournament = get_object_or_404(Tournament, id=tournamentId)
+
+    form = GroupStageForm(request.POST)
+    if not form.is_valid():
+        return _renderBracketError(request, tournament, "Invalid number of groups.")
+
+    try:
+        generateRoundRobinGroups(tournament, form.cleaned_data["groupCount"], overwrite=True)
+    except ValueError as e:
+        return _renderBracketError(request, tournament, str(e))
+
+    return redirect("hostTournamentDetail", tournamentId=tournament.id)
+
+
+@requireRole(UserRole.ADMIN, UserRole.COMMENTATOR)
+def hostFinalizeRound(request, tournamentId: int):
+    """
+    Alle fertig gespielten Matches einer Runde auf einmal abschließen (statt einzeln per hostMatchFinish).
+    Übersprungene Matches werden mit Grund angezeigt.
+    """
+    if request.method != "POST":
+        return redirect("hostTournamentDetail", tournamentId=tournamentId)
+
+    tournament = get_object_or_404(Tournament, id=tournamentId)
+
+    form = RoundFinalizeForm(request.POST)
+    if not form.is_valid():
+        return _renderBracketError(request, tournament, "Invalid round.")
+
+    result = finalizeMatches(
+        tournament,
+        bracket=form.cleaned_data["bracket"],
+        roundIndex=form.cleaned_data["roundIndex"],
+    )
+    return _renderTournamentDetail(request, tournament, finalizeResult=result)
+
+
 @requireRole(UserRole.ADMIN, UserRole.COMMENTATOR)
 def hostTournamentList(request):
     """
@@ -176,6 +341,7 @@ def hostTournamentDetail(request, tournamentId: int):
         {
             "tournament": tournament,
             "matches": matches,
+            "groupStandings": groupStandings(tournament),
         },
     )
 
@@ -190,7 +356,12 @@ def hostMatchStart(request, matchId: int):
     if match.started_at is None:
         match.started_at = timezone.now()
         match.finished_at = None
-        match.save()
+        with transaction.atomic():
+            match.save()
+            # Version auch bei Zeit-/Statusänderungen hochzählen (Zuschauer-Snapshot)
+            bumpDraftVersion(match)
+            invalidateBracketTree(match.tournament_id)
+        broadcastPageRefresh(match.id)
 
     return redirect("matchDetail", matchId=matchId)
 
@@ -200,7 +371,8 @@ def hostMatchFinish(request, matchId: int):
     if request.method != "POST":
         return redirect("matchDetail", matchId=matchId)
 
-    match = get_object_or_404(Match, id=matchId)
+    # Zeile sperren: ein zweiter gleichzeitiger Finish-Request sieht danach finished_at und wertet nicht doppelt
+    match = get_object_or_404(Match.objects.select_for_update(), id=matchId)
 
     if match.started_at is None:
         return redirect("matchDetail", matchId=matchId)
@@ -217,42 +389,34 @@ def hostMatchFinish(request, matchId: int):
     if match.left_time_ms > match.right_time_ms:
         match.winner_player_id = match.player_right_id
 
-    if match.next_match_id is not None:
-        nextMatch = Match.objects.select_for_update().get(id=match.next_match_id)
-
-        if match.next_side == MatchSide.LEFT:
-            nextMatch.player_left = match.winner_player
-        else:
-            nextMatch.player_right = match.winner_player
-
-        nextMatch.save(update_fields=["player_left", "player_right"])
+    # Sieger weiter, Verlierer ggf. ins Losers Bracket – beide Ziele gemeinsam gesperrt
+    for nextMatch in advanceMatchResult(match):
+        bumpDraftVersion(nextMatch)
 
 
     match.finished_at = timezone.now()
     match.save()
+    bumpDraftVersion(match)
+    invalidateBracketTree(match.tournament_id)
+    recordMatchTimes([match])
+    recordMatchRatings([match])
+    broadcastPageRefresh(match.id)
     return redirect("matchDetail", matchId=matchId)
 
 
 
 def leaderboards(request):
     """
-    Öffentliche Leaderboards (Top5 pro Boss).
+    Öffentliche Leaderboards (Top-K pro Boss, Standard 5), optional ?top=, ?tournament=, ?player=.
+    Eine Window-Query für alle Bosse statt einer Query pro Boss.
     """
-    bosses = Boss.objects.all().order_by("name")
-    bossLeaderboards = []
-    for boss in bosses:
-        top5 = (
-            BossTime.objects.select_related("player")
-            .filter(boss=boss, best_time_ms__isnull=False)
-            .order_by("best_time_ms")[:5]
-        )
-        bossLeaderboards.append((boss, top5))
-
+    params = parseLeaderboardParams(request.GET)
     return render(
         request,
         "core/leaderboards.html",
         {
-            "bossLeaderboards": bossLeaderboards,
+            "bossLeaderboards": bossLeaderboards(**params),
+            "topK": params["topK"],
         },
     )
 
@@ -322,13 +486,15 @@ def matchDraftAction(request, matchId: int):
     # Step Index automatisch fortlaufend
     nextStepIndex = actions.count() + 1
 
-    MatchDraftAction.objects.create(
-        match=match,
-        step_index=nextStepIndex,
-        action_type=actionType,
-        acting_side=actingSide,
-        resonator=resonator,
-    )
+    with transaction.atomic():
+        MatchDraftAction.objects.create(
+            match=match,
+            step_index=nextStepIndex,
+            action_type=actionType,
+            acting_side=actingSide,
+            resonator=resonator,
+        )
+        bumpDraftVersion(match)
     broadcastDraftUpdate(match.id)
     return redirect("matchDetail", matchId=matchId)
 
@@ -372,23 +538,34 @@ def matchSubmitTime(request, matchId: int):
     player = request.user.player
     boss = match.boss
 
-    # Global PB pro Boss updaten
-    bossTime, created = BossTime.objects.get_or_create(
-        player=player,
-        boss=boss,
-        defaults={"best_time_ms": timeMs},
-    )
-    if not created and (bossTime.best_time_ms is None or timeMs < bossTime.best_time_ms):
-        bossTime.best_time_ms = timeMs
-        bossTime.save()
-
-    if userSide == MatchSide.LEFT:
-        match.left_time_ms = timeMs
-    else:
-        match.right_time_ms = timeMs
-
+    with transaction.atomic():
+        # Global PB pro Boss updaten
+        bossTime, created = BossTime.objects.get_or_create(
+            player=player,
+            boss=boss,
+            defaults={"best_time_ms": timeMs},
+        )
+        improved = not created and (bossTime.best_time_ms is None or timeMs < bossTime.best_time_ms)
+        previousMs = None if created else bossTime.best_time_ms
+        if improved:
+            bossTime.best_time_ms = timeMs
+            bossTime.save()
+        if created or improved:
+            # Materialisiertes Top-K in derselben Transaktion nachführen
+            recordPersonalBest(boss.id, player.id, timeMs)
+            recordRankChange(boss.id, player.id, previousMs, timeMs)
+
+        # Jeder Run landet im Log, nicht nur die Bestzeit
+        TimeSubmission.objects.create(player=player, boss=boss, match=match, time_ms=timeMs)
+
+        if userSide == MatchSide.LEFT:
+            match.left_time_ms = timeMs
+        else:
+            match.right_time_ms = timeMs
 
-    match.save()
+        match.save()
+        bumpDraftVersion(match)
+        invalidateBracketTree(match.tournament_id)
     broadcastPageRefresh(match.id)
     return redirect("matchDetail", matchId=matchId)
 
@@ -422,218 +599,45 @@ def matchSubmitTime(request, matchId: int):
 #     return Resonator.objects.filter(is_enabled=True).exclude(id__in=bannedAgainstMe)
 
 
-@transaction.atomic
-def matchConfirmBans(request, matchId: int):
+def _confirmDraftChoice(request, matchId: int, actionType: str):
     if request.method != "POST":
         return redirect("matchDetail", matchId=matchId)
 
-    match = Match.objects.select_for_update().get(id=matchId)
-
-    userSide = _getUserSide(request.user, match)
-    if userSide is None:
+    try:
+        confirmDraftChoice(matchId, request.user, actionType, request.POST)
+    except Match.DoesNotExist:
+        raise Http404("Match not found")
+    except PermissionDenied:
         return HttpResponseForbidden("Forbidden")
-
-    # Ban-Phase fertig?
-    if match.left_bans_confirmed and match.right_bans_confirmed:
-        return redirect("matchDetail", matchId=matchId)
-
-    currentSlot = _getCurrentBanSlot(match)
-    if currentSlot > BAN_COUNT:
-        match.left_bans_confirmed = True
-        match.right_bans_confirmed = True
-        match.save()
-        broadcastDraftUpdate(match.id)
-        return redirect("matchDetail", matchId=matchId)
-
-    usedIds = set(
-        MatchDraftAction.objects.filter(
-            match=match,
-            action_type=DraftActionType.BAN,
-            acting_side=userSide,
-        ).values_list("resonator_id", flat=True)
-    )
-
-    # Wenn ich im aktuellen Slot schon einen pending Ban habe, darf ich den "re-choosen":
-    existing = MatchDraftAction.objects.filter(
-        match=match,
-        action_type=DraftActionType.BAN,
-        acting_side=userSide,
-        slot_index=currentSlot,
-        is_locked=False,
-    ).first()
-    if existing is not None:
-        usedIds.discard(existing.resonator_id)
-
-    available = Resonator.objects.filter(is_enabled=True).exclude(id__in=usedIds)
-
-    form = BanConfirmForm(request.POST, available=available)
-    if not form.is_valid():
-        return redirect("matchDetail", matchId=matchId)
-
-    selectedRes = form.cleaned_data["ban"]
-
-    targetSide = MatchSide.RIGHT if userSide == MatchSide.LEFT else MatchSide.LEFT
-
-    # Upsert pro (match, BAN, slot, side)
-    stepIndex = 1000 + (currentSlot * 10) + (1 if userSide == MatchSide.LEFT else 2)
-
-    MatchDraftAction.objects.update_or_create(
-        match=match,
-        action_type=DraftActionType.BAN,
-        slot_index=currentSlot,
-        acting_side=userSide,
-        defaults={
-            "target_side": targetSide,
-            "resonator": selectedRes,
-            "step_index": stepIndex,
-            "is_locked": False,
-        },
-    )
-
-    # Wenn beide Seiten in diesem Slot einen Ban gesetzt haben -> lock beide
-    slotActions = MatchDraftAction.objects.filter(
-        match=match,
-        action_type=DraftActionType.BAN,
-        slot_index=currentSlot,
-    )
-
-    hasLeft = slotActions.filter(acting_side=MatchSide.LEFT).exists()
-    hasRight = slotActions.filter(acting_side=MatchSide.RIGHT).exists()
-
-    if hasLeft and hasRight:
-        slotActions.update(is_locked=True)
-
-        if currentSlot >= BAN_COUNT:
-            match.left_bans_confirmed = True
-            match.right_bans_confirmed = True
-            match.save()
-
-    broadcastDraftUpdate(match.id)
+    except DraftConflict as e:
+        # Parallel geändert: Client kann sofort mit neuem Stand wiederholen
+        response = HttpResponse(str(e), status=409)
+        response["Retry-After"] = "0"
+        return response
+    except DraftRejected:
+        pass
     return redirect("matchDetail", matchId=matchId)
 
 
-@transaction.atomic
-def matchConfirmPicks(request, matchId: int):
-    if request.method != "POST":
-        return redirect("matchDetail", matchId=matchId)
-
-    match = Match.objects.select_for_update().get(id=matchId)
-
-    userSide = _getUserSide(request.user, match)
-    if userSide is None:
-        return HttpResponseForbidden("Forbidden")
-
-    # Pick-Phase erst nach Ban-Phase
-    if not (match.left_bans_confirmed and match.right_bans_confirmed):
-        return redirect("matchDetail", matchId=matchId)
-
-    # Pick-Phase fertig?
-    if match.left_picks_confirmed and match.right_picks_confirmed:
-        return redirect("matchDetail", matchId=matchId)
-
-    currentSlot = _getCurrentPickSlot(match)
-    if currentSlot > PICK_COUNT:
-        match.left_picks_confirmed = True
-        match.right_picks_confirmed = True
-        match.save()
-        broadcastDraftUpdate(match.id)
-        broadcastPageRefresh(match.id)
-        return redirect("matchDetail", matchId=matchId)
-
-    usedPickIds = set(
-        MatchDraftAction.objects.filter(
-            match=match,
-            action_type=DraftActionType.PICK,
-            acting_side=userSide,
-        ).values_list("resonator_id", flat=True)
-    )
-
-    existing = MatchDraftAction.objects.filter(
-        match=match,
-        action_type=DraftActionType.PICK,
-        acting_side=userSide,
-        slot_index=currentSlot,
-        is_locked=False,
-    ).first()
-    if existing is not None:
-        usedPickIds.discard(existing.resonator_id)
-
-    bannedAgainstMe = set(
-        MatchDraftAction.objects.filter(
-            match=match,
-            action_type=DraftActionType.BAN,
-            target_side=userSide,
-            is_locked=True,
-        ).values_list("resonator_id", flat=True)
-    )
-
-    available = (
-        Resonator.objects.filter(is_enabled=True)
-        .exclude(id__in=usedPickIds)
-        .exclude(id__in=bannedAgainstMe)
-    )
-
-    form = PickConfirmForm(request.POST, available=available)
-    if not form.is_valid():
-        return redirect("matchDetail", matchId=matchId)
-
-    selectedRes = form.cleaned_data["pick"]
-
-    stepIndex = 3000 + (currentSlot * 10) + (1 if userSide == MatchSide.LEFT else 2)
-
-    MatchDraftAction.objects.update_or_create(
-        match=match,
-        action_type=DraftActionType.PICK,
-        slot_index=currentSlot,
-        acting_side=userSide,
-        defaults={
-            "target_side": userSide,
-            "resonator": selectedRes,
-            "step_index": stepIndex,
-            "is_locked": False,
-        },
-    )
-
-    slotActions = MatchDraftAction.objects.filter(
-        match=match,
-        action_type=DraftActionType.PICK,
-        slot_index=currentSlot,
-    )
-
-    hasLeft = slotActions.filter(acting_side=MatchSide.LEFT).exists()
-    hasRight = slotActions.filter(acting_side=MatchSide.RIGHT).exists()
+def matchConfirmBans(request, matchId: int):
+    return _confirmDraftChoice(request, matchId, DraftActionType.BAN)
 
-    if hasLeft and hasRight:
-        slotActions.update(is_locked=True)
 
-        if currentSlot >= PICK_COUNT:
-            match.left_picks_confirmed = True
-            match.right_picks_confirmed = True
-            match.save()
-            broadcastPageRefresh(match.id)
-    broadcastDraftUpdate(match.id)
-    return redirect("matchDetail", matchId=matchId)
+def matchConfirmPicks(request, matchId: int):
+    return _confirmDraftChoice(request, matchId, DraftActionType.PICK)
 
 
-@transaction.atomic
 def matchDraftReset(request, matchId: int):
     if request.method != "POST":
         return redirect("matchDetail", matchId=matchId)
 
-    match = get_object_or_404(Match, id=matchId)
-
-    # Nur Host darf resetten
-    if not (request.user.is_authenticated and request.user.role in (UserRole.ADMIN, UserRole.COMMENTATOR)):
+    try:
+        resetDraft(matchId, request.user)
+    except Match.DoesNotExist:
+        raise Http404("Match not found")
+    except PermissionDenied:
         return HttpResponseForbidden("Forbidden")
 
-    MatchDraftAction.objects.filter(match=match).delete()
-
-    match.left_bans_confirmed = False
-    match.right_bans_confirmed = False
-    match.left_picks_confirmed = False
-    match.right_picks_confirmed = False
-    match.save()
-
     return redirect("matchDetail", matchId=matchId)
 
 
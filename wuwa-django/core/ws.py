@@ -1,19 +1,138 @@
+import logging
+import threading
+import time
+
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
 
-def broadcastDraftUpdate(matchId: int):
+from .draft import DRAFT_ROLES
+from .draftcache import getDraftHtml, getSpectatorJson
+from .models import Match
+
+
+logger = logging.getLogger(__name__)
+
+# Broadcast-Typen nach Stärke: page_refresh lädt die ganze Seite (inkl. Draft) neu und schluckt draft_refresh
+DRAFT_UPDATE = 1
+PAGE_REFRESH = 2
+
+
+def _groupSend(matchId: int, message: dict, groupPrefix: str = "matchDraft"):
     channelLayer = get_channel_layer()
-    groupName = f"matchDraft_{matchId}"
+    async_to_sync(channelLayer.group_send)(f"{groupPrefix}_{matchId}", message)
+
+
+def _sendSpectatorSnapshot(matchId: int):
+    # Einmal serialisiert, jeder Zuschauer-Socket bekommt denselben Text
+    try:
+        text = getSpectatorJson(matchId)
+    except Match.DoesNotExist:
+        return
+    _groupSend(matchId, {"type": "spectator_snapshot", "text": text}, groupPrefix="matchSpectate")
+
+
+def _sendDraftUpdate(matchId: int):
+    # Jede Rollen-Variante einmal vorrendern (Render-Cache), über den Channel-Layer geht nur die
+    # Version: jeder Consumer holt sich die Variante seiner Rolle selbst, verdeckte Picks des
+    # Host-Views verlassen so nie den Server in Richtung fremder Sockets
+    version = None
+    try:
+        for role in DRAFT_ROLES:
+            _, version = getDraftHtml(matchId, role)
+    except Match.DoesNotExist:
+        return
+
+    _groupSend(matchId, {"type": "draft_refresh", "version": version})
+
+
+def _sendPageRefresh(matchId: int):
+    _groupSend(matchId, {"type": "page_refresh"})
+
+
+class BroadcastDispatcher:
+    """
+    Sammelt Broadcasts bis zum Commit, fasst sie pro Match zusammen (stärkster Typ gewinnt)
+    und sendet sie aus einem Hintergrund-Thread – der Request wartet nicht auf den Channel-Layer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: dict[int, int] = {}
+        self._wakeup = threading.Event()
+        self._thread = None
 
-    async_to_sync(channelLayer.group_send)(
-        groupName,
-        {"type": "draft_refresh"},
-    )
+    def queue(self, matchId: int, strength: int):
+        # Erst nach dem Commit vormerken, sonst rendert der Payload den alten Stand
+        transaction.on_commit(lambda: self._add(matchId, strength))
+
+    def queueMany(self, matchIds: list[int], strength: int):
+        # Ein on_commit für alle Matches, landen gemeinsam im nächsten Flush
+        matchIds = list(matchIds)
+        transaction.on_commit(lambda: self._addMany(matchIds, strength))
+
+    def _add(self, matchId: int, strength: int):
+        self._addMany([matchId], strength)
+
+    def _addMany(self, matchIds: list[int], strength: int):
+        with self._lock:
+            for matchId in matchIds:
+                if strength > self._pending.get(matchId, 0):
+                    self._pending[matchId] = strength
+
+        if getattr(settings, "BROADCAST_DISPATCH_THREAD", True):
+            self._ensureThread()
+            self._wakeup.set()
+
+    def _ensureThread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="broadcastDispatcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Kurz sammeln: Events desselben Requests/Ticks landen im selben Flush
+            time.sleep(getattr(settings, "BROADCAST_DISPATCH_DELAY", 0.02))
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Broadcast flush failed")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """
+        Sendet alle vorgemerkten Broadcasts – eine Nachricht pro Match (plus Zuschauer-Snapshot).
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for matchId, strength in pending.items():
+            if strength >= PAGE_REFRESH:
+                _sendPageRefresh(matchId)
+            else:
+                _sendDraftUpdate(matchId)
+            _sendSpectatorSnapshot(matchId)
+
+
+dispatcher = BroadcastDispatcher()
+
+
+def broadcastDraftUpdate(matchId: int):
+    dispatcher.queue(matchId, DRAFT_UPDATE)
 
 
 def broadcastPageRefresh(matchId: int):
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"matchDraft_{matchId}",
-        {"type": "page_refresh"},
-    )
+    dispatcher.queue(matchId, PAGE_REFRESH)
+
+
+def broadcastPageRefreshMany(matchIds: list[int]):
+    dispatcher.queueMany(matchIds, PAGE_REFRESH)
+
+
+def flushBroadcasts():
+    dispatcher.flush()